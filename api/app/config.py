@@ -24,6 +24,14 @@ class Settings(BaseSettings):
     SMTP_PORT: int = 587
     SMTP_USERNAME: str = ""
     SMTP_PASSWORD: str = ""
+    SMTP_FROM: str = ""  # defaults to SMTP_USERNAME
+    SMTP_POOL_SIZE: int = 8  # concurrent sessions per worker process
+    SMTP_MESSAGES_PER_CONNECTION: int = 100
+    SMTP_MAX_RETRIES: int = 3
+    SMTP_RETRY_BACKOFF_SECONDS: float = 0.5
+    SMTP_TIMEOUT_SECONDS: float = 30
+    EMAIL_DIGEST_WINDOW_MINUTES: int = 15  # rule emails per recipient are combined per window
+    DEADLINE_REMINDER_HOURS: int = 48  # remind once when a deadline gets this close
     
     # CORS
     CORS_ORIGINS: List[str] = ["http://localhost:3000", "http://frontend:3000"]
@@ -33,6 +41,54 @@ class Settings(BaseSettings):
     UPLOAD_DIR: str = "/app/uploads"
     MAX_FILE_SIZE: int = 10 * 1024 * 1024  # 10MB
     
+    # Precomputed indexes (shared by API and worker)
+    INDEX_DIR: str = "/app/uploads/.indexes"
+    EXPERIENCE_MODEL_MAX_FEATURES: int = 50000
+    
+    # Recommendations
+    RECOMMENDATION_CANDIDATE_LIMIT: int = 2000
+    RECOMMENDATION_EXPLORATION_SAMPLE: int = 50
+    RECOMMENDATION_CACHE_SIZE: int = 20
+    RECOMMENDATION_CACHE_TTL: int = 6 * 3600  # seconds
+    RECOMMENDATION_POOL_SIZE: int = 200
+    RECOMMENDATION_FULL_REFRESH_HOURS: int = 24
+    RECOMMENDATION_WATERMARK_OVERLAP_SECONDS: int = 300
+    RECOMMENDATION_SHARD_SIZE: int = 500
+    RECOMMENDATION_SHARD_CONCURRENCY: int = 8
+    SCORE_UPDATE_BATCH_SIZE: int = 1000
+    SCORE_UPDATE_COMMIT_SIZE: int = 5000
+    VECTOR_INDEX_NPROBE: int = 8
+    VECTOR_INDEX_MIN_TRAIN_SIZE: int = 1000
+    
+    # Worker async runtime (one engine and HTTP client per worker process)
+    WORKER_DB_POOL_SIZE: int = 5
+    WORKER_DB_MAX_OVERFLOW: int = 5
+    WORKER_HTTP_MAX_CONNECTIONS: int = 100
+    WORKER_HTTP_KEEPALIVE_CONNECTIONS: int = 20
+    WORKER_HTTP2: bool = False  # needs the h2 package (httpx[http2])
+    
+    # Scraping
+    SCRAPE_CONCURRENCY: int = 32
+    SCRAPE_PER_HOST_CONCURRENCY: int = 4
+    SCRAPE_TIMEOUT_SECONDS: float = 20
+    SCRAPE_MAX_RETRIES: int = 3
+    SCRAPE_RETRY_BACKOFF_SECONDS: float = 1.0
+    SCRAPE_MAX_RETRY_WAIT_SECONDS: float = 30  # cap on Retry-After
+    SCRAPE_SAVE_BATCH_SIZE: int = 25
+    SCRAPE_CACHE_DIR: str = "/app/uploads/.http_cache"  # empty disables conditional re-fetching
+    SCRAPE_CACHE_MAX_BYTES: int = 512 * 1024 * 1024
+    SCRAPE_FIXTURE_DIR: str = ""  # replay pages from this cache directory instead of the network
+    SCRAPE_PARSER: str = "auto"  # selectolax, lxml or bs4; auto picks the fastest installed
+    SKILL_TAXONOMY_CHECK_SECONDS: int = 30  # how often extractors look for skill table changes
+    OPPORTUNITY_SIMHASH_MAX_DISTANCE: int = 3  # differing bits still counted as the same posting
+    
+    # Rules
+    RULE_EVENT_STREAM_MAXLEN: int = 100000
+    RULE_FIRED_RETENTION_DAYS: int = 90
+    RULE_DISPATCH_MAX_WAIT_SECONDS: int = 5
+    RULE_REFIRE_INTERVAL_HOURS: float = 168  # default; rules override with "refire_hours"
+    RULE_LEDGER_RETENTION_DAYS: int = 180  # keep above the longest re-fire interval
+    
     # Azure (Optional)
     AZURE_STORAGE_CONNECTION_STRING: str = ""
     AZURE_CONTAINER_NAME: str = "student-crm-backups"
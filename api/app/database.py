@@ -1,7 +1,8 @@
-from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.ext.asyncio import create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 from app.config import settings
+from app.services.cache import HookedAsyncSession
 
 # Convert sync DATABASE_URL to async
 database_url = settings.DATABASE_URL.replace("postgresql://", "postgresql+asyncpg://")
@@ -10,7 +11,7 @@ engine = create_async_engine(database_url, echo=True)
 
 AsyncSessionLocal = sessionmaker(
     engine, 
-    class_=AsyncSession, 
+    class_=HookedAsyncSession, 
     expire_on_commit=False
 )
 
@@ -8,8 +8,10 @@ from app.config import settings
 from app.database import engine, create_tables
 from app.routers import (
     auth, opportunities, applications, contacts, 
-    documents, tasks, rules, analytics
+    documents, tasks, rules, analytics, recommendations
 )
+import app.services.rule_scheduler  # noqa: F401 (publishes rule events on commit)
+import app.services.skill_extractor  # noqa: F401 (bumps the skill taxonomy generation on commit)
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -54,6 +56,7 @@ app.include_router(documents.router, prefix="/documents", tags=["Documents"])
 app.include_router(tasks.router, prefix="/tasks", tags=["Tasks"])
 app.include_router(rules.router, prefix="/rules", tags=["Rules"])
 app.include_router(analytics.router, prefix="/analytics", tags=["Analytics"])
+app.include_router(recommendations.router, prefix="/recommendations", tags=["Recommendations"])
 
 @app.get("/")
 async def root():
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, DateTime, Text, JSON, ForeignKey, Float
+from sqlalchemy import Column, Integer, String, DateTime, Text, JSON, ForeignKey, Float, Index
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from app.database import Base
@@ -7,7 +7,7 @@ class Application(Base):
     __tablename__ = "applications"
     
     id = Column(Integer, primary_key=True, index=True)
-    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False, index=True)
     opportunity_id = Column(Integer, ForeignKey("opportunities.id"), nullable=False)
     status = Column(String(50), default="to_apply", index=True)
     applied_at = Column(DateTime(timezone=True))
@@ -38,4 +38,17 @@ class ApplicationEvent(Base):
     payload_json = Column(JSON, default={})
     
     # Relationships
-    application = relationship("Application", back_populates="events")
\ No newline at end of file
+    application = relationship("Application", back_populates="events")
+
+class DeadlineReminder(Base):
+    """A deadline reminder already sent for an application"""
+    __tablename__ = "deadline_reminders"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    application_id = Column(Integer, ForeignKey("applications.id", ondelete="CASCADE"), nullable=False)
+    deadline_at = Column(DateTime(timezone=True), nullable=False)  # a moved deadline is reminded again
+    sent_at = Column(DateTime(timezone=True), server_default=func.now())
+    
+    __table_args__ = (
+        Index("ix_deadline_reminders_application_deadline", "application_id", "deadline_at", unique=True),
+    )
@@ -1,7 +1,10 @@
-from sqlalchemy import Column, Integer, String, DateTime, Text, JSON, ForeignKey, Enum as SQLEnum
-from sqlalchemy.orm import relationship
+from sqlalchemy import Column, Integer, BigInteger, SmallInteger, String, DateTime, Text, JSON, ForeignKey, Index, Enum as SQLEnum, event, inspect, text
+from sqlalchemy.orm import relationship, Session
 from sqlalchemy.sql import func
 from app.database import Base
+from itertools import chain
+from typing import Iterable, List, Optional, Set, Tuple
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
 import enum
 
 class OpportunityType(str, enum.Enum):
@@ -41,6 +44,7 @@ class Opportunity(Base):
     location = Column(String(255))
     mode = Column(SQLEnum(WorkMode), default=WorkMode.ONSITE)
     url = Column(String(500))
+    canonical_url = Column(String(500))  # derived from url on flush; one row per posting
     deadline_at = Column(DateTime(timezone=True))
     jd_text = Column(Text)
     requirements = Column(JSON, default=[])
@@ -49,9 +53,151 @@ class Opportunity(Base):
     salary_max = Column(Integer)
     source = Column(String(100))  # scraped, manual, imported
     status = Column(String(50), default="active")  # active, expired, filled
-    created_at = Column(DateTime(timezone=True), server_default=func.now())
-    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+    content_simhash = Column(BigInteger)  # SimHash of title, company and description, for near-duplicates
+    created_at = Column(DateTime(timezone=True), server_default=func.now(), index=True)
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now(), index=True)
     
     # Relationships
     organization = relationship("Organization", back_populates="opportunities")
-    applications = relationship("Application", back_populates="opportunity")
\ No newline at end of file
+    applications = relationship("Application", back_populates="opportunity")
+    skill_entries = relationship("OpportunitySkill", cascade="all, delete-orphan", passive_deletes=True)
+    simhash_bands = relationship("OpportunitySimhashBand", cascade="all, delete-orphan", passive_deletes=True)
+    
+    __table_args__ = (
+        # Upcoming deadlines of open opportunities, for the reminder planner
+        Index(
+            "ix_opportunities_active_deadline", "deadline_at",
+            postgresql_where=text("status = 'active' AND deadline_at IS NOT NULL"),
+            sqlite_where=text("status = 'active' AND deadline_at IS NOT NULL")
+        ),
+        Index("ix_opportunities_canonical_url", "canonical_url", unique=True),
+    )
+
+class OpportunitySkill(Base):
+    """Inverted skill index: one row per normalized skill an opportunity requires"""
+    __tablename__ = "opportunity_skills"
+    
+    opportunity_id = Column(Integer, ForeignKey("opportunities.id", ondelete="CASCADE"), primary_key=True)
+    skill = Column(String(100), primary_key=True)
+    
+    __table_args__ = (
+        Index("ix_opportunity_skills_skill", "skill", "opportunity_id"),
+    )
+
+class OpportunitySimhashBand(Base):
+    """LSH index over content_simhash: one row per 16-bit band.
+
+    SimHashes within SIMHASH_BANDS - 1 bits of each other share at least one
+    band exactly, so near-duplicates are found with indexed equality lookups.
+    """
+    __tablename__ = "opportunity_simhash_bands"
+    
+    opportunity_id = Column(Integer, ForeignKey("opportunities.id", ondelete="CASCADE"), primary_key=True)
+    band = Column(SmallInteger, primary_key=True)
+    value = Column(Integer, nullable=False)
+    
+    __table_args__ = (
+        Index("ix_opportunity_simhash_bands_lookup", "band", "value", "opportunity_id"),
+    )
+
+SIMHASH_BANDS = 4
+
+def simhash_bands(simhash: int) -> List[Tuple[int, int]]:
+    """(band, 16-bit value) pairs of a 64-bit SimHash, signed or not"""
+    unsigned = simhash & 0xFFFFFFFFFFFFFFFF
+    return [(band, (unsigned >> (16 * band)) & 0xFFFF) for band in range(SIMHASH_BANDS)]
+
+# Query parameters that only say where a visitor came from, on any site
+# (plus utm_*). Anything else may identify the posting: dropping it would
+# merge distinct postings under one canonical URL.
+_TRACKING_PARAMS = {
+    'gclid', 'fbclid', 'msclkid', 'dclid', 'igshid', 'mc_cid', 'mc_eid', '_hsenc', '_hsmi',
+}
+
+# Tracking parameters known per job board, by domain
+_SITE_TRACKING_PARAMS = {
+    'linkedin.com': {'trk', 'trkinfo', 'trackingid', 'refid'},
+    'indeed.com': {'from', 'tk', 'vjs'},
+}
+
+def _tracking_params(host: str) -> Set[str]:
+    for domain, params in _SITE_TRACKING_PARAMS.items():
+        if host == domain or host.endswith(f".{domain}"):
+            return _TRACKING_PARAMS | params
+    return _TRACKING_PARAMS
+
+def canonicalize_url(url: Optional[str]) -> Optional[str]:
+    """One spelling per posting URL: https, lowercase host without www, no
+    default port, fragment, tracking parameters or trailing slash, and the
+    remaining query parameters sorted"""
+    if not url or not url.strip():
+        return None
+    parts = urlsplit(url.strip())
+    if not parts.netloc:
+        return url.strip()[:500]
+
+    scheme = parts.scheme.lower()
+    if scheme == 'http':
+        scheme = 'https'
+    host = (parts.hostname or '').lower()
+    if host.startswith('www.'):
+        host = host[4:]
+    netloc = host
+    if parts.port and parts.port not in (80, 443):
+        netloc = f"{host}:{parts.port}"
+
+    path = parts.path.rstrip('/') or '/'
+    tracking = _tracking_params(host)
+    query = sorted(
+        (key, value) for key, value in parse_qsl(parts.query, keep_blank_values=True)
+        if key.lower() not in tracking and not key.lower().startswith('utm_')
+    )
+    return urlunsplit((scheme, netloc, path, urlencode(query), ''))[:500]
+
+def normalize_skill(skill: str) -> str:
+    """Canonical form used for skill matching and the skill index"""
+    return " ".join(skill.lower().split())
+
+def normalize_skills(skills: Iterable[str]) -> List[str]:
+    seen = []
+    for skill in skills or []:
+        normalized = normalize_skill(skill)[:100] if isinstance(skill, str) else ""
+        if normalized and normalized not in seen:
+            seen.append(normalized)
+    return seen
+
+@event.listens_for(Session, "before_flush")
+def _sync_skill_index(session, flush_context, instances):
+    """Keep opportunity_skills in step with skills_required on every flush"""
+    for obj in chain(session.new, session.dirty):
+        if not isinstance(obj, Opportunity):
+            continue
+        if obj not in session.new and not inspect(obj).attrs.skills_required.history.has_changes():
+            continue
+        
+        wanted = normalize_skills(obj.skills_required)
+        existing = {entry.skill: entry for entry in obj.skill_entries}
+        obj.skill_entries = [
+            existing.get(skill) or OpportunitySkill(skill=skill)
+            for skill in wanted
+        ]
+
+@event.listens_for(Session, "before_flush")
+def _sync_fingerprints(session, flush_context, instances):
+    """Derive canonical_url from url and the LSH bands from content_simhash"""
+    for obj in chain(session.new, session.dirty):
+        if not isinstance(obj, Opportunity):
+            continue
+        state = inspect(obj)
+        if obj in session.new or state.attrs.url.history.has_changes():
+            obj.canonical_url = canonicalize_url(obj.url)
+        if obj in session.new or state.attrs.content_simhash.history.has_changes():
+            wanted = simhash_bands(obj.content_simhash) if obj.content_simhash is not None else []
+            existing = {entry.band: entry for entry in obj.simhash_bands}
+            for band, value in wanted:
+                if band in existing:
+                    existing[band].value = value
+            obj.simhash_bands = [
+                existing.get(band) or OpportunitySimhashBand(band=band, value=value)
+                for band, value in wanted
+            ]
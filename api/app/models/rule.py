@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, DateTime, Text, JSON, ForeignKey, Boolean
+from sqlalchemy import Column, Integer, String, DateTime, Text, JSON, ForeignKey, Boolean, Index
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from app.database import Base
@@ -20,4 +20,22 @@ class Rule(Base):
     updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
     
     # Relationships
-    owner = relationship("User", back_populates="rules")
\ No newline at end of file
+    owner = relationship("User", back_populates="rules")
+
+class RuleLedgerEntry(Base):
+    """An action a rule has taken on a target, checked against its re-fire interval"""
+    __tablename__ = "rule_ledger"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    rule_id = Column(Integer, ForeignKey("rules.id", ondelete="CASCADE"), nullable=False)
+    target_type = Column(String(50), nullable=False)  # application, user
+    target_id = Column(Integer, nullable=False)
+    fingerprint = Column(String(64), nullable=False)  # hash of the action and its parameters
+    window = Column(Integer, nullable=False)  # epoch seconds // re-fire interval; dedups concurrent runs
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    
+    __table_args__ = (
+        Index("ix_rule_ledger_firing", "rule_id", "window", "target_type", "target_id", "fingerprint", unique=True),
+        Index("ix_rule_ledger_created", "created_at"),
+        Index("ix_rule_ledger_recent", "rule_id", "created_at"),
+    )
@@ -16,7 +16,7 @@ class Task(Base):
     due_at = Column(DateTime(timezone=True))
     completed_at = Column(DateTime(timezone=True))
     source = Column(String(50), default="manual")  # manual, rule_engine, system
-    metadata = Column(JSON, default={})
+    metadata_ = Column("metadata", JSON, default={})  # "metadata" is reserved on declarative models
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
     
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, DateTime, Boolean, Text, JSON
+from sqlalchemy import Column, Integer, String, DateTime, Boolean, Text, JSON, ForeignKey
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from app.database import Base
@@ -31,6 +31,7 @@ class Skill(Base):
     id = Column(Integer, primary_key=True, index=True)
     name = Column(String(100), unique=True, nullable=False)
     category = Column(String(50))
+    synonyms = Column(JSON, default=list)  # other spellings, e.g. ["k8s"] for Kubernetes
     
     user_skills = relationship("UserSkill", back_populates="skill")
 
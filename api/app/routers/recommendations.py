@@ -0,0 +1,47 @@
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select
+from typing import List
+from app.database import get_db
+from app.models.document import Document
+from app.services.auth_service import AuthService
+from app.services.recommendation_cache import get_recommendations, get_document_matches
+from app.schemas.recommendation import RecommendationSchema, OpportunityMatchSchema
+from app.schemas.user import User as UserSchema
+
+router = APIRouter()
+
+@router.get("/", response_model=List[RecommendationSchema])
+async def list_recommendations(
+    limit: int = Query(10, ge=1, le=50),
+    current_user: UserSchema = Depends(AuthService.get_current_user),
+    db: AsyncSession = Depends(get_db)
+):
+    recommendations = await get_recommendations(db, current_user.id, limit=limit)
+    return [
+        RecommendationSchema(opportunity=item['opportunity'], fit_score=item['fit_score'])
+        for item in recommendations
+    ]
+
+@router.get("/resume/{document_id}", response_model=List[OpportunityMatchSchema])
+async def match_resume(
+    document_id: int,
+    limit: int = Query(10, ge=1, le=50),
+    current_user: UserSchema = Depends(AuthService.get_current_user),
+    db: AsyncSession = Depends(get_db)
+):
+    result = await db.execute(
+        select(Document).where(Document.id == document_id, Document.owner_id == current_user.id)
+    )
+    document = result.scalar_one_or_none()
+    if not document:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Document not found"
+        )
+    
+    matches = await get_document_matches(db, document, limit=limit)
+    return [
+        OpportunityMatchSchema(opportunity=item['opportunity'], similarity=item['fit_score'])
+        for item in matches
+    ]
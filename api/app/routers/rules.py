@@ -0,0 +1,45 @@
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.database import get_db
+from app.services.auth_service import AuthService
+from app.services.rules_engine import RulesEngine
+from app.services.rule_profiler import RuleProfiler, load_last_profile
+from app.schemas.rule import RuleProfileSchema, RuleRunSchema
+from app.schemas.user import User as UserSchema
+
+router = APIRouter()
+
+@router.post("/run", response_model=RuleRunSchema)
+async def run_rules(
+    dry_run: bool = Query(True),
+    current_user: UserSchema = Depends(AuthService.get_current_user),
+    db: AsyncSession = Depends(get_db)
+):
+    """Evaluate the current user's rules now, profiled.
+    
+    By default this is a dry run: results show what would fire and nothing
+    is executed or recorded.
+    """
+    profiler = RuleProfiler()
+    engine = RulesEngine(db, dry_run=dry_run, profiler=profiler)
+    results = await engine.process_user_rules(current_user.id)
+    return RuleRunSchema(dry_run=dry_run, results=results, profile=profiler.as_dict())
+
+@router.get("/profile", response_model=RuleProfileSchema)
+async def last_run_profile(
+    current_user: UserSchema = Depends(AuthService.get_current_user)
+):
+    """Profile of the latest scheduled run across all users"""
+    if current_user.role != "owner":
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Not permitted"
+        )
+    
+    profile = await load_last_profile()
+    if profile is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="No rule run has been profiled yet"
+        )
+    return profile
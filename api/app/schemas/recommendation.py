@@ -0,0 +1,16 @@
+from pydantic import BaseModel
+from app.schemas.opportunity import OpportunitySchema
+
+class RecommendationSchema(BaseModel):
+    opportunity: OpportunitySchema
+    fit_score: float
+    
+    class Config:
+        from_attributes = True
+
+class OpportunityMatchSchema(BaseModel):
+    opportunity: OpportunitySchema
+    similarity: float
+    
+    class Config:
+        from_attributes = True
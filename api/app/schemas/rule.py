@@ -0,0 +1,24 @@
+from pydantic import BaseModel
+from typing import Any, Dict, List, Optional
+
+class ProfileStatsSchema(BaseModel):
+    calls: int
+    wall_ms: float
+    queries: int
+    rows: int
+    matches: int
+
+class RankedProfileStatsSchema(ProfileStatsSchema):
+    id: int
+
+class RuleProfileSchema(BaseModel):
+    total: ProfileStatsSchema
+    phases: Dict[str, ProfileStatsSchema]
+    triggers: Dict[str, ProfileStatsSchema]
+    rules: List[RankedProfileStatsSchema]
+    owners: List[RankedProfileStatsSchema]
+
+class RuleRunSchema(BaseModel):
+    dry_run: bool
+    results: List[Dict[str, Any]]
+    profile: RuleProfileSchema
@@ -0,0 +1,147 @@
+from typing import Any, Callable, Dict, Iterable, List, Optional, Set, Tuple, Type
+from itertools import chain
+import asyncio
+import weakref
+import redis
+import redis.asyncio as aioredis
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+from app.config import settings
+import logging
+
+logger = logging.getLogger(__name__)
+
+# asyncio clients hold connections bound to the loop that opened them, so
+# keep one per running loop (Celery tasks each run their own)
+_async_clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, aioredis.Redis]" = weakref.WeakKeyDictionary()
+_sync_client: Optional[redis.Redis] = None
+
+def get_redis() -> aioredis.Redis:
+    """Shared asyncio Redis client for the running event loop"""
+    loop = asyncio.get_running_loop()
+    client = _async_clients.get(loop)
+    if client is None:
+        client = aioredis.Redis.from_url(settings.REDIS_URL, decode_responses=True)
+        _async_clients[loop] = client
+    return client
+
+def get_sync_redis() -> redis.Redis:
+    """Shared blocking Redis client, for code that cannot await"""
+    global _sync_client
+    if _sync_client is None:
+        _sync_client = redis.Redis.from_url(settings.REDIS_URL, decode_responses=True)
+    return _sync_client
+
+# Post-commit Redis writes.
+#
+# Commit hooks run inside AsyncSession.commit() on the event loop, where a
+# blocking Redis call would stall every other request on that loop. On a
+# loop, their commands go out on the loop's asyncio client in a task that
+# ``HookedAsyncSession.commit`` awaits; sessions used without a loop fall
+# back to the blocking client.
+
+POST_COMMIT_TASKS = "post_commit_tasks"
+
+# Strong references, so a task nobody awaits is not collected mid-flight
+_post_commit_tasks: Set[asyncio.Task] = set()
+
+def run_after_commit(session: Session, queue: Callable[[Any], None], failure: str):
+    """Send the commands ``queue(pipeline)`` adds, for a transaction that committed.
+
+    ``failure`` prefixes the warning logged when Redis is unavailable.
+    """
+    try:
+        loop = asyncio.get_running_loop()
+    except RuntimeError:
+        loop = None
+
+    if loop is None:
+        try:
+            pipe = get_sync_redis().pipeline(transaction=False)
+            queue(pipe)
+            pipe.execute()
+        except redis.RedisError as e:
+            logger.warning(f"{failure}: {e}")
+        return
+
+    pipe = get_redis().pipeline(transaction=False)
+    queue(pipe)
+    task = loop.create_task(_execute_pipeline(pipe, failure))
+    _post_commit_tasks.add(task)
+    task.add_done_callback(_post_commit_tasks.discard)
+    session.info.setdefault(POST_COMMIT_TASKS, []).append(task)
+
+async def _execute_pipeline(pipe, failure: str):
+    try:
+        await pipe.execute()
+    except redis.RedisError as e:
+        logger.warning(f"{failure}: {e}")
+
+class HookedAsyncSession(AsyncSession):
+    """AsyncSession whose ``commit`` returns once its post-commit Redis writes are done"""
+
+    async def commit(self):
+        await super().commit()
+        tasks = self.info.pop(POST_COMMIT_TASKS, None)
+        if tasks:
+            await asyncio.gather(*tasks)
+
+# Commit-time invalidation.
+#
+# Handlers registered for a model are called with each new, changed or
+# deleted instance after a flush and return the cache keys it makes stale.
+# Stale keys are deleted (or, for generation counters, incremented) only
+# once the transaction commits, so a rollback never evicts entries for
+# data that did not change.
+
+InvalidationHandler = Callable[[object, str], Iterable[str]]
+
+DELETE = "delete"
+INCREMENT = "incr"
+
+_handlers: Dict[Type, List[Tuple[InvalidationHandler, str]]] = {}
+
+PENDING_KEYS = "cache_invalidation_keys"
+
+def invalidate_on_commit(model: Type, handler: InvalidationHandler, action: str = DELETE):
+    """Register ``handler(instance, change)`` for ``model`` instances.
+
+    ``change`` is one of ``"new"``, ``"dirty"`` or ``"deleted"``. The
+    returned keys are deleted, or incremented when ``action`` is ``INCREMENT``.
+    """
+    _handlers.setdefault(model, []).append((handler, action))
+
+@event.listens_for(Session, "after_flush")
+def _collect_invalidations(session: Session, flush_context):
+    if not _handlers:
+        return
+
+    pending = session.info.setdefault(PENDING_KEYS, {DELETE: set(), INCREMENT: set()})
+    changes = chain(
+        ((obj, "new") for obj in session.new),
+        ((obj, "dirty") for obj in session.dirty),
+        ((obj, "deleted") for obj in session.deleted)
+    )
+    for obj, change in changes:
+        for handler, action in _handlers.get(type(obj), ()):
+            pending[action].update(handler(obj, change))
+
+@event.listens_for(Session, "after_commit")
+def _apply_invalidations(session: Session):
+    pending = session.info.pop(PENDING_KEYS, None)
+    if not pending or not (pending[DELETE] or pending[INCREMENT]):
+        return
+
+    def queue(pipe):
+        if pending[DELETE]:
+            pipe.delete(*pending[DELETE])
+        for key in pending[INCREMENT]:
+            pipe.incr(key)
+
+    # Entries expire on their own TTL; a missed eviction is only stale
+    run_after_commit(session, queue, "Could not invalidate cache keys")
+
+@event.listens_for(Session, "after_rollback")
+def _discard_invalidations(session: Session):
+    session.info.pop(PENDING_KEYS, None)
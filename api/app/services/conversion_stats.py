@@ -0,0 +1,155 @@
+from typing import Dict, Optional, Iterable
+from dataclasses import dataclass, replace
+import enum
+import json
+from datetime import datetime, timedelta, timezone
+import redis
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select, func, case, and_
+from sqlalchemy import inspect as sa_inspect
+from app.models.application import Application
+from app.models.opportunity import Opportunity
+from app.services.cache import get_redis, invalidate_on_commit
+import logging
+
+logger = logging.getLogger(__name__)
+
+SUCCESS_STATUSES = ('offer', 'accepted')
+RECENT_WINDOW_DAYS = 90
+CACHE_TTL_SECONDS = 3600
+
+def _kind_key(kind) -> str:
+    return kind.value if isinstance(kind, enum.Enum) else str(kind)
+
+def cache_key(user_id: int) -> str:
+    return f"conversion_stats:{user_id}"
+
+@dataclass(frozen=True)
+class KindStats:
+    """Application outcomes for one opportunity type"""
+    total: int = 0
+    successes: int = 0
+    recent_total: int = 0
+    recent_successes: int = 0
+
+class ConversionStats:
+    """Per-user application outcomes grouped by ``OpportunityType``"""
+
+    def __init__(self, by_kind: Optional[Dict[str, KindStats]] = None):
+        self.by_kind = by_kind or {}
+
+    @classmethod
+    async def load(
+        cls,
+        db: AsyncSession,
+        user_id: int,
+        exclude_application_id: Optional[int] = None
+    ) -> "ConversionStats":
+        """Aggregate a user's applications with a single grouped query"""
+        cutoff = datetime.now(timezone.utc) - timedelta(days=RECENT_WINDOW_DAYS)
+        successful = Application.status.in_(SUCCESS_STATUSES)
+        recent = Application.created_at > cutoff
+
+        query = (
+            select(
+                Opportunity.kind,
+                func.count(Application.id),
+                func.sum(case((successful, 1), else_=0)),
+                func.sum(case((recent, 1), else_=0)),
+                func.sum(case((and_(successful, recent), 1), else_=0))
+            )
+            .join(Opportunity, Application.opportunity_id == Opportunity.id)
+            .where(Application.user_id == user_id)
+            .group_by(Opportunity.kind)
+        )
+        if exclude_application_id is not None:
+            query = query.where(Application.id != exclude_application_id)
+
+        result = await db.execute(query)
+        return cls({
+            _kind_key(kind): KindStats(int(total), int(successes or 0), int(recent_total or 0), int(recent_successes or 0))
+            for kind, total, successes, recent_total, recent_successes in result.all()
+        })
+
+    @classmethod
+    async def for_user(cls, db: AsyncSession, user_id: int) -> "ConversionStats":
+        """Cached stats for a user, computed on a miss"""
+        client = get_redis()
+        try:
+            cached = await client.get(cache_key(user_id))
+            if cached:
+                return cls.from_json(cached)
+        except redis.RedisError as e:
+            logger.warning(f"Conversion stats cache unavailable: {e}")
+            return await cls.load(db, user_id)
+
+        stats = await cls.load(db, user_id)
+        try:
+            await client.set(cache_key(user_id), stats.to_json(), ex=CACHE_TTL_SECONDS)
+        except redis.RedisError as e:
+            logger.warning(f"Could not cache conversion stats for user {user_id}: {e}")
+        return stats
+
+    @property
+    def total(self) -> int:
+        return sum(stats.total for stats in self.by_kind.values())
+
+    def likelihood(self, kind) -> float:
+        """Likelihood of success (0-100) for an opportunity type"""
+        if not self.total:
+            return 50.0  # Neutral score for new users
+
+        stats = self.by_kind.get(_kind_key(kind))
+        if not stats or not stats.total:
+            return 50.0
+
+        success_rate = stats.successes / stats.total
+
+        # Weight recent performance more heavily
+        if stats.recent_total:
+            recent_success_rate = stats.recent_successes / stats.recent_total
+            return ((success_rate * 0.4) + (recent_success_rate * 0.6)) * 100.0
+
+        return success_rate * 100.0
+
+    def without(self, kind, status: Optional[str], created_at: Optional[datetime]) -> "ConversionStats":
+        """Stats with one application removed, e.g. the one being scored"""
+        key = _kind_key(kind)
+        stats = self.by_kind.get(key)
+        if not stats or not stats.total:
+            return self
+
+        successful = int(status in SUCCESS_STATUSES)
+        recent = int(
+            created_at is not None and
+            created_at > datetime.now(created_at.tzinfo) - timedelta(days=RECENT_WINDOW_DAYS)
+        )
+
+        by_kind = dict(self.by_kind)
+        by_kind[key] = replace(
+            stats,
+            total=stats.total - 1,
+            successes=max(stats.successes - successful, 0),
+            recent_total=max(stats.recent_total - recent, 0),
+            recent_successes=max(stats.recent_successes - (successful & recent), 0)
+        )
+        return ConversionStats(by_kind)
+
+    def to_json(self) -> str:
+        return json.dumps({
+            kind: [stats.total, stats.successes, stats.recent_total, stats.recent_successes]
+            for kind, stats in self.by_kind.items()
+        })
+
+    @classmethod
+    def from_json(cls, data: str) -> "ConversionStats":
+        return cls({kind: KindStats(*values) for kind, values in json.loads(data).items()})
+
+def _application_invalidations(application: Application, change: str) -> Iterable[str]:
+    if change == "dirty":
+        state = sa_inspect(application)
+        if not (state.attrs.status.history.has_changes() or state.attrs.opportunity_id.history.has_changes()):
+            return ()
+    return (cache_key(application.user_id),)
+
+invalidate_on_commit(Application, _application_invalidations)
@@ -0,0 +1,142 @@
+from typing import Dict, List, Optional, Sequence, Tuple
+from datetime import datetime, timedelta, timezone
+from sqlalchemy import select, delete, exists, tuple_
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import contains_eager
+from app.config import settings
+from app.models.application import Application, DeadlineReminder
+from app.models.opportunity import Opportunity
+from app.models.user import User
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Applications still worth a nudge before the deadline
+REMINDER_STATUSES = ('to_apply', 'applied')
+
+def _aware(value: datetime) -> datetime:
+    # SQLite hands back naive datetimes; they are stored as UTC
+    return value if value.tzinfo else value.replace(tzinfo=timezone.utc)
+
+def render_reminder(user: User, applications: Sequence[Application], now: datetime) -> Tuple[str, str]:
+    """One message covering every approaching deadline of a user"""
+    def hours_left(app: Application) -> float:
+        return (_aware(app.opportunity.deadline_at) - now).total_seconds() / 3600
+
+    sections = []
+    for app in applications:
+        opportunity = app.opportunity
+        organization = opportunity.organization.name if opportunity.organization else 'Unknown organization'
+        sections.append(
+            f"""
+            "{opportunity.title}" at {organization}
+            ⏰ Deadline: {opportunity.deadline_at.strftime('%B %d, %Y at %I:%M %p')}
+            ⏳ Time Remaining: {hours_left(app):.0f} hours
+            📍 Status: {app.status.replace('_', ' ').title()}
+            {'🚀 Time to submit your application!' if app.status == 'to_apply' else '📞 Consider following up on your application.'}
+            """
+        )
+
+    first = applications[0].opportunity
+    if len(applications) == 1:
+        subject = f"⏰ Deadline Alert: {first.title} - {hours_left(applications[0]):.0f} hours left"
+    else:
+        subject = f"⏰ Deadline Alert: {len(applications)} deadlines approaching, first {first.title}"
+
+    body = f"""
+            Hi {user.full_name},
+
+            The following deadlines are approaching:
+            {''.join(sections)}
+            Good luck!
+            Student CRM Team
+            """
+    return subject, body
+
+class DeadlineReminderPlanner:
+    """Finds the deadline reminders to send and records them as sent.
+
+    ``plan`` is a single query, joined and eagerly loaded, over active
+    opportunities whose deadline falls within the lead time, skipping
+    applications already reminded for that deadline. ``claim`` writes the
+    ledger rows before sending, so overlapping runs never send twice, and
+    ``release`` gives up the claim for messages that could not be sent.
+    """
+
+    def __init__(self, db: AsyncSession, lead: Optional[timedelta] = None):
+        self.db = db
+        self.lead = lead or timedelta(hours=settings.DEADLINE_REMINDER_HOURS)
+
+    async def plan(self, now: Optional[datetime] = None) -> List[Tuple[User, List[Application]]]:
+        """Unreminded applications with an approaching deadline, grouped per user"""
+        now = now or datetime.now(timezone.utc)
+        already_sent = exists().where(
+            DeadlineReminder.application_id == Application.id,
+            DeadlineReminder.deadline_at == Opportunity.deadline_at
+        )
+        result = await self.db.execute(
+            select(Application)
+            .join(Application.opportunity)
+            .join(Application.user)
+            .outerjoin(Opportunity.organization)
+            .options(
+                contains_eager(Application.opportunity).contains_eager(Opportunity.organization),
+                contains_eager(Application.user)
+            )
+            .where(
+                # Matches ix_opportunities_active_deadline
+                Opportunity.status == 'active',
+                Opportunity.deadline_at > now,
+                Opportunity.deadline_at <= now + self.lead,
+                Application.status.in_(REMINDER_STATUSES),
+                ~already_sent
+            )
+            .order_by(Application.user_id, Opportunity.deadline_at)
+        )
+
+        grouped: Dict[int, Tuple[User, List[Application]]] = {}
+        for app in result.scalars().unique():
+            grouped.setdefault(app.user_id, (app.user, []))[1].append(app)
+        return list(grouped.values())
+
+    def _insert(self):
+        dialect = self.db.get_bind().dialect.name
+        if dialect == 'postgresql':
+            return postgresql.insert(DeadlineReminder)
+        if dialect == 'sqlite':
+            return sqlite.insert(DeadlineReminder)
+        raise NotImplementedError(f"Deadline reminder ledger does not support {dialect}")
+
+    async def claim(self, applications: Sequence[Application]) -> List[Application]:
+        """Record reminders as sent; returns the applications this call claimed"""
+        if not applications:
+            return []
+
+        stmt = (
+            self._insert()
+            .values([
+                {'application_id': app.id, 'deadline_at': app.opportunity.deadline_at}
+                for app in applications
+            ])
+            .on_conflict_do_nothing(index_elements=['application_id', 'deadline_at'])
+            .returning(DeadlineReminder.application_id)
+        )
+        result = await self.db.execute(stmt)
+        claimed = set(result.scalars().all())
+        await self.db.commit()
+        return [app for app in applications if app.id in claimed]
+
+    async def release(self, applications: Sequence[Application]):
+        """Forget claims whose message was not sent, so the next run retries them"""
+        if not applications:
+            return
+
+        await self.db.execute(
+            delete(DeadlineReminder).where(
+                tuple_(DeadlineReminder.application_id, DeadlineReminder.deadline_at).in_([
+                    (app.id, app.opportunity.deadline_at) for app in applications
+                ])
+            )
+        )
+        await self.db.commit()
@@ -0,0 +1,140 @@
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+from datetime import datetime, timezone
+import json
+import redis.asyncio as aioredis
+from app.config import settings
+from app.services.cache import get_redis
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Digest lists keyed by window and recipient, scored by when their window closes
+PENDING_DIGESTS = "email_digest:pending"
+
+# Bound on how long an unflushed digest survives, e.g. while no flusher runs
+# or its sends keep failing
+DIGEST_TTL = 7 * 24 * 3600
+
+# Claimed digests, scored by when their lease runs out; a digest not
+# acknowledged by then (e.g. its flusher died) goes back to PENDING_DIGESTS
+LEASED_DIGESTS = "email_digest:leased"
+DIGEST_LEASE_SECONDS = 600
+
+# Delay before a digest whose send failed is retried
+DIGEST_RETRY_SECONDS = 300
+
+def recipient_for(to: Optional[str], user_id: int) -> str:
+    """Digest recipient: an explicit address, else the user's own (resolved on flush)"""
+    return to or f"user:{user_id}"
+
+def render_digest(emails: List[Dict[str, Any]]) -> Tuple[str, str]:
+    """One message for everything collected for a recipient"""
+    if len(emails) == 1:
+        return emails[0]['subject'], emails[0]['body']
+
+    subject = f"{len(emails)} updates from your Student CRM rules"
+    sections = [
+        f"{email['subject']}\n{'-' * len(email['subject'])}\n{email['body']}"
+        for email in emails
+    ]
+    return subject, "\n\n".join(sections)
+
+class EmailDigest:
+    """Redis buffer combining rule emails per recipient and time window.
+
+    ``add`` appends messages to the recipient's list for the current window;
+    ``claim_due`` leases out the lists whose window has closed, each to one
+    flusher, to send as one email. The list is only deleted by ``ack`` once
+    the email is sent; ``release`` (or an expired lease) hands it out again.
+    """
+
+    def __init__(self, client: Optional[aioredis.Redis] = None):
+        self.client = client or get_redis()
+
+    async def add(self, emails: Iterable[Dict[str, Any]], now: Optional[float] = None) -> int:
+        """Buffer ``{'recipient', 'user_id', 'subject', 'body'}`` messages"""
+        window_seconds = settings.EMAIL_DIGEST_WINDOW_MINUTES * 60
+        now = datetime.now(timezone.utc).timestamp() if now is None else now
+        window = int(now // window_seconds)
+        closes_at = (window + 1) * window_seconds
+
+        pipe = self.client.pipeline(transaction=False)
+        count = 0
+        for email in emails:
+            key = f"email_digest:{window}:{email['recipient']}"
+            pipe.rpush(key, json.dumps(email))
+            pipe.expire(key, DIGEST_TTL)
+            pipe.zadd(PENDING_DIGESTS, {key: closes_at}, nx=True)
+            count += 1
+
+        if count:
+            await pipe.execute()
+        return count
+
+    async def claim_due(self, now: Optional[float] = None, limit: int = 1000) -> List[Tuple[str, str, List[Dict[str, Any]]]]:
+        """Lease (key, recipient, messages) for closed windows"""
+        now = datetime.now(timezone.utc).timestamp() if now is None else now
+        await self._requeue_expired(now)
+
+        keys = await self.client.zrangebyscore(PENDING_DIGESTS, '-inf', now, start=0, num=limit)
+        if not keys:
+            return []
+
+        # Concurrent flushers race on ZREM; each digest goes to one of them
+        pipe = self.client.pipeline(transaction=False)
+        for key in keys:
+            pipe.zrem(PENDING_DIGESTS, key)
+        owned = [key for key, removed in zip(keys, await pipe.execute()) if removed]
+        if not owned:
+            return []
+
+        pipe = self.client.pipeline(transaction=True)
+        pipe.zadd(LEASED_DIGESTS, {key: now + DIGEST_LEASE_SECONDS for key in owned})
+        for key in owned:
+            pipe.lrange(key, 0, -1)
+        replies = (await pipe.execute())[1:]
+
+        # Lists that expired leave nothing to send
+        empty = [key for key, items in zip(owned, replies) if not items]
+        if empty:
+            await self.ack(empty)
+
+        return [
+            (key, key.split(":", 2)[2], [json.loads(item) for item in items])
+            for key, items in zip(owned, replies)
+            if items
+        ]
+
+    async def _requeue_expired(self, now: float):
+        expired = await self.client.zrangebyscore(LEASED_DIGESTS, '-inf', now)
+        if not expired:
+            return
+
+        pipe = self.client.pipeline(transaction=False)
+        for key in expired:
+            pipe.zrem(LEASED_DIGESTS, key)
+        owned = [key for key, removed in zip(expired, await pipe.execute()) if removed]
+        if owned:
+            logger.warning(f"Requeueing {len(owned)} email digests whose lease expired")
+            await self.client.zadd(PENDING_DIGESTS, {key: now for key in owned})
+
+    async def ack(self, keys: Iterable[str]):
+        """Drop digests that were sent"""
+        keys = list(keys)
+        if not keys:
+            return
+        pipe = self.client.pipeline(transaction=True)
+        pipe.zrem(LEASED_DIGESTS, *keys)
+        pipe.delete(*keys)
+        await pipe.execute()
+
+    async def release(self, keys: Iterable[str], now: Optional[float] = None):
+        """Queue digests whose send failed for another try in ``DIGEST_RETRY_SECONDS``"""
+        keys = list(keys)
+        if not keys:
+            return
+        now = datetime.now(timezone.utc).timestamp() if now is None else now
+        pipe = self.client.pipeline(transaction=True)
+        pipe.zrem(LEASED_DIGESTS, *keys)
+        pipe.zadd(PENDING_DIGESTS, {key: now + DIGEST_RETRY_SECONDS for key in keys})
+        await pipe.execute()
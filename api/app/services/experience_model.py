@@ -0,0 +1,187 @@
+from typing import Optional, Sequence
+import json
+import os
+import shutil
+import threading
+import uuid
+from datetime import datetime
+import joblib
+import numpy as np
+from scipy import sparse
+from sklearn.feature_extraction.text import TfidfVectorizer
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select
+from app.config import settings
+from app.models.opportunity import Opportunity
+import logging
+
+logger = logging.getLogger(__name__)
+
+MODEL_DIR = os.path.join(settings.INDEX_DIR, "experience_tfidf")
+CURRENT_FILE = "CURRENT"
+KEEP_VERSIONS = 2
+
+class ExperienceModel:
+    """TF-IDF model fitted once over the opportunity description corpus.
+
+    Per-opportunity vectors are stored as one L2-normalised CSR matrix whose
+    rows line up with the sorted ``opportunity_ids`` array, so experience
+    similarity is a sparse dot product against a cached row.
+    """
+
+    def __init__(
+        self,
+        vectorizer: TfidfVectorizer,
+        vectors: sparse.csr_matrix,
+        opportunity_ids: np.ndarray,
+        version: str
+    ):
+        self.vectorizer = vectorizer
+        self.vectors = vectors
+        self.opportunity_ids = opportunity_ids
+        self.version = version
+
+    @classmethod
+    async def fit(cls, db: AsyncSession) -> "ExperienceModel":
+        """Fit the vectorizer over every opportunity description"""
+        result = await db.stream(
+            select(Opportunity.id, Opportunity.jd_text)
+            .where(Opportunity.jd_text != None, Opportunity.jd_text != "")
+            .order_by(Opportunity.id)
+            .execution_options(yield_per=5000)
+        )
+
+        opportunity_ids = []
+        texts = []
+        async for opportunity_id, jd_text in result:
+            opportunity_ids.append(opportunity_id)
+            texts.append(jd_text)
+
+        vectorizer = TfidfVectorizer(
+            stop_words='english',
+            max_features=settings.EXPERIENCE_MODEL_MAX_FEATURES,
+            dtype=np.float32
+        )
+        vectors = vectorizer.fit_transform(texts).tocsr()
+
+        version = f"{datetime.utcnow():%Y%m%d%H%M%S}-{uuid.uuid4().hex[:8]}"
+        logger.info(f"Fitted experience model {version} on {len(texts)} descriptions")
+
+        return cls(vectorizer, vectors, np.asarray(opportunity_ids, dtype=np.int64), version)
+
+    def save(self, model_dir: str = MODEL_DIR):
+        """Write this model as a new version and point CURRENT at it"""
+        version_dir = os.path.join(model_dir, self.version)
+        os.makedirs(version_dir, exist_ok=True)
+
+        joblib.dump(self.vectorizer, os.path.join(version_dir, "vectorizer.joblib"))
+        np.save(os.path.join(version_dir, "data.npy"), self.vectors.data)
+        np.save(os.path.join(version_dir, "indices.npy"), self.vectors.indices)
+        np.save(os.path.join(version_dir, "indptr.npy"), self.vectors.indptr)
+        np.save(os.path.join(version_dir, "opportunity_ids.npy"), self.opportunity_ids)
+
+        with open(os.path.join(version_dir, "meta.json"), "w") as f:
+            json.dump({
+                'version': self.version,
+                'documents': int(self.vectors.shape[0]),
+                'features': int(self.vectors.shape[1])
+            }, f)
+
+        # Atomically switch readers over to the new version
+        tmp_path = os.path.join(model_dir, f".{CURRENT_FILE}.{self.version}")
+        with open(tmp_path, "w") as f:
+            f.write(self.version)
+        os.replace(tmp_path, os.path.join(model_dir, CURRENT_FILE))
+
+        self._prune_versions(model_dir)
+
+    def _prune_versions(self, model_dir: str):
+        versions = sorted(
+            entry for entry in os.listdir(model_dir)
+            if os.path.isdir(os.path.join(model_dir, entry))
+        )
+        for old_version in versions[:-KEEP_VERSIONS]:
+            shutil.rmtree(os.path.join(model_dir, old_version), ignore_errors=True)
+
+    @classmethod
+    def load(cls, model_dir: str = MODEL_DIR, version: Optional[str] = None) -> Optional["ExperienceModel"]:
+        """Load a saved model with its vectors memory-mapped from disk"""
+        version = version or read_current_version(model_dir)
+        if not version:
+            return None
+
+        version_dir = os.path.join(model_dir, version)
+        vectorizer = joblib.load(os.path.join(version_dir, "vectorizer.joblib"))
+
+        def _load(name: str) -> np.ndarray:
+            return np.load(os.path.join(version_dir, name), mmap_mode='r')
+
+        opportunity_ids = _load("opportunity_ids.npy")
+        vectors = sparse.csr_matrix(
+            (_load("data.npy"), _load("indices.npy"), _load("indptr.npy")),
+            shape=(len(opportunity_ids), len(vectorizer.vocabulary_)),
+            copy=False
+        )
+
+        return cls(vectorizer, vectors, opportunity_ids, version)
+
+    def vectors_for(self, opportunities: Sequence[Opportunity]) -> sparse.csr_matrix:
+        """Return one TF-IDF row per opportunity, from cache where possible"""
+        ids = np.fromiter((opp.id or -1 for opp in opportunities), dtype=np.int64, count=len(opportunities))
+        cached = np.zeros(len(ids), dtype=bool)
+        positions = np.zeros(len(ids), dtype=np.int64)
+
+        if len(self.opportunity_ids):
+            positions = np.minimum(
+                np.searchsorted(self.opportunity_ids, ids),
+                len(self.opportunity_ids) - 1
+            )
+            cached = self.opportunity_ids[positions] == ids
+
+        # Opportunities added since the last fit are transformed, not refitted
+        missing = np.flatnonzero(~cached)
+        fresh = self.vectorizer.transform([opportunities[i].jd_text or "" for i in missing])
+
+        stacked = sparse.vstack([self.vectors[positions[cached]], fresh], format='csr')
+        order = np.concatenate([np.flatnonzero(cached), missing])
+        return stacked[np.argsort(order)]
+
+    def similarity(self, text: str, opportunities: Sequence[Opportunity]) -> np.ndarray:
+        """Cosine similarity (0-1) between a text and each opportunity"""
+        query = self.vectorizer.transform([text])
+        return np.asarray((self.vectors_for(opportunities) @ query.T).todense()).ravel()
+
+def read_current_version(model_dir: str = MODEL_DIR) -> Optional[str]:
+    try:
+        with open(os.path.join(model_dir, CURRENT_FILE)) as f:
+            return f.read().strip() or None
+    except FileNotFoundError:
+        return None
+
+_model_lock = threading.Lock()
+_loaded_model: Optional[ExperienceModel] = None
+
+def get_experience_model(model_dir: str = MODEL_DIR) -> Optional[ExperienceModel]:
+    """Return the current saved model, reloading after a refit"""
+    global _loaded_model
+
+    version = read_current_version(model_dir)
+    if not version:
+        return None
+    if _loaded_model is not None and _loaded_model.version == version:
+        return _loaded_model
+
+    with _model_lock:
+        if _loaded_model is None or _loaded_model.version != version:
+            try:
+                _loaded_model = ExperienceModel.load(model_dir, version)
+            except (OSError, ValueError) as e:
+                logger.warning(f"Could not load experience model {version}: {e}")
+                return _loaded_model
+        return _loaded_model
+
+async def refit_experience_model(db: AsyncSession, model_dir: str = MODEL_DIR) -> ExperienceModel:
+    """Fit a new model over the current corpus and publish it"""
+    model = await ExperienceModel.fit(db)
+    model.save(model_dir)
+    return model
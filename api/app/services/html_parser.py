@@ -0,0 +1,246 @@
+"""HTML parsing backends for the scrapers.
+
+``parse_html`` parses a page with the fastest backend installed:
+selectolax, then lxml, then BeautifulSoup (``SCRAPE_PARSER`` forces one).
+Each site has a ``SiteSpec`` of CSS selectors per field; text is only
+extracted from the first element a field's selectors match, never from the
+whole document. When every selector of a spec is a simple compound selector
+(``tag.class``, ``#id``, ``[attr*="value"]``), the BeautifulSoup fallback
+also parses only those subtrees, via a ``SoupStrainer``.
+"""
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+from abc import ABC, abstractmethod
+from dataclasses import dataclass
+from functools import lru_cache
+from urllib.parse import urlsplit
+import re
+from bs4 import BeautifulSoup, SoupStrainer
+from app.config import settings
+import logging
+
+try:
+    from selectolax.lexbor import LexborHTMLParser
+except ImportError:
+    LexborHTMLParser = None
+
+try:
+    import lxml.html
+    from lxml import etree
+    from lxml.cssselect import CSSSelector
+except ImportError:
+    lxml = None
+
+logger = logging.getLogger(__name__)
+
+# Never part of the visible text
+_SKIPPED_TAGS = ('script', 'style', 'noscript', 'template')
+
+@dataclass(frozen=True)
+class SiteSpec:
+    """Selectors per field, tried in order; the first non-empty match wins"""
+    name: str
+    title: Tuple[str, ...]
+    company: Tuple[str, ...]
+    location: Tuple[str, ...] = ()
+    description: Tuple[str, ...] = ()
+    # False when a field may fall back to a large part of the page (e.g. body)
+    partial: bool = True
+
+    @property
+    def selectors(self) -> Tuple[str, ...]:
+        return self.title + self.company + self.location + self.description
+
+SITE_SPECS: Dict[str, SiteSpec] = {
+    'linkedin.com': SiteSpec(
+        name='linkedin',
+        title=('h1.top-card-layout__title', 'h1.topcard__title'),
+        company=('a.topcard__org-name-link', 'span.topcard__flavor'),
+        location=('span.topcard__flavor--bullet',),
+        description=('div.show-more-less-html__markup', 'div.description__text')
+    ),
+    'indeed.com': SiteSpec(
+        name='indeed',
+        title=('h1.jobsearch-JobInfoHeader-title', '[data-testid="jobsearch-JobInfoHeader-title"]'),
+        company=('[data-testid="inlineHeader-companyName"]', '[data-company-name]'),
+        location=('[data-testid="inlineHeader-companyLocation"]', '[data-testid="job-location"]'),
+        description=('#jobDescriptionText',)
+    ),
+    'glassdoor.com': SiteSpec(
+        name='glassdoor',
+        title=('[data-test="job-title"]', 'h1[id^="jd-job-title"]'),
+        company=('[data-test="employer-name"]', '[class*="EmployerProfile_employerName"]'),
+        location=('[data-test="location"]',),
+        description=('div.jobDescriptionContent', '[class*="JobDetails_jobDescription"]')
+    ),
+}
+
+GENERIC_SPEC = SiteSpec(
+    name='generic',
+    title=('h1', '.job-title', '.title', '[class*="title"]'),
+    company=('.company', '.employer', '[class*="company"]', '[class*="employer"]'),
+    location=('[class*="location"]',),
+    description=('[class*="description"]', 'main', 'article', 'body'),
+    partial=False
+)
+
+def site_spec(url: str) -> SiteSpec:
+    host = urlsplit(url).netloc.lower()
+    for domain, spec in SITE_SPECS.items():
+        if host == domain or host.endswith(f".{domain}"):
+            return spec
+    return GENERIC_SPEC
+
+class ParsedPage(ABC):
+    backend = ''
+
+    @abstractmethod
+    def _select_one(self, selector: str) -> Any:
+        """First element matching ``selector``, or None"""
+
+    @abstractmethod
+    def _text(self, node: Any, separator: str) -> str:
+        """Visible text of ``node``, stripped and joined by ``separator``"""
+
+    def text(self, selectors: Sequence[str], separator: str = ' ') -> Optional[str]:
+        """Stripped text of the first element matching one of ``selectors``"""
+        for selector in selectors:
+            node = self._select_one(selector)
+            if node is not None:
+                text = self._text(node, separator)
+                if text:
+                    return text
+        return None
+
+class SelectolaxPage(ParsedPage):
+    backend = 'selectolax'
+
+    def __init__(self, content: bytes):
+        self.tree = LexborHTMLParser(content)
+        self.tree.strip_tags(list(_SKIPPED_TAGS))
+
+    def _select_one(self, selector: str):
+        return self.tree.css_first(selector)
+
+    def _text(self, node, separator: str) -> str:
+        # Whitespace-only nodes strip to empty strings but still get a separator
+        parts = node.text(deep=True, separator='\0', strip=True).split('\0')
+        return separator.join(part for part in parts if part)
+
+@lru_cache(maxsize=256)
+def _css(selector: str):
+    return CSSSelector(selector)
+
+if lxml is not None:
+    _VISIBLE_TEXT = etree.XPath(
+        "descendant-or-self::text()[not(ancestor::script or ancestor::style or ancestor::noscript or ancestor::template)]"
+    )
+
+class LxmlPage(ParsedPage):
+    backend = 'lxml'
+
+    def __init__(self, content: bytes):
+        try:
+            self.root = lxml.html.fromstring(content)
+        except etree.ParserError:
+            # Empty or whitespace-only document
+            self.root = None
+
+    def _select_one(self, selector: str):
+        if self.root is None:
+            return None
+        matches = _css(selector)(self.root)
+        return matches[0] if matches else None
+
+    def _text(self, node, separator: str) -> str:
+        return separator.join(part.strip() for part in _VISIBLE_TEXT(node) if part.strip())
+
+class SoupPage(ParsedPage):
+    backend = 'bs4'
+
+    def __init__(self, content: bytes, spec: Optional[SiteSpec] = None):
+        strainer = _strainer(spec) if spec is not None and spec.partial else None
+        features = 'lxml' if lxml is not None else 'html.parser'
+        self.soup = BeautifulSoup(content, features, parse_only=strainer)
+        for tag in self.soup(_SKIPPED_TAGS):
+            tag.decompose()
+
+    def _select_one(self, selector: str):
+        return self.soup.select_one(selector)
+
+    def _text(self, node, separator: str) -> str:
+        return node.get_text(separator=separator, strip=True)
+
+# A tag with optional #id, .class and [attr], [attr="v"], [attr*="v"],
+# [attr^="v"] or [attr$="v"] parts, and no combinators
+_COMPOUND = re.compile(r'^([a-zA-Z][\w-]*)?((?:[.#][\w-]+|\[[^\]]+\])*)$')
+_COMPOUND_PART = re.compile(r'\.([\w-]+)|#([\w-]+)|\[\s*([\w-]+)\s*(?:([*^$]?=)\s*"?([^"\]]*)"?\s*)?\]')
+
+def _compound_matcher(selector: str) -> Optional[Callable[[str, Dict], bool]]:
+    """Predicate on (tag name, attributes) for a simple selector, else None"""
+    match = _COMPOUND.match(selector.strip())
+    if not match:
+        return None
+    tag, rest = match.group(1), match.group(2)
+    checks: List[Tuple[str, str, Optional[str]]] = []
+    for part in _COMPOUND_PART.finditer(rest):
+        class_name, element_id, attribute, operator, value = part.groups()
+        if class_name:
+            checks.append(('class', '~=', class_name))
+        elif element_id:
+            checks.append(('id', '=', element_id))
+        else:
+            checks.append((attribute, operator, value))
+
+    def matches(name: str, attrs: Dict) -> bool:
+        if tag and name != tag.lower():
+            return False
+        for attribute, operator, expected in checks:
+            actual = attrs.get(attribute)
+            if actual is None:
+                return False
+            if isinstance(actual, list):
+                actual = ' '.join(actual)
+            if operator == '~=' and expected not in actual.split():
+                return False
+            if operator == '=' and actual != expected:
+                return False
+            if operator == '*=' and expected not in actual:
+                return False
+            if operator == '^=' and not actual.startswith(expected):
+                return False
+            if operator == '$=' and not actual.endswith(expected):
+                return False
+        return True
+
+    return matches
+
+@lru_cache(maxsize=None)
+def _strainer(spec: SiteSpec) -> Optional[SoupStrainer]:
+    """Keep only the subtrees the spec's selectors can match"""
+    matchers = [_compound_matcher(selector) for selector in spec.selectors]
+    if not all(matchers):
+        logger.warning(f"Parsing {spec.name} pages in full: not every selector is a simple compound selector")
+        return None
+    return SoupStrainer(lambda name, attrs: any(matcher(name, attrs) for matcher in matchers))
+
+def available_backends() -> List[str]:
+    backends = []
+    if LexborHTMLParser is not None:
+        backends.append('selectolax')
+    if lxml is not None:
+        backends.append('lxml')
+    backends.append('bs4')
+    return backends
+
+def parse_html(content: bytes, spec: Optional[SiteSpec] = None, backend: Optional[str] = None) -> ParsedPage:
+    """Parse with ``backend``, else ``SCRAPE_PARSER``, else the fastest available"""
+    backend = backend or settings.SCRAPE_PARSER
+    if backend == 'auto':
+        backend = available_backends()[0]
+    if backend == 'selectolax' and LexborHTMLParser is not None:
+        return SelectolaxPage(content)
+    if backend == 'lxml' and lxml is not None:
+        return LxmlPage(content)
+    if backend not in ('bs4', 'selectolax', 'lxml'):
+        raise ValueError(f"Unknown HTML parser backend: {backend}")
+    return SoupPage(content, spec)
@@ -0,0 +1,178 @@
+from typing import Any, Dict, Optional, Tuple
+from collections import Counter
+from hashlib import blake2b
+import re
+import numpy as np
+from sqlalchemy import select, tuple_
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.config import settings
+from app.models.opportunity import Opportunity, OpportunitySimhashBand, Organization, canonicalize_url, simhash_bands, SIMHASH_BANDS
+import logging
+
+logger = logging.getLogger(__name__)
+
+_TOKEN = re.compile(r"[a-z0-9+#]+")
+
+# Below this many words a posting is too short to fingerprint reliably
+SIMHASH_MIN_TOKENS = 20
+
+# Refreshed from a re-scrape of the same URL; near-duplicates from other
+# boards only fill in what is missing
+_CONTENT_FIELDS = ('title', 'location', 'mode', 'jd_text', 'skills_required', 'salary_min', 'salary_max', 'deadline_at')
+
+def _signed64(value: int) -> int:
+    # BigInteger columns are signed
+    return value - (1 << 64) if value >= (1 << 63) else value
+
+def content_simhash(title: str, company: str, text: str) -> Optional[int]:
+    """64-bit SimHash over word 3-shingles of the posting, weighted by count"""
+    tokens = _TOKEN.findall(f"{title or ''} {company or ''} {text or ''}".lower())
+    if len(tokens) < SIMHASH_MIN_TOKENS:
+        return None
+
+    shingles = Counter(" ".join(tokens[i:i + 3]) for i in range(len(tokens) - 2))
+    hashes = np.fromiter(
+        (int.from_bytes(blake2b(shingle.encode(), digest_size=8).digest(), 'little') for shingle in shingles),
+        dtype=np.uint64,
+        count=len(shingles)
+    )
+    weights = np.fromiter(shingles.values(), dtype=np.int64, count=len(shingles))
+
+    # One row of 64 bits per shingle; each bit votes +weight or -weight
+    bits = np.unpackbits(hashes.astype('<u8').view(np.uint8).reshape(-1, 8), axis=1, bitorder='little')
+    votes = (weights[:, None] * (2 * bits.astype(np.int64) - 1)).sum(axis=0)
+    value = int(np.packbits(votes > 0, bitorder='little').view('<u8')[0])
+    return _signed64(value)
+
+def hamming_distance(a: int, b: int) -> int:
+    return bin((a ^ b) & 0xFFFFFFFFFFFFFFFF).count('1')
+
+class OpportunityDeduplicator:
+    """Finds the existing row for a posting before a new one is inserted.
+
+    A posting is the same as an existing opportunity when its canonical URL
+    matches (unique index), or when its content SimHash is within
+    ``OPPORTUNITY_SIMHASH_MAX_DISTANCE`` bits of one, e.g. the same job on
+    another board. Near-duplicates are found through the SimHash band index,
+    so the check costs a few indexed lookups whatever the table size.
+    """
+
+    def __init__(self, db: AsyncSession, max_distance: Optional[int] = None):
+        self.db = db
+        self.max_distance = settings.OPPORTUNITY_SIMHASH_MAX_DISTANCE if max_distance is None else max_distance
+        if self.max_distance >= SIMHASH_BANDS:
+            logger.warning(f"SimHash distance {self.max_distance} exceeds what {SIMHASH_BANDS} bands guarantee to find")
+
+    async def find(self, canonical_url: Optional[str], simhash: Optional[int]) -> Tuple[Optional[Opportunity], Optional[str]]:
+        """The matching opportunity and how it matched ('url' or 'content')"""
+        if canonical_url:
+            result = await self.db.execute(select(Opportunity).where(Opportunity.canonical_url == canonical_url))
+            opportunity = result.scalar_one_or_none()
+            if opportunity is not None:
+                return opportunity, 'url'
+
+        if simhash is not None:
+            result = await self.db.execute(
+                select(Opportunity.id, Opportunity.content_simhash)
+                .join(OpportunitySimhashBand, OpportunitySimhashBand.opportunity_id == Opportunity.id)
+                .where(tuple_(OpportunitySimhashBand.band, OpportunitySimhashBand.value).in_(simhash_bands(simhash)))
+                .distinct()
+            )
+            candidates = [
+                (hamming_distance(simhash, other), opportunity_id)
+                for opportunity_id, other in result.all()
+                if other is not None
+            ]
+            candidates = [candidate for candidate in candidates if candidate[0] <= self.max_distance]
+            if candidates:
+                return await self.db.get(Opportunity, min(candidates)[1]), 'content'
+
+        return None, None
+
+    async def upsert(self, values: Dict[str, Any], company: str) -> Tuple[Opportunity, Optional[str]]:
+        """Insert the posting, or merge it into the opportunity it duplicates.
+
+        Returns the opportunity and None when it was inserted, else how the
+        duplicate was matched.
+        """
+        canonical_url = canonicalize_url(values.get('url'))
+        simhash = content_simhash(values.get('title'), company, values.get('jd_text'))
+
+        existing, matched = await self.find(canonical_url, simhash)
+        if existing is None:
+            opportunity = Opportunity(**values, content_simhash=simhash)
+            try:
+                async with self.db.begin_nested():
+                    self.db.add(opportunity)
+            except IntegrityError:
+                # Inserted concurrently under the same canonical URL
+                existing, matched = await self.find(canonical_url, None)
+                if existing is None:
+                    raise
+            else:
+                return opportunity, None
+
+        self._merge(existing, values, simhash, refresh=matched == 'url')
+        logger.info(f"Merged duplicate posting {values.get('url')} into opportunity {existing.id} (matched by {matched})")
+        return existing, matched
+
+    def _merge(self, opportunity: Opportunity, values: Dict[str, Any], simhash: Optional[int], refresh: bool):
+        for field in _CONTENT_FIELDS:
+            value = values.get(field)
+            if value in (None, '', []):
+                continue
+            if refresh or getattr(opportunity, field) in (None, '', []):
+                setattr(opportunity, field, value)
+
+        if not refresh and values.get('skills_required'):
+            # Another board may list skills this one did not
+            merged = list(opportunity.skills_required or [])
+            merged.extend(skill for skill in values['skills_required'] if skill not in merged)
+            opportunity.skills_required = merged
+
+        if refresh and simhash is not None:
+            opportunity.content_simhash = simhash
+        elif opportunity.content_simhash is None:
+            opportunity.content_simhash = simhash
+
+    async def backfill(self, batch_size: int = 500) -> Dict[str, int]:
+        """Fingerprint opportunities saved before de-duplication existed.
+
+        Rows whose canonical URL another row already holds are left without
+        one (they are earlier duplicates) and only get a SimHash.
+        """
+        counts = {'fingerprinted': 0, 'duplicate_urls': 0}
+        last_id = 0
+        while True:
+            result = await self.db.execute(
+                select(Opportunity, Organization.name)
+                .outerjoin(Organization, Organization.id == Opportunity.organization_id)
+                .where(Opportunity.id > last_id, Opportunity.content_simhash.is_(None), Opportunity.canonical_url.is_(None))
+                .order_by(Opportunity.id)
+                .limit(batch_size)
+            )
+            rows = result.all()
+            if not rows:
+                break
+
+            canonical = {opportunity.id: canonicalize_url(opportunity.url) for opportunity, _ in rows}
+            claimed = set((await self.db.execute(
+                select(Opportunity.canonical_url).where(Opportunity.canonical_url.in_([url for url in canonical.values() if url]))
+            )).scalars().all())
+
+            for opportunity, company in rows:
+                url = canonical[opportunity.id]
+                if url and url not in claimed:
+                    opportunity.canonical_url = url
+                    claimed.add(url)
+                elif url:
+                    counts['duplicate_urls'] += 1
+                opportunity.content_simhash = content_simhash(opportunity.title, company, opportunity.jd_text)
+                counts['fingerprinted'] += 1
+
+            last_id = rows[-1][0].id
+            await self.db.commit()
+
+        logger.info(f"Backfilled fingerprints for {counts['fingerprinted']} opportunities ({counts['duplicate_urls']} duplicate URLs)")
+        return counts
@@ -0,0 +1,253 @@
+from typing import Dict, Iterable, List, Optional, Tuple
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+import json
+import redis
+import redis.asyncio as aioredis
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select
+from sqlalchemy import inspect as sa_inspect
+from sqlalchemy.orm import selectinload
+from app.config import settings
+from app.models.application import Application
+from app.models.document import Document
+from app.models.opportunity import Opportunity, normalize_skills
+from app.models.user import Skill, User, UserSkill
+from app.services.cache import get_redis, invalidate_on_commit, INCREMENT
+from app.services.vector_index import get_vector_index
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Generation counters bumped when new opportunities arrive: one per skill
+# the postings list, or the shared one for postings that list none (every
+# user may be shown those). An entry remembers the counters of the user's
+# skills and is a miss once any of them moves, so a scrape only invalidates
+# users who share a skill with what it found.
+GENERATION_KEY = "recommendations:generation"
+
+def skill_generation_key(skill: str) -> str:
+    return f"recommendations:generation:skill:{skill}"
+
+def cache_key(user_id: int) -> str:
+    return f"recommendations:{user_id}"
+
+def state_key(user_id: int) -> str:
+    return f"recommendations:state:{user_id}"
+
+RecommendationItems = List[Tuple[int, float]]
+
+class RecommendationCache:
+    """Per-user recommendations stored in Redis as compact (id, score) lists"""
+
+    def __init__(self, client: Optional[aioredis.Redis] = None):
+        self.client = client or get_redis()
+
+    async def stamp(self, db: AsyncSession, user_id: int) -> Dict[str, int]:
+        """Generations a user's entry depends on; read it before scoring and pass it to ``set``"""
+        skills_result = await db.execute(
+            select(Skill.name).join(UserSkill).where(UserSkill.user_id == user_id)
+        )
+        keys = [GENERATION_KEY] + [skill_generation_key(skill) for skill in normalize_skills(skills_result.scalars().all())]
+        try:
+            generations = await self.client.mget(keys)
+        except redis.RedisError as e:
+            logger.warning(f"Recommendation cache unavailable: {e}")
+            generations = [None] * len(keys)
+        return {key: int(generation or 0) for key, generation in zip(keys, generations)}
+
+    async def get(self, user_id: int, limit: int = 0) -> Optional[RecommendationItems]:
+        """Cached items for a user, or None on a miss or stale generation"""
+        try:
+            cached = await self.client.get(cache_key(user_id))
+            if not cached:
+                return None
+
+            payload = json.loads(cached)
+            # Entries computed for a smaller page cannot serve a bigger one
+            if limit > payload['n']:
+                return None
+
+            stamp = payload['g']
+            if not isinstance(stamp, dict):
+                # Written before entries depended on per-skill generations
+                return None
+            generations = await self.client.mget(list(stamp))
+        except redis.RedisError as e:
+            logger.warning(f"Recommendation cache unavailable: {e}")
+            return None
+
+        if any(int(generation or 0) != stamp[key] for key, generation in zip(stamp, generations)):
+            return None
+
+        return [(opp_id, score) for opp_id, score in payload['items']]
+
+    async def set(
+        self,
+        user_id: int,
+        recommendations: List[Dict],
+        stamp: Dict[str, int],
+        limit: int
+    ):
+        """Store recommendations as produced by ``generate_recommendations``"""
+        payload = {
+            'g': stamp,
+            'n': limit,
+            'items': [
+                [item['opportunity'].id, round(item['fit_score'], 2)]
+                for item in recommendations
+            ]
+        }
+        try:
+            await self.client.set(
+                cache_key(user_id),
+                json.dumps(payload, separators=(',', ':')),
+                ex=settings.RECOMMENDATION_CACHE_TTL
+            )
+        except redis.RedisError as e:
+            logger.warning(f"Could not cache recommendations for user {user_id}: {e}")
+
+    async def invalidate(self, user_id: int):
+        try:
+            await self.client.delete(cache_key(user_id))
+        except redis.RedisError as e:
+            logger.warning(f"Could not invalidate recommendations for user {user_id}: {e}")
+
+@dataclass
+class RecommendationState:
+    """What an incremental refresh needs from the previous run"""
+    fingerprint: str
+    watermark: datetime
+    full_refresh_at: datetime
+    pool: List[int]
+
+    def is_reusable(self, fingerprint: str, now: datetime) -> bool:
+        """Whether the next run may rescore only what changed"""
+        full_refresh_due = now - self.full_refresh_at > timedelta(hours=settings.RECOMMENDATION_FULL_REFRESH_HOURS)
+        return fingerprint == self.fingerprint and not full_refresh_due
+
+class RecommendationStateStore:
+    """Per-user refresh state (features fingerprint, watermark, top pool)"""
+
+    TTL = 7 * 86400
+
+    def __init__(self, client: Optional[aioredis.Redis] = None):
+        self.client = client or get_redis()
+
+    async def get(self, user_id: int) -> Optional[RecommendationState]:
+        try:
+            cached = await self.client.get(state_key(user_id))
+        except redis.RedisError as e:
+            logger.warning(f"Recommendation state unavailable: {e}")
+            return None
+
+        if not cached:
+            return None
+
+        payload = json.loads(cached)
+        return RecommendationState(
+            fingerprint=payload['f'],
+            watermark=datetime.fromisoformat(payload['w']),
+            full_refresh_at=datetime.fromisoformat(payload['full']),
+            pool=payload['pool']
+        )
+
+    async def set(self, user_id: int, state: RecommendationState):
+        payload = {
+            'f': state.fingerprint,
+            'w': state.watermark.isoformat(),
+            'full': state.full_refresh_at.isoformat(),
+            'pool': state.pool
+        }
+        try:
+            await self.client.set(state_key(user_id), json.dumps(payload, separators=(',', ':')), ex=self.TTL)
+        except redis.RedisError as e:
+            logger.warning(f"Could not store recommendation state for user {user_id}: {e}")
+
+async def hydrate_recommendations(db: AsyncSession, items: RecommendationItems) -> List[Dict]:
+    """Load cached (id, score) items back into recommendation dicts.
+
+    Opportunities that are no longer active are dropped.
+    """
+    if not items:
+        return []
+
+    result = await db.execute(
+        select(Opportunity)
+        .options(selectinload(Opportunity.organization))
+        .where(
+            Opportunity.id.in_([opp_id for opp_id, _ in items]),
+            Opportunity.status == 'active'
+        )
+    )
+    opportunities = {opp.id: opp for opp in result.scalars().all()}
+
+    return [
+        {
+            'opportunity': opportunities[opp_id],
+            'fit_score': score,
+            'organization': opportunities[opp_id].organization
+        }
+        for opp_id, score in items
+        if opp_id in opportunities
+    ]
+
+async def get_recommendations(db: AsyncSession, user_id: int, limit: int = 10) -> List[Dict]:
+    """Serve recommendations from the cache, scoring only on a miss"""
+    from app.services.scoring_service import ScoringService
+
+    cache = RecommendationCache()
+    items = await cache.get(user_id, limit)
+    if items is not None:
+        return (await hydrate_recommendations(db, items))[:limit]
+
+    stamp = await cache.stamp(db, user_id)
+    size = max(limit, settings.RECOMMENDATION_CACHE_SIZE)
+    recommendations = await ScoringService().refresh_recommendations(user_id, db, limit=size)
+    await cache.set(user_id, recommendations, stamp, size)
+
+    return recommendations[:limit]
+
+async def get_document_matches(db: AsyncSession, document: Document, limit: int = 10) -> List[Dict]:
+    """Opportunities semantically closest to one document version"""
+    query = get_vector_index("documents").get(document.id)
+    if query is None:
+        if not document.embeddings:
+            return []
+        query = document.embeddings
+
+    # Over-fetch: entries for opportunities closed since indexing are dropped on hydrate
+    items = get_vector_index("opportunities").search(query, k=limit * 2)
+    return (await hydrate_recommendations(db, items))[:limit]
+
+# Event-driven invalidation
+
+def _changed(obj, change: str, *attributes: str) -> bool:
+    if change != "dirty":
+        return True
+    state = sa_inspect(obj)
+    return any(state.attrs[name].history.has_changes() for name in attributes)
+
+def _user_invalidations(user: User, change: str) -> Iterable[str]:
+    if _changed(user, change, 'profile_data', 'is_active'):
+        return (cache_key(user.id),)
+    return ()
+
+def _user_skill_invalidations(user_skill: UserSkill, change: str) -> Iterable[str]:
+    return (cache_key(user_skill.user_id),)
+
+def _application_invalidations(application: Application, change: str) -> Iterable[str]:
+    if _changed(application, change, 'status', 'opportunity_id'):
+        return (cache_key(application.user_id),)
+    return ()
+
+def _opportunity_invalidations(opportunity: Opportunity, change: str) -> Iterable[str]:
+    if change != "new":
+        return ()
+    skills = normalize_skills(opportunity.skills_required)
+    return [skill_generation_key(skill) for skill in skills] if skills else (GENERATION_KEY,)
+
+invalidate_on_commit(User, _user_invalidations)
+invalidate_on_commit(UserSkill, _user_skill_invalidations)
+invalidate_on_commit(Application, _application_invalidations)
+invalidate_on_commit(Opportunity, _opportunity_invalidations, action=INCREMENT)
@@ -0,0 +1,202 @@
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Sequence, Tuple, Type
+from collections import OrderedDict
+from dataclasses import asdict, dataclass, fields, is_dataclass, replace
+from datetime import datetime, timedelta
+import hashlib
+import json
+import threading
+from app.config import settings
+from app.models.rule import Rule
+import logging
+
+logger = logging.getLogger(__name__)
+
+class RuleCompileError(ValueError):
+    """A rule's trigger, condition or action cannot be compiled"""
+
+# Registries.
+#
+# A trigger evaluates many rules of its type at once: it receives their plans
+# (and optionally the only application IDs worth checking) and returns the
+# matching application IDs for each triggered rule. An action executes one
+# triggered rule. Each registration names the frozen dataclass its JSON
+# parameters are validated into, and a trigger may set its default re-fire
+# interval. The built-in types register themselves in app.services.rules_engine.
+
+TriggerEvaluator = Callable[..., Awaitable[Dict[int, List[int]]]]
+TriggerSchedule = Callable[..., Awaitable[List[Tuple[int, int, datetime]]]]
+ActionExecutor = Callable[..., Awaitable[Dict[str, Any]]]
+
+@dataclass(frozen=True, slots=True)
+class TriggerType:
+    name: str
+    condition_type: Type
+    evaluate: TriggerEvaluator
+    schedule: Optional[TriggerSchedule] = None
+    refire: Optional[timedelta] = None
+
+@dataclass(frozen=True, slots=True)
+class ActionType:
+    name: str
+    params_type: Type
+    execute: ActionExecutor
+
+TRIGGERS: Dict[str, TriggerType] = {}
+ACTIONS: Dict[str, ActionType] = {}
+
+def trigger(name: str, condition_type: Type, refire: Optional[timedelta] = None):
+    """Register ``evaluate(engine, plans, application_ids=None)`` for a trigger"""
+    def decorator(evaluate: TriggerEvaluator) -> TriggerEvaluator:
+        TRIGGERS[name] = TriggerType(name, condition_type, evaluate, refire=refire)
+        return evaluate
+    return decorator
+
+def schedules(name: str):
+    """Register ``schedule(engine, plans, application_ids=None)`` for a time-based trigger.
+
+    It returns ``(rule_id, application_id, due_at)`` for every application
+    that will satisfy the rule at ``due_at``, so the rule can be evaluated
+    exactly then instead of on every poll.
+    """
+    def decorator(schedule: TriggerSchedule) -> TriggerSchedule:
+        TRIGGERS[name] = replace(TRIGGERS[name], schedule=schedule)
+        return schedule
+    return decorator
+
+def action(name: str, params_type: Type):
+    """Register ``execute(engine, plan, application_ids)`` for an action type"""
+    def decorator(execute: ActionExecutor) -> ActionExecutor:
+        ACTIONS[name] = ActionType(name, params_type, execute)
+        return execute
+    return decorator
+
+@dataclass(frozen=True, slots=True)
+class RulePlan:
+    """Validated, immutable form of a ``Rule`` row"""
+    rule_id: int
+    owner_id: int
+    trigger: TriggerType
+    condition: Any
+    action: Optional[ActionType]
+    action_params: Any
+    # Minimum time between firings on the same target; None disables the ledger
+    refire_interval: Optional[timedelta]
+    fingerprint: str
+
+def _load_json(raw: Optional[str], what: str) -> Dict:
+    if not raw:
+        return {}
+    try:
+        data = json.loads(raw)
+    except ValueError as e:
+        raise RuleCompileError(f"Invalid {what} JSON: {e}")
+    if not isinstance(data, dict):
+        raise RuleCompileError(f"{what} must be a JSON object")
+    return data
+
+def _build(params_type: Type, data: Dict, what: str):
+    """Instantiate a parameter dataclass, coercing values to the field types"""
+    values = {}
+    for field in fields(params_type):
+        if field.name not in data or data[field.name] is None:
+            continue
+        value = data[field.name]
+        try:
+            # Plain annotations coerce ("7" -> 7.0); Optional[...] ones pass through
+            values[field.name] = field.type(value) if isinstance(field.type, type) else value
+        except (TypeError, ValueError):
+            raise RuleCompileError(f"Invalid {what} '{field.name}': {value!r}")
+    return params_type(**values)
+
+def _refire_interval(trigger_type: TriggerType, action_data: Dict) -> Optional[timedelta]:
+    hours = action_data.get('refire_hours')
+    if hours is None:
+        return trigger_type.refire or timedelta(hours=settings.RULE_REFIRE_INTERVAL_HOURS)
+    try:
+        hours = float(hours)
+    except (TypeError, ValueError):
+        raise RuleCompileError(f"Invalid action 'refire_hours': {hours!r}")
+    # 0 fires on every match
+    return timedelta(hours=hours) if hours > 0 else None
+
+def _fingerprint(action_name: Optional[str], action_params: Any, refire: Optional[timedelta]) -> str:
+    """Stable hash of what the action does; editing it allows firing again"""
+    params = asdict(action_params) if is_dataclass(action_params) else action_params
+    refire_seconds = refire.total_seconds() if refire else None
+    payload = json.dumps([action_name, params, refire_seconds], sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode()).hexdigest()[:32]
+
+def compile_rule(rule: Rule) -> RulePlan:
+    """Compile a rule without caching; raises ``RuleCompileError``"""
+    trigger_type = TRIGGERS.get(rule.trigger)
+    if trigger_type is None:
+        raise RuleCompileError(f"Unknown trigger type: {rule.trigger}")
+
+    condition = _build(trigger_type.condition_type, _load_json(rule.condition_json, "condition"), "condition")
+
+    action_data = _load_json(rule.action_json, "action")
+    action_type = ACTIONS.get(action_data.get('type'))
+    if action_type is None:
+        # Kept compilable: the trigger still runs and the result reports the error
+        action_params = action_data.get('type')
+    else:
+        action_params = _build(action_type.params_type, action_data, "action")
+
+    refire = _refire_interval(trigger_type, action_data)
+
+    return RulePlan(
+        rule_id=rule.id,
+        owner_id=rule.owner_id,
+        trigger=trigger_type,
+        condition=condition,
+        action=action_type,
+        action_params=action_params,
+        refire_interval=refire,
+        fingerprint=_fingerprint(action_data.get('type'), action_params, refire)
+    )
+
+class RuleCompiler:
+    """LRU cache of compiled plans keyed by ``(rule.id, rule.updated_at)``.
+
+    Editing a rule bumps ``updated_at``, so stale plans are never served;
+    they simply age out.
+    """
+
+    def __init__(self, maxsize: int = 4096):
+        self.maxsize = maxsize
+        self._plans: "OrderedDict[Tuple[int, Optional[datetime]], RulePlan]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def compile(self, rule: Rule) -> RulePlan:
+        key = (rule.id, rule.updated_at)
+        with self._lock:
+            plan = self._plans.get(key)
+            if plan is not None:
+                self._plans.move_to_end(key)
+                return plan
+
+        plan = compile_rule(rule)
+
+        with self._lock:
+            self._plans[key] = plan
+            if len(self._plans) > self.maxsize:
+                self._plans.popitem(last=False)
+        return plan
+
+    def compile_all(self, rules: Sequence[Rule]) -> Tuple[List[RulePlan], Dict[int, str]]:
+        """Compile many rules; returns the plans and errors by rule ID"""
+        plans = []
+        errors = {}
+        for rule in rules:
+            try:
+                plans.append(self.compile(rule))
+            except RuleCompileError as e:
+                logger.warning(f"Rule {rule.id} not compiled: {e}")
+                errors[rule.id] = str(e)
+        return plans, errors
+
+    def clear(self):
+        with self._lock:
+            self._plans.clear()
+
+rule_compiler = RuleCompiler()
@@ -0,0 +1,115 @@
+from typing import Any, Dict, Optional, Tuple
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, asdict
+import json
+import time
+import redis
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from app.services.cache import get_redis
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Profile of the latest scheduled run, for the /rules/profile endpoint
+LAST_PROFILE_KEY = "rules:profile:last"
+LAST_PROFILE_TTL = 7 * 24 * 3600
+
+@dataclass
+class ProfileStats:
+    calls: int = 0
+    wall_ms: float = 0.0
+    queries: int = 0
+    # Rows returned or affected as reported by the driver; PostgreSQL reports
+    # SELECT counts too, SQLite only DML counts
+    rows: int = 0
+    matches: int = 0
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {**asdict(self), 'wall_ms': round(self.wall_ms, 3)}
+
+# Stats the statements executed in the current task are charged to
+_active: ContextVar[Tuple[ProfileStats, ...]] = ContextVar("rule_profile_scopes", default=())
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _count_statement(conn, cursor, statement, parameters, context, executemany):
+    scopes = _active.get()
+    if not scopes:
+        return
+    rows = max(cursor.rowcount or 0, 0)
+    for stats in scopes:
+        stats.queries += 1
+        stats.rows += rows
+
+class RuleProfiler:
+    """Wall time, SQL statements and rows per trigger, rule, owner and phase.
+
+    Triggers are evaluated for many rules in one query, so evaluation cost
+    is charged to the trigger; a rule's own stats cover its action. Owner
+    stats add up their rules and the applications they matched.
+    """
+
+    def __init__(self):
+        self.phases: Dict[str, ProfileStats] = {}
+        self.triggers: Dict[str, ProfileStats] = {}
+        self.rules: Dict[int, ProfileStats] = {}
+        self.owners: Dict[int, ProfileStats] = {}
+
+    @contextmanager
+    def measure(self, *stats: ProfileStats):
+        """Charge the enclosed block to ``stats`` (and any enclosing scopes)"""
+        token = _active.set(_active.get() + stats)
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = (time.perf_counter() - start) * 1000
+            for item in stats:
+                item.calls += 1
+                item.wall_ms += elapsed
+            _active.reset(token)
+
+    def phase(self, name: str) -> ProfileStats:
+        return self.phases.setdefault(name, ProfileStats())
+
+    def trigger(self, name: str) -> ProfileStats:
+        return self.triggers.setdefault(name, ProfileStats())
+
+    def rule(self, rule_id: int) -> ProfileStats:
+        return self.rules.setdefault(rule_id, ProfileStats())
+
+    def owner(self, owner_id: int) -> ProfileStats:
+        return self.owners.setdefault(owner_id, ProfileStats())
+
+    def as_dict(self, limit: Optional[int] = 20) -> Dict[str, Any]:
+        """Totals plus the ``limit`` most expensive rules and owners"""
+        def top(items: Dict[Any, ProfileStats]) -> list:
+            ranked = sorted(items.items(), key=lambda item: (item[1].wall_ms, item[1].matches), reverse=True)
+            return [{'id': key, **stats.as_dict()} for key, stats in ranked[:limit]]
+
+        # Phases never nest, so together they account for the whole run
+        total = ProfileStats(
+            calls=1,
+            wall_ms=sum(stats.wall_ms for stats in self.phases.values()),
+            queries=sum(stats.queries for stats in self.phases.values()),
+            rows=sum(stats.rows for stats in self.phases.values()),
+            matches=sum(stats.matches for stats in self.triggers.values())
+        )
+        return {
+            'total': total.as_dict(),
+            'phases': {name: stats.as_dict() for name, stats in self.phases.items()},
+            'triggers': {name: stats.as_dict() for name, stats in self.triggers.items()},
+            'rules': top(self.rules),
+            'owners': top(self.owners)
+        }
+
+async def save_last_profile(profile: Dict[str, Any]):
+    try:
+        await get_redis().set(LAST_PROFILE_KEY, json.dumps(profile, default=str), ex=LAST_PROFILE_TTL)
+    except redis.RedisError as e:
+        logger.warning(f"Could not store rule profile: {e}")
+
+async def load_last_profile() -> Optional[Dict[str, Any]]:
+    data = await get_redis().get(LAST_PROFILE_KEY)
+    return json.loads(data) if data else None
@@ -0,0 +1,168 @@
+from typing import Dict, Iterable, List, Optional, Tuple
+from datetime import datetime, timezone
+import redis.asyncio as aioredis
+from sqlalchemy import event
+from sqlalchemy import inspect as sa_inspect
+from sqlalchemy.orm import Session
+from app.config import settings
+from app.models.application import Application, ApplicationEvent
+from app.models.rule import Rule
+from app.services.cache import get_redis, run_after_commit
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Changes that can make a rule fire, consumed by the rule dispatcher
+EVENT_STREAM = "rules:events"
+CONSUMER_GROUP = "rule-dispatcher"
+
+# (rule, application) pairs keyed by the time the rule becomes eligible
+DUE_QUEUE = "rules:due"
+
+# Pairs already fired, scored by the due time they fired for, so a reconcile
+# does not queue the same due time twice
+FIRED_SET = "rules:fired"
+
+def _member(rule_id: int, application_id: int) -> str:
+    return f"{rule_id}:{application_id}"
+
+def _parse_member(member: str) -> Tuple[int, int]:
+    rule_id, application_id = member.split(":")
+    return int(rule_id), int(application_id)
+
+def _timestamp(value: datetime) -> float:
+    # Naive datetimes in this codebase are UTC
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return value.timestamp()
+
+class RuleScheduler:
+    """Due-time queue for time-based rule triggers.
+
+    Triggers that register a ``schedule`` function report when each matching
+    application becomes eligible (see ``RulesEngine.schedule_plans``); the
+    dispatcher sleeps until the earliest due time instead of polling every
+    rule.
+    """
+
+    def __init__(self, client: Optional[aioredis.Redis] = None):
+        self.client = client or get_redis()
+
+    async def queue(self, due: Iterable[Tuple[int, int, datetime]]) -> int:
+        """Queue (rule_id, application_id, due_at) pairs not yet fired for that due time"""
+        # Anything older than the fired-set retention has had its chance
+        horizon = datetime.now(timezone.utc).timestamp() - settings.RULE_FIRED_RETENTION_DAYS * 86400
+        entries = {}
+        for rule_id, application_id, due_at in due:
+            score = _timestamp(due_at)
+            if score >= horizon:
+                entries[_member(rule_id, application_id)] = score
+
+        return await self._queue_unfired(entries)
+
+    async def _queue_unfired(self, entries: Dict[str, float]) -> int:
+        if not entries:
+            return 0
+
+        members = list(entries)
+        fired = await self.client.zmscore(FIRED_SET, members)
+        pending = {
+            member: entries[member]
+            for member, fired_at in zip(members, fired)
+            if fired_at is None or fired_at != entries[member]
+        }
+        if pending:
+            await self.client.zadd(DUE_QUEUE, pending)
+        return len(pending)
+
+    async def next_due(self) -> Optional[float]:
+        """Timestamp of the earliest queued pair"""
+        earliest = await self.client.zrange(DUE_QUEUE, 0, 0, withscores=True)
+        return earliest[0][1] if earliest else None
+
+    async def claim_due(self, now: Optional[float] = None, limit: int = 500) -> List[Tuple[int, int, float]]:
+        """Remove and return due (rule_id, application_id, due_at) pairs.
+
+        Several dispatchers may race for the same pairs; ZREM decides which
+        one owns each.
+        """
+        now = datetime.now(timezone.utc).timestamp() if now is None else now
+        due = await self.client.zrangebyscore(DUE_QUEUE, '-inf', now, start=0, num=limit, withscores=True)
+        if not due:
+            return []
+
+        pipe = self.client.pipeline(transaction=False)
+        for member, _ in due:
+            pipe.zrem(DUE_QUEUE, member)
+        removed = await pipe.execute()
+
+        return [
+            (*_parse_member(member), score)
+            for (member, score), owned in zip(due, removed)
+            if owned
+        ]
+
+    async def mark_fired(self, pairs: Iterable[Tuple[int, int, float]]):
+        entries = {_member(rule_id, application_id): due_at for rule_id, application_id, due_at in pairs}
+        if not entries:
+            return
+
+        horizon = datetime.now(timezone.utc).timestamp() - settings.RULE_FIRED_RETENTION_DAYS * 86400
+        pipe = self.client.pipeline(transaction=False)
+        pipe.zadd(FIRED_SET, entries)
+        pipe.zremrangebyscore(FIRED_SET, '-inf', horizon)
+        await pipe.execute()
+
+# Change publishing.
+#
+# Status changes, new application events and rule edits are appended to the
+# stream once the transaction commits, mirroring the cache invalidation hooks.
+
+PENDING_EVENTS = "rule_events"
+
+def _rule_event_fields(obj, change: str) -> Optional[Dict[str, str]]:
+    if isinstance(obj, Application):
+        if change == "deleted":
+            return None
+        if change == "dirty" and not sa_inspect(obj).attrs.status.history.has_changes():
+            return None
+        return {'application_id': str(obj.id)}
+
+    if isinstance(obj, ApplicationEvent) and change == "new":
+        return {'application_id': str(obj.application_id)}
+
+    if isinstance(obj, Rule) and change != "deleted":
+        state = sa_inspect(obj)
+        if change == "dirty" and not any(
+            state.attrs[name].history.has_changes()
+            for name in ('trigger', 'condition_json', 'action_json', 'enabled')
+        ):
+            return None
+        return {'rule_id': str(obj.id)}
+
+    return None
+
+@event.listens_for(Session, "after_flush")
+def _collect_rule_events(session: Session, flush_context):
+    changes = [(obj, "new") for obj in session.new] + [(obj, "dirty") for obj in session.dirty]
+    for obj, change in changes:
+        fields = _rule_event_fields(obj, change)
+        if fields:
+            session.info.setdefault(PENDING_EVENTS, []).append(fields)
+
+@event.listens_for(Session, "after_commit")
+def _publish_rule_events(session: Session):
+    pending = session.info.pop(PENDING_EVENTS, None)
+    if not pending:
+        return
+
+    def queue(pipe):
+        for fields in pending:
+            pipe.xadd(EVENT_STREAM, fields, maxlen=settings.RULE_EVENT_STREAM_MAXLEN, approximate=True)
+
+    # The hourly reconcile picks up whatever was missed
+    run_after_commit(session, queue, "Could not publish rule events")
+
+@event.listens_for(Session, "after_rollback")
+def _discard_rule_events(session: Session):
+    session.info.pop(PENDING_EVENTS, None)
@@ -1,241 +1,812 @@
-from typing import List, Dict, Any, Optional
-import json
-from datetime import datetime, timedelta
+from typing import List, Dict, Any, Callable, Optional, Sequence, Tuple
+from contextlib import nullcontext
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+import redis
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select
-from app.models.rule import Rule
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy import select, insert, update, delete, func, values, column, literal, union_all, Integer, String, DateTime
+from app.config import settings
+from app.models.rule import Rule, RuleLedgerEntry
 from app.models.application import Application
+from app.models.opportunity import Opportunity
 from app.models.task import Task
+from app.services.rule_compiler import RuleCompiler, RulePlan, rule_compiler, trigger, schedules, action
+from app.services.rule_profiler import RuleProfiler
+from app.services.email_digest import EmailDigest, recipient_for
+from app.services.rule_scheduler import RuleScheduler
 import logging
 
 logger = logging.getLogger(__name__)
 
+# Rules evaluated per query; keeps bind parameters well under driver limits
+RULE_BATCH_SIZE = 1000
+
+def _parameter_table(db: AsyncSession, name: str, columns: List, rows: List[Tuple]):
+    """Inline table of per-rule parameters to join against.
+    
+    Rendered as a VALUES list on PostgreSQL; other dialects (SQLite in local
+    benchmarks) cannot alias VALUES columns, so they get a UNION ALL.
+    """
+    if db.get_bind().dialect.name == 'postgresql':
+        return values(*columns, name=name).data(rows)
+    
+    return union_all(*(
+        select(*(literal(value, col.type).label(col.name) for value, col in zip(row, columns)))
+        for row in rows
+    )).subquery(name)
+
+def _ledger_window(plan: RulePlan, now: datetime) -> int:
+    # Aligned bucket for the ledger's unique index, so concurrent runs cannot
+    # both fire; the re-fire interval itself is checked against created_at
+    return int(now.replace(tzinfo=timezone.utc).timestamp() // plan.refire_interval.total_seconds())
+
+def _naive_utc(value: datetime) -> datetime:
+    # PostgreSQL hands back aware datetimes, SQLite naive UTC ones
+    return value.astimezone(timezone.utc).replace(tzinfo=None) if value.tzinfo else value
+
+def _ledger_targets(plan: RulePlan, application_ids: Sequence[int]) -> List[Tuple[str, int]]:
+    """Entities an action is taken on: the matched applications, else the owner"""
+    if application_ids:
+        return [('application', application_id) for application_id in application_ids]
+    return [('user', plan.owner_id)]
+
+def _settle(result: Dict[str, Any], **outcome):
+    """Replace a staged action result with its outcome after the flush"""
+    result.clear()
+    result.update(outcome)
+
+class RuleBatch:
+    """Writes staged by triggered rules, flushed together.
+    
+    Actions stage rows here instead of committing; ``flush`` bulk inserts
+    the tasks and ledger entries, applies priority updates and records every
+    rule's run in one transaction. If the bulk write fails, each rule is
+    retried in its own savepoint so one bad rule does not roll back the rest.
+    Emails are handed to the digest buffer only for rules that committed.
+    """
+    
+    def __init__(self):
+        self.runs: List[int] = []
+        self.tasks: Dict[int, List[Tuple[Dict[str, Any], Dict[str, Any]]]] = {}
+        self.priorities: Dict[int, List[Tuple[int, int, int, Dict[str, Any]]]] = {}
+        self.ledger: Dict[int, List[Dict[str, Any]]] = {}
+        self.emails: Dict[int, List[Dict[str, Any]]] = {}
+    
+    def __len__(self) -> int:
+        return len(self.runs)
+    
+    def add_run(self, rule_id: int):
+        self.runs.append(rule_id)
+    
+    def add_task(self, rule_id: int, row: Dict[str, Any], result: Dict[str, Any]):
+        """Stage a Task row; ``result['task_id']`` is filled in on flush"""
+        self.tasks.setdefault(rule_id, []).append((row, result))
+    
+    def add_ledger(self, rule_id: int, rows: List[Dict[str, Any]]):
+        """Stage ``RuleLedgerEntry`` rows recording that the rule fired"""
+        self.ledger.setdefault(rule_id, []).extend(rows)
+    
+    def add_email(self, rule_id: int, email: Dict[str, Any]):
+        """Stage a message for the recipient's email digest"""
+        self.emails.setdefault(rule_id, []).append(email)
+    
+    def add_priority(self, rule_id: int, owner_id: int, application_id: int, priority: int, result: Dict[str, Any]):
+        """Stage a priority change for one of the owner's applications"""
+        self.priorities.setdefault(rule_id, []).append((owner_id, application_id, priority, result))
+    
+    async def flush(self, db: AsyncSession) -> Dict[int, str]:
+        """Write and commit everything staged; returns errors by rule ID"""
+        rule_ids = list(dict.fromkeys(self.runs))
+        if not rule_ids:
+            return {}
+        
+        errors = {}
+        try:
+            async with db.begin_nested():
+                settle = await self._write(db, rule_ids)
+            settle()
+        except SQLAlchemyError as e:
+            logger.warning(f"Batched write of {len(rule_ids)} rules failed, retrying one by one: {str(e)}")
+            for rule_id in rule_ids:
+                try:
+                    async with db.begin_nested():
+                        settle = await self._write(db, [rule_id])
+                    settle()
+                except SQLAlchemyError as e:
+                    logger.error(f"Error writing results of rule {rule_id}: {str(e)}")
+                    errors[rule_id] = str(e)
+        
+        await db.commit()
+        
+        emails = [
+            email
+            for rule_id, staged in self.emails.items() if rule_id not in errors
+            for email in staged
+        ]
+        if emails:
+            try:
+                await EmailDigest().add(emails)
+            except redis.RedisError as e:
+                logger.error(f"Could not buffer {len(emails)} rule emails: {e}")
+        
+        self.clear()
+        return errors
+    
+    def clear(self):
+        self.runs.clear()
+        self.tasks.clear()
+        self.priorities.clear()
+        self.ledger.clear()
+        self.emails.clear()
+    
+    async def _write(self, db: AsyncSession, rule_ids: List[int]) -> Callable[[], None]:
+        """Issue the bulk statements for ``rule_ids``.
+        
+        Staged results are only updated by the returned callback, once the
+        enclosing savepoint has been released.
+        """
+        updates = []
+        
+        staged_tasks = [staged for rule_id in rule_ids for staged in self.tasks.get(rule_id, ())]
+        if staged_tasks:
+            task_ids = await db.scalars(
+                insert(Task).returning(Task.id, sort_by_parameter_order=True),
+                [row for row, _ in staged_tasks]
+            )
+            updates.extend(
+                (result, {**result, 'task_id': task_id})
+                for (_, result), task_id in zip(staged_tasks, task_ids.all())
+            )
+        
+        staged_priorities = [staged for rule_id in rule_ids for staged in self.priorities.get(rule_id, ())]
+        if staged_priorities:
+            owned_result = await db.execute(
+                select(Application.id, Application.user_id)
+                .where(Application.id.in_({application_id for _, application_id, _, _ in staged_priorities}))
+            )
+            owned = set(owned_result.all())
+            
+            by_priority: Dict[int, List[int]] = {}
+            for owner_id, application_id, priority, result in staged_priorities:
+                if (application_id, owner_id) in owned:
+                    by_priority.setdefault(priority, []).append(application_id)
+                else:
+                    updates.append((result, {'success': False, 'error': 'Application not found'}))
+            
+            for priority, application_ids in by_priority.items():
+                await db.execute(
+                    update(Application)
+                    .where(Application.id.in_(application_ids))
+                    .values(priority=priority)
+                    .execution_options(synchronize_session=False)
+                )
+        
+        # A concurrent run that fired the same rule first makes this violate
+        # the ledger's unique index, rolling back the duplicate
+        ledger_rows = [row for rule_id in rule_ids for row in self.ledger.get(rule_id, ())]
+        if ledger_rows:
+            await db.execute(insert(RuleLedgerEntry), ledger_rows)
+        
+        # Bookkeeping is not an edit, so keep updated_at (and with it the
+        # compiled plan's cache key) unchanged
+        await db.execute(
+            update(Rule)
+            .where(Rule.id.in_(rule_ids))
+            .values(
+                last_run_at=datetime.utcnow(),
+                run_count=func.coalesce(Rule.run_count, 0) + 1,
+                updated_at=Rule.updated_at
+            )
+            .execution_options(synchronize_session=False)
+        )
+        
+        def settle():
+            for result, outcome in updates:
+                _settle(result, **outcome)
+        return settle
+
 class RulesEngine:
-    def __init__(self, db: AsyncSession):
+    """Evaluates rules and executes their actions.
+    
+    With ``dry_run`` triggers are evaluated (and the ledger consulted) but no
+    action runs and nothing is written or queued; results report what would
+    have fired. Pass a ``RuleProfiler`` to record where the time goes.
+    """
+    
+    def __init__(
+        self,
+        db: AsyncSession,
+        compiler: RuleCompiler = rule_compiler,
+        dry_run: bool = False,
+        profiler: Optional[RuleProfiler] = None
+    ):
         self.db = db
+        self.compiler = compiler
+        self.dry_run = dry_run
+        self.profiler = profiler
+        self.batch = RuleBatch()
+    
+    def _scope(self, phase: str, trigger: Optional[str] = None, plan: Optional[RulePlan] = None):
+        """Profiler scope for a block; a no-op when not profiling"""
+        if self.profiler is None:
+            return nullcontext()
         
+        stats = [self.profiler.phase(phase)]
+        if trigger is not None:
+            stats.append(self.profiler.trigger(trigger))
+        if plan is not None:
+            stats.extend((self.profiler.rule(plan.rule_id), self.profiler.owner(plan.owner_id)))
+        return self.profiler.measure(*stats)
+    
+    async def _load_plans(self, *criteria) -> Tuple[List[RulePlan], Dict[int, str]]:
+        """Compile the enabled rules matching ``criteria``"""
+        with self._scope('load'):
+            rules_result = await self.db.execute(
+                select(Rule).where(Rule.enabled == True, *criteria).order_by(Rule.id)
+            )
+            return self.compiler.compile_all(rules_result.scalars().all())
+    
     async def process_user_rules(self, user_id: int):
         """Process all active rules for a user"""
-        # Get user's active rules
-        rules_result = await self.db.execute(
-            select(Rule).where(
-                Rule.owner_id == user_id,
-                Rule.enabled == True
+        return await self._process_rules(Rule.owner_id == user_id)
+    
+    async def process_all_rules(self):
+        """Process every enabled rule, evaluating each trigger type in bulk"""
+        return await self._process_rules()
+    
+    async def _process_rules(self, *criteria) -> List[Dict[str, Any]]:
+        plans, errors = await self._load_plans(*criteria)
+        matches = await self.evaluate_plans(plans)
+        
+        results = [
+            {'rule_id': rule_id, 'success': False, 'error': error}
+            for rule_id, error in errors.items()
+        ]
+        results.extend(await self._execute_matches(plans, matches))
+        return results
+    
+    async def process_application_changes(self, application_ids: Sequence[int]) -> int:
+        """Schedule time-based rules for applications that just changed.
+        
+        Pairs that are already eligible get a due time in the past, so the
+        dispatcher fires them on its next pass. Returns the number queued.
+        """
+        owners = select(Application.user_id).where(Application.id.in_(application_ids))
+        plans, _ = await self._load_plans(Rule.owner_id.in_(owners))
+        return await self.schedule_plans(plans, application_ids)
+    
+    async def process_rule_changes(self, rule_ids: Sequence[int]) -> int:
+        """Schedule created or edited rules against all their applications"""
+        plans, _ = await self._load_plans(Rule.id.in_(rule_ids))
+        return await self.schedule_plans(plans)
+    
+    async def process_due(self, due: Sequence[Tuple[int, int, float]]) -> List[Dict[str, Any]]:
+        """Evaluate and execute claimed (rule_id, application_id, due_at) pairs"""
+        wanted: Dict[int, set] = {}
+        for rule_id, application_id, _ in due:
+            wanted.setdefault(rule_id, set()).add(application_id)
+        
+        plans, _ = await self._load_plans(Rule.id.in_(list(wanted)))
+        
+        # Re-check the conditions: the application may have moved on since
+        # it was queued, in which case its own change event rescheduled it
+        application_ids = sorted(set().union(*wanted.values()))
+        matches = await self.evaluate_plans(plans, application_ids)
+        matches = {
+            rule_id: [application_id for application_id in matched if application_id in wanted[rule_id]]
+            for rule_id, matched in matches.items()
+        }
+        matches = {rule_id: matched for rule_id, matched in matches.items() if matched}
+        
+        results = await self._execute_matches(plans, matches)
+        
+        fired = [
+            (rule_id, application_id, due_at)
+            for rule_id, application_id, due_at in due
+            if application_id in matches.get(rule_id, ())
+        ]
+        if not self.dry_run:
+            await RuleScheduler().mark_fired(fired)
+        return results
+    
+    async def reconcile(self) -> Dict[str, Any]:
+        """Periodic safety net for the event-driven path.
+        
+        Re-queues due times for every time-based rule (catching events that
+        were never published) and evaluates rules whose triggers have no
+        schedule, such as ``daily_recommendations``.
+        """
+        plans, errors = await self._load_plans()
+        
+        queued = await self.schedule_plans(plans)
+        if not self.dry_run:
+            await self.prune_ledger()
+        
+        periodic = [plan for plan in plans if plan.trigger.schedule is None]
+        matches = await self.evaluate_plans(periodic)
+        results = [
+            {'rule_id': rule_id, 'success': False, 'error': error}
+            for rule_id, error in errors.items()
+        ]
+        results.extend(await self._execute_matches(periodic, matches))
+        
+        return {'queued': queued, 'results': results}
+    
+    async def schedule_plans(
+        self,
+        plans: Sequence[RulePlan],
+        application_ids: Optional[Sequence[int]] = None
+    ) -> int:
+        """Queue due times for plans whose trigger registers a schedule.
+        
+        Returns the number queued, or in dry-run mode the number of due
+        times found.
+        """
+        by_trigger: Dict[str, List[RulePlan]] = {}
+        for plan in plans:
+            if plan.trigger.schedule is not None:
+                by_trigger.setdefault(plan.trigger.name, []).append(plan)
+        
+        scheduler = RuleScheduler()
+        queued = 0
+        for name, trigger_plans in by_trigger.items():
+            schedule = trigger_plans[0].trigger.schedule
+            for start in range(0, len(trigger_plans), RULE_BATCH_SIZE):
+                with self._scope('schedule', trigger=name):
+                    due = await schedule(self, trigger_plans[start:start + RULE_BATCH_SIZE], application_ids)
+                queued += len(due) if self.dry_run else await scheduler.queue(due)
+        
+        return queued
+    
+    async def prune_ledger(self) -> int:
+        """Delete ledger entries older than ``RULE_LEDGER_RETENTION_DAYS``"""
+        cutoff = datetime.utcnow() - timedelta(days=settings.RULE_LEDGER_RETENTION_DAYS)
+        with self._scope('prune'):
+            result = await self.db.execute(
+                delete(RuleLedgerEntry).where(RuleLedgerEntry.created_at < cutoff)
+            )
+            await self.db.commit()
+        return result.rowcount
+    
+    async def _unfired(
+        self,
+        plans: Sequence[RulePlan],
+        matches: Dict[int, List[int]],
+        now: datetime
+    ) -> Dict[int, List[int]]:
+        """Drop matched targets the rule acted on within its re-fire interval.
+        
+        Rules left with no target are absent from the result.
+        """
+        ledgered = [plan for plan in plans if plan.rule_id in matches and plan.refire_interval]
+        if not ledgered:
+            return matches
+        
+        intervals = {plan.rule_id: plan.refire_interval for plan in ledgered}
+        fired = set()
+        for start in range(0, len(ledgered), RULE_BATCH_SIZE):
+            chunk = ledgered[start:start + RULE_BATCH_SIZE]
+            with self._scope('ledger'):
+                result = await self.db.execute(
+                    select(
+                        RuleLedgerEntry.rule_id, RuleLedgerEntry.target_type, RuleLedgerEntry.target_id,
+                        RuleLedgerEntry.fingerprint, RuleLedgerEntry.created_at
+                    ).where(
+                        RuleLedgerEntry.rule_id.in_([plan.rule_id for plan in chunk]),
+                        RuleLedgerEntry.created_at >= now - max(plan.refire_interval for plan in chunk)
+                    )
+                )
+            fired.update(
+                (rule_id, target_type, target_id, fingerprint)
+                for rule_id, target_type, target_id, fingerprint, created_at in result.all()
+                if _naive_utc(created_at) >= now - intervals[rule_id]
             )
-        )
-        rules = rules_result.scalars().all()
+        
+        unfired = dict(matches)
+        for plan in ledgered:
+            targets = [
+                (target_type, target_id)
+                for target_type, target_id in _ledger_targets(plan, matches[plan.rule_id])
+                if (plan.rule_id, target_type, target_id, plan.fingerprint) not in fired
+            ]
+            if not targets:
+                del unfired[plan.rule_id]
+            elif matches[plan.rule_id]:
+                unfired[plan.rule_id] = [target_id for _, target_id in targets]
+        return unfired
+    
+    async def _execute_matches(self, plans: Sequence[RulePlan], matches: Dict[int, List[int]]) -> List[Dict[str, Any]]:
+        """Execute triggered rules, flushing their writes every ``RULE_BATCH_SIZE`` rules"""
+        now = datetime.utcnow()
+        unfired = await self._unfired(plans, matches, now)
         
         results = []
-        for rule in rules:
+        positions: Dict[int, int] = {}
+        
+        async def flush():
+            with self._scope('flush'):
+                errors = await self.batch.flush(self.db)
+            for rule_id, error in errors.items():
+                results[positions[rule_id]] = {'rule_id': rule_id, 'success': False, 'error': error}
+        
+        for plan in plans:
+            if plan.rule_id in matches and plan.rule_id not in unfired:
+                results.append({
+                    'rule_id': plan.rule_id,
+                    'triggered': False,
+                    'message': 'Already fired within the re-fire interval'
+                })
+                continue
+            
             try:
-                result = await self._process_rule(rule)
+                result = await self._process_rule(plan, unfired, now)
+                positions[plan.rule_id] = len(results)
                 results.append(result)
             except Exception as e:
-                logger.error(f"Error processing rule {rule.id}: {str(e)}")
+                logger.error(f"Error processing rule {plan.rule_id}: {str(e)}")
                 results.append({
-                    'rule_id': rule.id,
+                    'rule_id': plan.rule_id,
                     'success': False,
                     'error': str(e)
                 })
+            
+            if len(self.batch) >= RULE_BATCH_SIZE:
+                await flush()
         
+        await flush()
         return results
     
-    async def _process_rule(self, rule: Rule) -> Dict[str, Any]:
-        """Process a single rule"""
-        # Parse rule configuration
-        trigger = rule.trigger
-        condition = json.loads(rule.condition_json) if rule.condition_json else {}
-        action = json.loads(rule.action_json) if rule.action_json else {}
-        
-        # Check if rule should be triggered
-        should_trigger = await self._evaluate_trigger(rule.owner_id, trigger, condition)
-        
-        if not should_trigger:
+    async def _process_rule(self, plan: RulePlan, matches: Dict[int, List[int]], now: datetime) -> Dict[str, Any]:
+        """Execute a single rule's action if its trigger matched"""
+        if plan.rule_id not in matches:
             return {
-                'rule_id': rule.id,
+                'rule_id': plan.rule_id,
                 'triggered': False,
                 'message': 'Conditions not met'
             }
         
-        # Execute action
-        action_result = await self._execute_action(rule.owner_id, action)
+        if self.dry_run:
+            return {
+                'rule_id': plan.rule_id,
+                'triggered': True,
+                'dry_run': True,
+                'application_ids': matches[plan.rule_id]
+            }
         
-        # Update rule's last run time
-        rule.last_run_at = datetime.utcnow()
-        await self.db.commit()
+        # Execute action; its writes and the run bookkeeping go out with the batch
+        with self._scope('actions', plan=plan):
+            action_result = await self._execute_action(plan, matches[plan.rule_id])
+        self.batch.add_run(plan.rule_id)
+        if plan.refire_interval:
+            window = _ledger_window(plan, now)
+            self.batch.add_ledger(plan.rule_id, [
+                {
+                    'rule_id': plan.rule_id,
+                    'target_type': target_type,
+                    'target_id': target_id,
+                    'fingerprint': plan.fingerprint,
+                    'window': window
+                }
+                for target_type, target_id in _ledger_targets(plan, matches[plan.rule_id])
+            ])
         
         return {
-            'rule_id': rule.id,
+            'rule_id': plan.rule_id,
             'triggered': True,
+            'application_ids': matches[plan.rule_id],
             'action_result': action_result
         }
     
-    async def _evaluate_trigger(self, user_id: int, trigger: str, condition: Dict) -> bool:
-        """Evaluate if a rule trigger condition is met"""
-        
-        if trigger == "application_no_response":
-            return await self._check_application_no_response(user_id, condition)
-        elif trigger == "deadline_approaching":
-            return await self._check_deadline_approaching(user_id, condition)
-        elif trigger == "status_unchanged":
-            return await self._check_status_unchanged(user_id, condition)
-        elif trigger == "daily_recommendations":
-            return await self._check_daily_recommendations(user_id, condition)
-        else:
-            logger.warning(f"Unknown trigger type: {trigger}")
-            return False
-    
-    async def _check_application_no_response(self, user_id: int, condition: Dict) -> bool:
-        """Check for applications with no response after specified days"""
-        days = condition.get('days', 7)
-        cutoff_date = datetime.utcnow() - timedelta(days=days)
-        
-        # Find applications that were applied to but haven't progressed
-        apps_result = await self.db.execute(
-            select(Application).where(
-                Application.user_id == user_id,
-                Application.status == 'applied',
-                Application.applied_at <= cutoff_date
-            )
-        )
-        
-        stale_applications = apps_result.scalars().all()
-        return len(stale_applications) > 0
+    async def evaluate_rules(self, rules: Sequence[Rule]) -> Dict[int, List[int]]:
+        """Compile and evaluate rules; see ``evaluate_plans``"""
+        plans, _ = self.compiler.compile_all(rules)
+        return await self.evaluate_plans(plans)
     
-    async def _check_deadline_approaching(self, user_id: int, condition: Dict) -> bool:
-        """Check for opportunities with approaching deadlines"""
-        hours = condition.get('hours', 48)
-        cutoff_date = datetime.utcnow() + timedelta(hours=hours)
+    async def evaluate_plans(
+        self,
+        plans: Sequence[RulePlan],
+        application_ids: Optional[Sequence[int]] = None
+    ) -> Dict[int, List[int]]:
+        """Evaluate triggers for many rules, one query per trigger type.
         
-        # Find applications with approaching deadlines
-        apps_result = await self.db.execute(
-            select(Application).where(
-                Application.user_id == user_id,
-                Application.status.in_(['to_apply', 'applied']),
-                Application.opportunity.has(deadline_at__lte=cutoff_date)
-            )
-        )
+        Returns the matching application IDs for each triggered rule; rules
+        whose conditions are not met are absent. ``application_ids`` limits
+        evaluation to those applications, e.g. the ones that just changed.
+        """
+        by_trigger: Dict[str, List[RulePlan]] = {}
+        for plan in plans:
+            by_trigger.setdefault(plan.trigger.name, []).append(plan)
         
-        urgent_applications = apps_result.scalars().all()
-        return len(urgent_applications) > 0
-    
-    async def _check_status_unchanged(self, user_id: int, condition: Dict) -> bool:
-        """Check for applications stuck in same status"""
-        days = condition.get('days', 14)
-        status = condition.get('status', 'applied')
-        cutoff_date = datetime.utcnow() - timedelta(days=days)
+        matches: Dict[int, List[int]] = {}
+        for name, trigger_plans in by_trigger.items():
+            evaluate = trigger_plans[0].trigger.evaluate
+            for start in range(0, len(trigger_plans), RULE_BATCH_SIZE):
+                with self._scope('evaluate', trigger=name):
+                    matches.update(await evaluate(self, trigger_plans[start:start + RULE_BATCH_SIZE], application_ids))
         
-        apps_result = await self.db.execute(
-            select(Application).where(
-                Application.user_id == user_id,
-                Application.status == status,
-                Application.updated_at <= cutoff_date
-            )
-        )
+        if self.profiler is not None:
+            for plan in plans:
+                matched = len(matches.get(plan.rule_id, ()))
+                self.profiler.trigger(plan.trigger.name).matches += matched
+                self.profiler.rule(plan.rule_id).matches += matched
+                self.profiler.owner(plan.owner_id).matches += matched
         
-        stuck_applications = apps_result.scalars().all()
-        return len(stuck_applications) > 0
-    
-    async def _check_daily_recommendations(self, user_id: int, condition: Dict) -> bool:
-        """Always trigger for daily recommendations"""
-        return True
+        return matches
     
-    async def _execute_action(self, user_id: int, action: Dict) -> Dict[str, Any]:
+    async def _execute_action(self, plan: RulePlan, application_ids: List[int]) -> Dict[str, Any]:
         """Execute a rule action"""
-        action_type = action.get('type')
-        
-        if action_type == "create_task":
-            return await self._create_task_action(user_id, action)
-        elif action_type == "send_email":
-            return await self._send_email_action(user_id, action)
-        elif action_type == "send_notification":
-            return await self._send_notification_action(user_id, action)
-        elif action_type == "update_priority":
-            return await self._update_priority_action(user_id, action)
-        else:
-            return {'success': False, 'error': f'Unknown action type: {action_type}'}
-    
-    async def _create_task_action(self, user_id: int, action: Dict) -> Dict[str, Any]:
-        """Create a task"""
+        if plan.action is None:
+            return {'success': False, 'error': f'Unknown action type: {plan.action_params}'}
+        
         try:
-            task = Task(
-                user_id=user_id,
-                title=action.get('title', 'Automated Task'),
-                description=action.get('description', ''),
-                due_at=datetime.utcnow() + timedelta(days=action.get('due_days', 1)),
-                priority=action.get('priority', 'medium'),
-                source='rule_engine'
-            )
-            
-            self.db.add(task)
-            await self.db.commit()
-            
-            return {
-                'success': True,
-                'task_id': task.id,
-                'message': 'Task created successfully'
-            }
+            return await plan.action.execute(self, plan, application_ids)
         except Exception as e:
             return {'success': False, 'error': str(e)}
+
+# Triggers
+
+async def _match_applications(
+    engine: RulesEngine,
+    params,
+    application_ids: Optional[Sequence[int]],
+    *criteria
+) -> Dict[int, List[int]]:
+    """Join per-rule parameters to applications and group matches by rule"""
+    query = (
+        select(params.c.rule_id, Application.id)
+        .select_from(params)
+        .join(Application, Application.user_id == params.c.user_id)
+        .where(*criteria)
+        .order_by(params.c.rule_id, Application.id)
+    )
+    if application_ids is not None:
+        query = query.where(Application.id.in_(application_ids))
     
-    async def _send_email_action(self, user_id: int, action: Dict) -> Dict[str, Any]:
-        """Queue email for sending"""
-        try:
-            from worker.app.tasks.notifications import send_email
-            
-            # Queue email task
-            send_email.delay(
-                to_email=action.get('to'),
-                subject=action.get('subject', 'Student CRM Notification'),
-                body=action.get('body', ''),
-                user_id=user_id
-            )
-            
-            return {
-                'success': True,
-                'message': 'Email queued for sending'
-            }
-        except Exception as e:
-            return {'success': False, 'error': str(e)}
+    result = await engine.db.execute(query)
     
-    async def _send_notification_action(self, user_id: int, action: Dict) -> Dict[str, Any]:
-        """Send in-app notification"""
-        try:
-            # This would integrate with your notification system
-            # For now, we'll just log it
-            logger.info(f"Notification for user {user_id}: {action.get('message')}")
-            
-            return {
-                'success': True,
-                'message': 'Notification sent'
-            }
-        except Exception as e:
-            return {'success': False, 'error': str(e)}
+    matches: Dict[int, List[int]] = {}
+    for rule_id, application_id in result.all():
+        matches.setdefault(rule_id, []).append(application_id)
+    return matches
+
+async def _application_times(
+    engine: RulesEngine,
+    params,
+    application_ids: Optional[Sequence[int]],
+    time_column,
+    *criteria
+) -> List[Tuple[int, int, datetime]]:
+    """(rule_id, application_id, time) for applications a rule watches"""
+    query = (
+        select(params.c.rule_id, Application.id, time_column)
+        .select_from(params)
+        .join(Application, Application.user_id == params.c.user_id)
+        .where(time_column.isnot(None), *criteria)
+    )
+    if time_column.class_ is Opportunity:
+        query = query.join(Opportunity, Opportunity.id == Application.opportunity_id)
+    if application_ids is not None:
+        query = query.where(Application.id.in_(application_ids))
     
-    async def _update_priority_action(self, user_id: int, action: Dict) -> Dict[str, Any]:
-        """Update application priority"""
-        try:
-            application_id = action.get('application_id')
-            new_priority = action.get('priority', 1)
-            
-            if application_id:
-                app_result = await self.db.execute(
-                    select(Application).where(
-                        Application.id == application_id,
-                        Application.user_id == user_id
-                    )
-                )
-                application = app_result.scalar_one_or_none()
-                
-                if application:
-                    application.priority = new_priority
-                    await self.db.commit()
-                    
-                    return {
-                        'success': True,
-                        'message': f'Updated priority to {new_priority}'
-                    }
-            
-            return {'success': False, 'error': 'Application not found'}
-        except Exception as e:
-            return {'success': False, 'error': str(e)}
\ No newline at end of file
+    result = await engine.db.execute(query)
+    return result.all()
+
+def _owner_table(engine: RulesEngine, plans: Sequence[RulePlan]):
+    return _parameter_table(
+        engine.db,
+        'rule_params',
+        [column('rule_id', Integer), column('user_id', Integer)],
+        [(plan.rule_id, plan.owner_id) for plan in plans]
+    )
+
+def _due_times(plans: Sequence[RulePlan], times, offset_for) -> List[Tuple[int, int, datetime]]:
+    offsets = {plan.rule_id: offset_for(plan.condition) for plan in plans}
+    return [
+        (rule_id, application_id, at + offsets[rule_id])
+        for rule_id, application_id, at in times
+    ]
+
+def _cutoff_table(engine: RulesEngine, plans: Sequence[RulePlan], cutoff_for):
+    return _parameter_table(
+        engine.db,
+        'rule_params',
+        [column('rule_id', Integer), column('user_id', Integer), column('cutoff', DateTime)],
+        [(plan.rule_id, plan.owner_id, cutoff_for(plan.condition)) for plan in plans]
+    )
+
+@dataclass(frozen=True, slots=True)
+class NoResponseCondition:
+    days: float = 7
+
+@trigger("application_no_response", NoResponseCondition)
+async def _match_application_no_response(engine, plans, application_ids=None):
+    """Applications with no response after the configured days"""
+    now = datetime.utcnow()
+    params = _cutoff_table(engine, plans, lambda condition: now - timedelta(days=condition.days))
+    
+    # Applied to but haven't progressed
+    return await _match_applications(
+        engine, params, application_ids,
+        Application.status == 'applied',
+        Application.applied_at <= params.c.cutoff
+    )
+
+@schedules("application_no_response")
+async def _schedule_application_no_response(engine, plans, application_ids=None):
+    """Due once the configured days have passed since applying"""
+    params = _owner_table(engine, plans)
+    times = await _application_times(
+        engine, params, application_ids, Application.applied_at,
+        Application.status == 'applied'
+    )
+    return _due_times(plans, times, lambda condition: timedelta(days=condition.days))
+
+@dataclass(frozen=True, slots=True)
+class DeadlineCondition:
+    hours: float = 48
+
+@trigger("deadline_approaching", DeadlineCondition)
+async def _match_deadline_approaching(engine, plans, application_ids=None):
+    """Open applications whose opportunity deadline falls within the window"""
+    now = datetime.utcnow()
+    params = _cutoff_table(engine, plans, lambda condition: now + timedelta(hours=condition.hours))
+    
+    return await _match_applications(
+        engine, params, application_ids,
+        Application.status.in_(['to_apply', 'applied']),
+        Application.opportunity.has(Opportunity.deadline_at <= params.c.cutoff)
+    )
+
+@schedules("deadline_approaching")
+async def _schedule_deadline_approaching(engine, plans, application_ids=None):
+    """Due when the deadline enters the configured window"""
+    params = _owner_table(engine, plans)
+    times = await _application_times(
+        engine, params, application_ids, Opportunity.deadline_at,
+        Application.status.in_(['to_apply', 'applied'])
+    )
+    return _due_times(plans, times, lambda condition: -timedelta(hours=condition.hours))
+
+@dataclass(frozen=True, slots=True)
+class StatusUnchangedCondition:
+    status: str = 'applied'
+    days: float = 14
+
+@trigger("status_unchanged", StatusUnchangedCondition)
+async def _match_status_unchanged(engine, plans, application_ids=None):
+    """Applications stuck in the configured status"""
+    now = datetime.utcnow()
+    params = _parameter_table(
+        engine.db,
+        'rule_params',
+        [
+            column('rule_id', Integer), column('user_id', Integer),
+            column('status', String), column('cutoff', DateTime)
+        ],
+        [
+            (plan.rule_id, plan.owner_id, plan.condition.status, now - timedelta(days=plan.condition.days))
+            for plan in plans
+        ]
+    )
+    
+    return await _match_applications(
+        engine, params, application_ids,
+        Application.status == params.c.status,
+        Application.updated_at <= params.c.cutoff
+    )
+
+@schedules("status_unchanged")
+async def _schedule_status_unchanged(engine, plans, application_ids=None):
+    """Due once an application has sat in the status for the configured days"""
+    params = _parameter_table(
+        engine.db,
+        'rule_params',
+        [column('rule_id', Integer), column('user_id', Integer), column('status', String)],
+        [(plan.rule_id, plan.owner_id, plan.condition.status) for plan in plans]
+    )
+    times = await _application_times(
+        engine, params, application_ids, Application.updated_at,
+        Application.status == params.c.status
+    )
+    return _due_times(plans, times, lambda condition: timedelta(days=condition.days))
+
+@dataclass(frozen=True, slots=True)
+class NoCondition:
+    pass
+
+@trigger("daily_recommendations", NoCondition, refire=timedelta(days=1))
+async def _match_daily_recommendations(engine, plans, application_ids=None):
+    """Always trigger for daily recommendations"""
+    return {plan.rule_id: [] for plan in plans}
+
+# Actions
+
+@dataclass(frozen=True, slots=True)
+class CreateTaskParams:
+    title: str = 'Automated Task'
+    description: str = ''
+    due_days: float = 1
+    priority: str = 'medium'
+
+@action("create_task", CreateTaskParams)
+async def _create_task_action(engine, plan, application_ids):
+    """Create a task"""
+    params = plan.action_params
+    result = {
+        'success': True,
+        'task_id': None,
+        'message': 'Task created successfully'
+    }
+    engine.batch.add_task(plan.rule_id, {
+        'user_id': plan.owner_id,
+        'title': params.title,
+        'description': params.description,
+        'due_at': datetime.utcnow() + timedelta(days=params.due_days),
+        'priority': params.priority,
+        'source': 'rule_engine'
+    }, result)
+    
+    return result
+
+@dataclass(frozen=True, slots=True)
+class SendEmailParams:
+    to: Optional[str] = None
+    subject: str = 'Student CRM Notification'
+    body: str = ''
+
+@action("send_email", SendEmailParams)
+async def _send_email_action(engine, plan, application_ids):
+    """Add email to the recipient's digest"""
+    params = plan.action_params
+    
+    # Sent with the recipient's other rule emails by flush_email_digests
+    engine.batch.add_email(plan.rule_id, {
+        'recipient': recipient_for(params.to, plan.owner_id),
+        'user_id': plan.owner_id,
+        'rule_id': plan.rule_id,
+        'subject': params.subject,
+        'body': params.body
+    })
+    
+    return {
+        'success': True,
+        'message': 'Email added to digest'
+    }
+
+@dataclass(frozen=True, slots=True)
+class SendNotificationParams:
+    message: Optional[str] = None
+
+@action("send_notification", SendNotificationParams)
+async def _send_notification_action(engine, plan, application_ids):
+    """Send in-app notification"""
+    # This would integrate with your notification system
+    # For now, we'll just log it
+    logger.info(f"Notification for user {plan.owner_id}: {plan.action_params.message}")
+    
+    return {
+        'success': True,
+        'message': 'Notification sent'
+    }
+
+@dataclass(frozen=True, slots=True)
+class UpdatePriorityParams:
+    application_id: Optional[int] = None
+    priority: int = 1
+
+@action("update_priority", UpdatePriorityParams)
+async def _update_priority_action(engine, plan, application_ids):
+    """Update application priority"""
+    params = plan.action_params
+    
+    if params.application_id:
+        # Ownership is checked when the batch is flushed
+        result = {
+            'success': True,
+            'message': f'Updated priority to {params.priority}'
+        }
+        engine.batch.add_priority(plan.rule_id, plan.owner_id, params.application_id, params.priority, result)
+        return result
+    
+    return {'success': False, 'error': 'Application not found'}
@@ -1,230 +1,440 @@
-from typing import List, Dict, Optional
+from typing import List, Dict, Optional, Sequence, Hashable
+from dataclasses import dataclass, field
+import hashlib
+import heapq
+import json
 import numpy as np
-from sklearn.feature_extraction.text import TfidfVectorizer
-from sklearn.metrics.pairwise import cosine_similarity
-import re
-from datetime import datetime, timedelta
+from scipy import sparse
+from sklearn.feature_extraction.text import CountVectorizer, TfidfVectorizer
+from datetime import datetime, timedelta, timezone
 from app.models.application import Application
 from app.models.opportunity import Opportunity
+from app.config import settings
+from app.services.conversion_stats import ConversionStats
+from app.services.experience_model import ExperienceModel, get_experience_model
+from app.services.recommendation_cache import RecommendationState, RecommendationStateStore
+from app.services.skill_index import SkillIndex
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select
+from sqlalchemy import select, or_
+from sqlalchemy.orm import selectinload
+
+# Weighted combination of the component scores
+SCORE_WEIGHTS = {
+    'skills': 0.35,
+    'experience': 0.25,
+    'urgency': 0.15,
+    'conversion': 0.25
+}
+
+# Diversity: don't recommend too many from same company
+MAX_PER_COMPANY = 2
+
+# IDF of a term seen in only one of two documents (smooth_idf=True, n=2),
+# matching the per-pair TF-IDF fit this scorer used to run
+_PAIR_IDF_SQ = (np.log(3.0 / 2.0) + 1.0) ** 2
+
+# Vocabulary cap of that per-pair fit (its 1000 most frequent terms)
+PAIR_MAX_FEATURES = 1000
+
+@dataclass
+class UserFeatures:
+    """User-side inputs shared by every opportunity scored in one run"""
+    skills: List[str]
+    experience: str = ""
+    conversion: ConversionStats = field(default_factory=ConversionStats)
+
+    def fingerprint(self) -> str:
+        """Digest of everything that feeds the user side of the score"""
+        payload = json.dumps([
+            sorted(skill.lower() for skill in self.skills),
+            self.experience,
+            self.conversion.to_json()
+        ], sort_keys=True)
+        return hashlib.sha1(payload.encode()).hexdigest()
 
 class ScoringService:
-    def __init__(self):
-        self.vectorizer = TfidfVectorizer(stop_words='english', max_features=1000)
-        
+    def __init__(self, experience_model: Optional[ExperienceModel] = None):
+        self.experience_model = experience_model
+        self.vectorizer = CountVectorizer(stop_words='english')
+
     async def calculate_fit_score(
-        self, 
+        self,
         user_skills: List[str],
         user_experience: str,
         opportunity: Opportunity,
-        user_applications_history: List[Application],
-        db: AsyncSession
+        conversion_stats: ConversionStats
     ) -> float:
         """Calculate fit score (0-100) for an opportunity"""
-        
-        # Component scores
-        skill_score = self._calculate_skill_match(user_skills, opportunity.skills_required or [])
-        experience_score = self._calculate_experience_match(user_experience, opportunity.jd_text or "")
-        urgency_score = self._calculate_urgency_score(opportunity.deadline_at)
-        conversion_score = await self._calculate_conversion_likelihood(
-            user_applications_history, opportunity, db
+        features = UserFeatures(
+            skills=user_skills,
+            experience=user_experience,
+            conversion=conversion_stats
+        )
+        return float(self.score_opportunities(features, [opportunity])[0])
+
+    async def load_user_features(self, db: AsyncSession, user) -> UserFeatures:
+        """Load the user-side scoring inputs once per run"""
+        from app.models.user import UserSkill, Skill
+
+        skills_result = await db.execute(
+            select(Skill.name).join(UserSkill).where(UserSkill.user_id == user.id)
+        )
+
+        return UserFeatures(
+            skills=list(skills_result.scalars().all()),
+            experience=(user.profile_data or {}).get('experience', ''),
+            conversion=await ConversionStats.for_user(db, user.id)
         )
-        
-        # Weighted combination
-        weights = {
-            'skills': 0.35,
-            'experience': 0.25, 
-            'urgency': 0.15,
-            'conversion': 0.25
-        }
-        
-        final_score = (
-            skill_score * weights['skills'] +
-            experience_score * weights['experience'] +
-            urgency_score * weights['urgency'] +
-            conversion_score * weights['conversion']
+
+    def score_opportunities(
+        self,
+        user_features: UserFeatures,
+        opportunities: Sequence[Opportunity],
+        conversion_scores: Optional[np.ndarray] = None
+    ) -> np.ndarray:
+        """Calculate fit scores (0-100) for many opportunities in one pass.
+
+        ``conversion_scores`` overrides the conversion component, for callers
+        whose history differs per opportunity (e.g. excluding the application
+        being rescored).
+        """
+        if not opportunities:
+            return np.zeros(0)
+
+        # Component scores, one array entry per opportunity
+        skill_scores = self._skill_scores(user_features.skills, opportunities)
+        experience_scores = self._experience_scores(user_features.experience, opportunities)
+        urgency_scores = self._urgency_scores(opportunities)
+        if conversion_scores is None:
+            conversion_scores = self._conversion_scores(user_features.conversion, opportunities)
+
+        final_scores = (
+            skill_scores * SCORE_WEIGHTS['skills'] +
+            experience_scores * SCORE_WEIGHTS['experience'] +
+            urgency_scores * SCORE_WEIGHTS['urgency'] +
+            conversion_scores * SCORE_WEIGHTS['conversion']
         )
-        
-        return min(100.0, max(0.0, final_score))
-    
-    def _calculate_skill_match(self, user_skills: List[str], required_skills: List[str]) -> float:
-        """Calculate skill overlap score using Jaccard similarity"""
-        if not required_skills:
-            return 50.0  # Neutral score when no skills specified
-            
+
+        return np.clip(final_scores, 0.0, 100.0)
+
+    def _skill_scores(self, user_skills: List[str], opportunities: Sequence[Opportunity]) -> np.ndarray:
+        """Calculate skill overlap scores using Jaccard similarity"""
         user_skills_set = set(skill.lower() for skill in user_skills)
-        required_skills_set = set(skill.lower() for skill in required_skills)
-        
+        vocabulary = {skill: i for i, skill in enumerate(user_skills_set)}
+
+        # Binary opportunity x skill matrix; skills the user lacks get their
+        # own columns so row sums still count every required skill
+        indptr = [0]
+        indices = []
+        for opp in opportunities:
+            for skill in set(skill.lower() for skill in (opp.skills_required or [])):
+                indices.append(vocabulary.setdefault(skill, len(vocabulary)))
+            indptr.append(len(indices))
+
+        required = sparse.csr_matrix(
+            (np.ones(len(indices)), indices, indptr),
+            shape=(len(opportunities), max(len(vocabulary), 1))
+        )
+        user_vector = np.zeros(required.shape[1])
+        user_vector[:len(user_skills_set)] = 1.0
+
+        required_counts = np.diff(required.indptr).astype(np.float64)
+        intersection = required @ user_vector
+        union = len(user_skills_set) + required_counts - intersection
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            jaccard_scores = np.where(union > 0, intersection / union, 0.0) * 100.0
+
         if not user_skills_set:
-            return 0.0
-            
-        intersection = user_skills_set.intersection(required_skills_set)
-        union = user_skills_set.union(required_skills_set)
-        
-        jaccard_score = len(intersection) / len(union) if union else 0.0
-        return jaccard_score * 100.0
-    
-    def _calculate_experience_match(self, user_experience: str, job_description: str) -> float:
+            jaccard_scores = np.zeros(len(opportunities))
+
+        # Neutral score when no skills specified
+        return np.where(required_counts == 0, 50.0, jaccard_scores)
+
+    def _experience_scores(self, user_experience: str, opportunities: Sequence[Opportunity]) -> np.ndarray:
         """Calculate experience match using TF-IDF cosine similarity"""
-        if not user_experience or not job_description:
-            return 50.0
-            
+        model = self.experience_model or get_experience_model()
+        if model is None:
+            return self._pairwise_experience_scores(user_experience, opportunities)
+
+        if not user_experience:
+            return np.full(len(opportunities), 50.0)
+
+        similarity = model.similarity(user_experience, opportunities) * 100.0
+        has_description = np.array([bool(opp.jd_text) for opp in opportunities])
+
+        return np.where(has_description, similarity, 50.0)
+
+    def _pairwise_experience_scores(self, user_experience: str, opportunities: Sequence[Opportunity]) -> np.ndarray:
+        """Experience match without a corpus model, one TF-IDF fit per pair.
+
+        Reproduces a TF-IDF model fitted on each (experience, description)
+        pair: terms in both texts get IDF 1, terms in only one text get the
+        same smoothed IDF, so every pair reduces to sparse row operations
+        over a shared term-count matrix. The rare pairs with more than
+        ``PAIR_MAX_FEATURES`` distinct terms are fitted one by one, since
+        which terms that fit kept depends on sklearn's tie-breaking.
+        """
+        descriptions = [opp.jd_text or "" for opp in opportunities]
+        scores = np.full(len(opportunities), 50.0)
+
+        if not user_experience:
+            return scores
+
+        try:
+            counts = self.vectorizer.fit_transform([user_experience] + descriptions)
+        except ValueError:
+            # Empty vocabulary: nothing but stop words on either side
+            return scores
+
+        counts = sparse.csr_matrix(counts, dtype=np.float64)
+        user_vector = counts[0].toarray().ravel()
+        docs = counts[1:]
+
+        user_present = (user_vector > 0).astype(np.float64)
+        docs_squared = docs.multiply(docs).tocsr()
+
+        dot = docs @ user_vector
+        shared_user_sq = (docs > 0).astype(np.float64) @ (user_vector ** 2)
+        shared_doc_sq = docs_squared @ user_present
+        total_doc_sq = np.asarray(docs_squared.sum(axis=1)).ravel()
+        total_user_sq = float((user_vector ** 2).sum())
+
+        user_norm = np.sqrt(_PAIR_IDF_SQ * total_user_sq + (1.0 - _PAIR_IDF_SQ) * shared_user_sq)
+        doc_norm = np.sqrt(_PAIR_IDF_SQ * total_doc_sq + (1.0 - _PAIR_IDF_SQ) * shared_doc_sq)
+        denominator = user_norm * doc_norm
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            similarity = np.where(denominator > 0, dot / denominator, 0.0)
+
+        has_description = np.array([bool(text) for text in descriptions])
+        # A pair with no usable terms at all failed to fit and stayed neutral
+        has_terms = (total_user_sq > 0) | (total_doc_sq > 0)
+        scores = np.where(has_description & has_terms, similarity * 100.0, scores)
+
+        shared_terms = (docs > 0).astype(np.float64) @ user_present
+        distinct_terms = np.diff(docs.indptr) + np.count_nonzero(user_vector) - shared_terms
+        for i in np.flatnonzero(has_description & (distinct_terms > PAIR_MAX_FEATURES)):
+            scores[i] = self._capped_pair_score(user_experience, descriptions[i])
+
+        return scores
+
+    def _capped_pair_score(self, user_experience: str, description: str) -> float:
+        """The per-pair TF-IDF fit, for pairs whose vocabulary hits the cap"""
+        vectorizer = TfidfVectorizer(stop_words='english', max_features=PAIR_MAX_FEATURES)
         try:
-            # Preprocess texts
-            texts = [user_experience.lower(), job_description.lower()]
-            
-            # Calculate TF-IDF vectors
-            tfidf_matrix = self.vectorizer.fit_transform(texts)
-            
-            # Calculate cosine similarity
-            similarity = cosine_similarity(tfidf_matrix[0:1], tfidf_matrix[1:2])[0][0]
-            
-            return similarity * 100.0
-        except:
+            tfidf = vectorizer.fit_transform([user_experience.lower(), description.lower()])
+        except ValueError:
             return 50.0
-    
-    def _calculate_urgency_score(self, deadline: Optional[datetime]) -> float:
-        """Calculate urgency score based on deadline"""
-        if not deadline:
-            return 50.0  # Neutral score for no deadline
-            
+        # Rows are L2-normalised, so their dot product is the cosine
+        return float(tfidf[0].multiply(tfidf[1]).sum()) * 100.0
+
+    def _urgency_scores(self, opportunities: Sequence[Opportunity]) -> np.ndarray:
+        """Calculate urgency scores based on deadlines"""
         now = datetime.utcnow()
-        days_until_deadline = (deadline - now).days
-        
-        if days_until_deadline < 0:
-            return 0.0  # Deadline passed
-        elif days_until_deadline <= 2:
-            return 100.0  # Very urgent
-        elif days_until_deadline <= 7:
-            return 80.0  # Urgent
-        elif days_until_deadline <= 30:
-            return 60.0  # Moderate urgency
-        else:
-            return 40.0  # Low urgency
-    
-    async def _calculate_conversion_likelihood(
-        self, 
-        user_applications: List[Application],
-        opportunity: Opportunity,
-        db: AsyncSession
-    ) -> float:
-        """Calculate likelihood of success based on historical data"""
-        if not user_applications:
-            return 50.0  # Neutral score for new users
-            
-        # Analyze similar applications
-        similar_apps = [
-            app for app in user_applications 
-            if app.opportunity.kind == opportunity.kind
-        ]
-        
-        if not similar_apps:
-            return 50.0
-            
-        # Calculate success rate
-        successful_apps = [
-            app for app in similar_apps 
-            if app.status in ['offer', 'accepted']
-        ]
-        
-        success_rate = len(successful_apps) / len(similar_apps)
-        
-        # Boost score based on recent positive outcomes
-        recent_apps = [
-            app for app in similar_apps 
-            if app.created_at > datetime.utcnow() - timedelta(days=90)
-        ]
-        
-        if recent_apps:
-            recent_success_rate = len([
-                app for app in recent_apps 
-                if app.status in ['offer', 'accepted']
-            ]) / len(recent_apps)
-            
-            # Weight recent performance more heavily
-            final_rate = (success_rate * 0.4) + (recent_success_rate * 0.6)
-        else:
-            final_rate = success_rate
-            
-        return final_rate * 100.0
+        days_until_deadline = np.array([
+            (opp.deadline_at - now).days if opp.deadline_at else np.nan
+            for opp in opportunities
+        ], dtype=np.float64)
+
+        return np.select(
+            [
+                np.isnan(days_until_deadline),  # Neutral score for no deadline
+                days_until_deadline < 0,  # Deadline passed
+                days_until_deadline <= 2,  # Very urgent
+                days_until_deadline <= 7,  # Urgent
+                days_until_deadline <= 30  # Moderate urgency
+            ],
+            [50.0, 0.0, 100.0, 80.0, 60.0],
+            default=40.0  # Low urgency
+        )
+
+    def _conversion_scores(
+        self,
+        conversion_stats: ConversionStats,
+        opportunities: Sequence[Opportunity]
+    ) -> np.ndarray:
+        """Calculate likelihood of success for each opportunity's kind"""
+        rates_by_kind = {}
+        for opp in opportunities:
+            if opp.kind not in rates_by_kind:
+                rates_by_kind[opp.kind] = conversion_stats.likelihood(opp.kind)
+
+        return np.array([rates_by_kind[opp.kind] for opp in opportunities], dtype=np.float64)
 
     async def generate_recommendations(
-        self, 
+        self,
         user_id: int,
-        limit: int = 10,
-        db: AsyncSession
+        db: AsyncSession,
+        limit: int = 10
     ) -> List[Dict]:
         """Generate personalized opportunity recommendations"""
-        from app.models.user import User, UserSkill
-        from app.models.application import Application
-        
+        from app.models.user import User
+
         # Get user data
-        user_result = await db.execute(
-            select(User).where(User.id == user_id)
-        )
-        user = user_result.scalar_one_or_none()
-        
+        user = await db.get(User, user_id)
         if not user:
             return []
-            
-        # Get user skills
-        skills_result = await db.execute(
-            select(UserSkill).where(UserSkill.user_id == user_id)
+
+        # Get user skills, experience and conversion history
+        features = await self.load_user_features(db, user)
+
+        # Get available opportunities (not applied to)
+        applied_opportunity_ids = await self._applied_opportunity_ids(db, user_id)
+        opportunities = await self._load_candidates(db, features, applied_opportunity_ids)
+
+        # Score all candidates in one pass
+        scores = self.score_opportunities(features, opportunities)
+
+        return self._diverse_recommendations(opportunities, scores, limit)
+
+    async def refresh_recommendations(
+        self,
+        user_id: int,
+        db: AsyncSession,
+        limit: int = 10
+    ) -> List[Dict]:
+        """Recommendations that rescore only what changed since the last run.
+
+        The previous run's best ``RECOMMENDATION_POOL_SIZE`` opportunities are
+        kept with a watermark. While the user's features are unchanged, a run
+        scores that pool plus opportunities created or updated after the
+        watermark; expired and applied-to ones drop out. A full recompute
+        happens when the features change or the full refresh interval passes.
+        """
+        from app.models.user import User
+
+        user = await db.get(User, user_id)
+        if not user:
+            return []
+
+        features = await self.load_user_features(db, user)
+        fingerprint = features.fingerprint()
+        applied_opportunity_ids = await self._applied_opportunity_ids(db, user_id)
+
+        store = RecommendationStateStore()
+        state = await store.get(user_id)
+        started_at = datetime.now(timezone.utc)
+
+        if state and state.is_reusable(fingerprint, started_at):
+            opportunities = await self._load_changed_since(db, state, applied_opportunity_ids)
+            full_refresh_at = state.full_refresh_at
+        else:
+            opportunities = await self._load_candidates(db, features, applied_opportunity_ids)
+            full_refresh_at = started_at
+
+        scores = self.score_opportunities(features, opportunities)
+        pool = heapq.nlargest(
+            max(settings.RECOMMENDATION_POOL_SIZE, limit),
+            range(len(opportunities)),
+            key=lambda i: (scores[i], -i)
         )
-        user_skills = [skill.skill.name for skill in skills_result.scalars().all()]
-        
-        # Get user applications history
-        apps_result = await db.execute(
-            select(Application).where(Application.user_id == user_id)
+
+        # Overlap the watermark so rows committed during this run are not missed
+        overlap = timedelta(seconds=settings.RECOMMENDATION_WATERMARK_OVERLAP_SECONDS)
+        await store.set(user_id, RecommendationState(
+            fingerprint=fingerprint,
+            watermark=started_at - overlap,
+            full_refresh_at=full_refresh_at,
+            pool=[opportunities[i].id for i in pool]
+        ))
+
+        return self._diverse_recommendations(
+            [opportunities[i] for i in pool], scores[pool], limit
         )
-        user_applications = apps_result.scalars().all()
-        
-        # Get available opportunities (not applied to)
-        applied_opportunity_ids = [app.opportunity_id for app in user_applications]
-        
-        opportunities_query = select(Opportunity).where(
-            Opportunity.status == 'active'
+
+    async def _applied_opportunity_ids(self, db: AsyncSession, user_id: int) -> List[int]:
+        applied_result = await db.execute(
+            select(Application.opportunity_id).where(Application.user_id == user_id)
         )
-        if applied_opportunity_ids:
-            opportunities_query = opportunities_query.where(
-                ~Opportunity.id.in_(applied_opportunity_ids)
-            )
-            
-        opportunities_result = await db.execute(opportunities_query)
-        opportunities = opportunities_result.scalars().all()
-        
-        # Score each opportunity
-        scored_opportunities = []
-        for opp in opportunities:
-            score = await self.calculate_fit_score(
-                user_skills,
-                user.profile_data.get('experience', ''),
-                opp,
-                user_applications,
-                db
+        return list(applied_result.scalars().all())
+
+    async def _load_candidates(
+        self,
+        db: AsyncSession,
+        features: UserFeatures,
+        applied_opportunity_ids: List[int]
+    ) -> List[Opportunity]:
+        """Load the bounded candidate set for a full scoring pass"""
+        # Prune to a bounded candidate set via the skill index
+        candidate_ids = await SkillIndex(db).candidate_ids(
+            features.skills, exclude_ids=applied_opportunity_ids
+        )
+        if not candidate_ids:
+            return []
+
+        opportunities_result = await db.execute(
+            select(Opportunity)
+            .options(selectinload(Opportunity.organization))
+            .where(Opportunity.id.in_(candidate_ids))
+        )
+        return list(opportunities_result.scalars().all())
+
+    async def _load_changed_since(
+        self,
+        db: AsyncSession,
+        state: RecommendationState,
+        applied_opportunity_ids: List[int]
+    ) -> List[Opportunity]:
+        """Load the stored pool plus opportunities changed after the watermark"""
+        query = select(Opportunity).options(
+            selectinload(Opportunity.organization)
+        ).where(
+            Opportunity.status == 'active',
+            or_(
+                Opportunity.created_at > state.watermark,
+                Opportunity.updated_at > state.watermark,
+                Opportunity.id.in_(state.pool)
             )
-            
-            scored_opportunities.append({
-                'opportunity': opp,
-                'fit_score': score,
-                'organization': opp.organization
-            })
-        
-        # Sort by score and apply diversity
-        scored_opportunities.sort(key=lambda x: x['fit_score'], reverse=True)
-        
-        # Add diversity (don't recommend too many from same company)
-        diverse_recommendations = []
-        company_counts = {}
-        
-        for item in scored_opportunities:
-            company = item['organization'].name
-            if company_counts.get(company, 0) < 2:  # Max 2 per company
-                diverse_recommendations.append(item)
-                company_counts[company] = company_counts.get(company, 0) + 1
-                
-                if len(diverse_recommendations) >= limit:
-                    break
-        
-        return diverse_recommendations[:limit]
\ No newline at end of file
+        )
+        if applied_opportunity_ids:
+            query = query.where(~Opportunity.id.in_(applied_opportunity_ids))
+
+        opportunities_result = await db.execute(query)
+        return list(opportunities_result.scalars().all())
+
+    def _diverse_recommendations(
+        self,
+        opportunities: Sequence[Opportunity],
+        scores: np.ndarray,
+        limit: int
+    ) -> List[Dict]:
+        # Pick the best while limiting recommendations from the same company
+        companies = [opp.organization.name if opp.organization else None for opp in opportunities]
+        top_indices = select_diverse_top_k(scores, companies, limit)
+
+        return [
+            {
+                'opportunity': opportunities[i],
+                'fit_score': float(scores[i]),
+                'organization': opportunities[i].organization
+            }
+            for i in top_indices
+        ]
+
+def select_diverse_top_k(
+    scores: Sequence[float],
+    companies: Sequence[Optional[Hashable]],
+    limit: int,
+    per_company: int = MAX_PER_COMPANY
+) -> List[int]:
+    """Indices of the ``limit`` best scores with at most ``per_company`` each.
+
+    Heapifies once and pops only until enough items are accepted, instead of
+    sorting every scored opportunity. Ties keep their original order.
+    """
+    heap = [(-float(score), i) for i, score in enumerate(scores)]
+    heapq.heapify(heap)
+
+    selected = []
+    company_counts: Dict[Hashable, int] = {}
+    while heap and len(selected) < limit:
+        _, i = heapq.heappop(heap)
+        company = companies[i]
+        if company is not None:
+            if company_counts.get(company, 0) >= per_company:
+                continue
+            company_counts[company] = company_counts.get(company, 0) + 1
+        selected.append(i)
+
+    return selected
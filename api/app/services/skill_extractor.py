@@ -0,0 +1,207 @@
+from typing import Dict, Iterable, List, Optional, Tuple
+from collections import deque
+import time
+import redis
+from sqlalchemy import select, insert
+from sqlalchemy import inspect as sa_inspect
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.config import settings
+from app.models.opportunity import normalize_skill
+from app.models.user import Skill
+from app.services.cache import get_redis, invalidate_on_commit, INCREMENT
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Bumped on every committed change to the skills table; extractors built
+# from an older generation are rebuilt on their next check
+TAXONOMY_GENERATION_KEY = "skills:taxonomy:generation"
+
+# Seeded into an empty skills table (the list the scraper used to hardcode)
+DEFAULT_SKILLS: Dict[str, List[str]] = {
+    'language': ['Python', 'Java', 'JavaScript', 'C++', 'C#', 'Ruby', 'Go', 'Rust', 'Swift', 'Kotlin', 'PHP', 'TypeScript'],
+    'framework': ['React', 'Angular', 'Vue', 'Django', 'Flask', 'Spring', 'Express', 'Laravel', 'Rails'],
+    'tool': ['AWS', 'Azure', 'GCP', 'Docker', 'Kubernetes', 'Jenkins', 'Git', 'PostgreSQL', 'MongoDB', 'Redis'],
+    'data': ['Machine Learning', 'Data Science', 'AI', 'Deep Learning', 'TensorFlow', 'PyTorch'],
+    'concept': ['SQL', 'NoSQL', 'REST', 'GraphQL', 'Microservices', 'DevOps', 'CI/CD'],
+}
+
+# Common spellings, by normalized skill name; merged with Skill.synonyms
+DEFAULT_SYNONYMS: Dict[str, List[str]] = {
+    'kubernetes': ['k8s'],
+    'javascript': ['js', 'ecmascript'],
+    'go': ['golang'],
+    'postgresql': ['postgres', 'psql'],
+    'mongodb': ['mongo'],
+    'machine learning': ['ml'],
+    'ai': ['artificial intelligence'],
+    'gcp': ['google cloud', 'google cloud platform'],
+    'aws': ['amazon web services'],
+    'azure': ['microsoft azure'],
+    'react': ['react.js', 'reactjs'],
+    'vue': ['vue.js', 'vuejs'],
+    'express': ['express.js', 'expressjs'],
+    'rails': ['ruby on rails'],
+    'spring': ['spring boot'],
+    'c#': ['csharp'],
+    'c++': ['cpp'],
+    'ci/cd': ['cicd', 'continuous integration'],
+    'rest': ['restful', 'rest api'],
+}
+
+def _is_word_char(char: str) -> bool:
+    return char.isalnum() or char == '_'
+
+class SkillExtractor:
+    """Finds known skills in free text in one pass over it.
+
+    Every skill name and synonym goes into an Aho-Corasick automaton, so
+    matching costs time linear in the text (plus the matches) however
+    large the taxonomy is. Text is lowercased and its whitespace collapsed
+    first; a match counts only on word boundaries, so "go" does not match
+    inside "google", and overlapping matches keep the longest.
+    """
+
+    def __init__(self, skills: Iterable[Tuple[int, str, Iterable[str]]], generation: int = 0):
+        self.generation = generation
+        self.names: Dict[int, str] = {}
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        # (term length, skill id) for every term ending at a state
+        self._out: List[List[Tuple[int, int]]] = [[]]
+
+        terms: Dict[str, int] = {}
+        for skill_id, name, synonyms in skills:
+            self.names[skill_id] = name
+            for term in [name, *(synonyms or []), *DEFAULT_SYNONYMS.get(normalize_skill(name), [])]:
+                term = normalize_skill(term) if isinstance(term, str) else ''
+                if term and terms.setdefault(term, skill_id) != skill_id:
+                    logger.warning(f"Skill term '{term}' is claimed by skills {terms[term]} and {skill_id}; keeping {terms[term]}")
+
+        for term, skill_id in terms.items():
+            self._add(term, skill_id)
+        self._link()
+
+    def _add(self, term: str, skill_id: int):
+        state = 0
+        for char in term:
+            next_state = self._goto[state].get(char)
+            if next_state is None:
+                next_state = len(self._goto)
+                self._goto[state][char] = next_state
+                self._goto.append({})
+                self._fail.append(0)
+                self._out.append([])
+            state = next_state
+        self._out[state].append((len(term), skill_id))
+
+    def _link(self):
+        """Breadth-first pass setting failure links and merged outputs"""
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, child in self._goto[state].items():
+                fallback = self._fail[state]
+                while fallback and char not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                self._fail[child] = self._goto[fallback].get(char, 0)
+                self._out[child] = self._out[child] + self._out[self._fail[child]]
+                queue.append(child)
+
+    def extract(self, text: str) -> List[int]:
+        """IDs of the skills mentioned in ``text``, in order of first mention"""
+        if not text:
+            return []
+        text = " ".join(text.lower().split())
+        goto, fail, out = self._goto, self._fail, self._out
+        matches: List[Tuple[int, int, int]] = []
+        state = 0
+        for end, char in enumerate(text, 1):
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+            for length, skill_id in out[state]:
+                start = end - length
+                if (start == 0 or not _is_word_char(text[start - 1])) and (end == len(text) or not _is_word_char(text[end])):
+                    matches.append((start, -end, skill_id))
+
+        # Leftmost-longest: "react.js" is React, not React and JavaScript
+        found: Dict[int, None] = {}
+        covered = 0
+        for start, negative_end, skill_id in sorted(matches):
+            if start >= covered:
+                found.setdefault(skill_id)
+                covered = -negative_end
+        return list(found)
+
+    def extract_names(self, text: str) -> List[str]:
+        """Canonical names of the skills mentioned in ``text``"""
+        return [self.names[skill_id] for skill_id in self.extract(text)]
+
+async def seed_default_skills(db: AsyncSession) -> int:
+    """Insert the default skills into an empty table; commits the session"""
+    rows = [
+        {'name': name, 'category': category, 'synonyms': []}
+        for category, names in DEFAULT_SKILLS.items()
+        for name in names
+    ]
+    try:
+        await db.execute(insert(Skill), rows)
+        await db.commit()
+    except IntegrityError:
+        # Seeded concurrently by another process
+        await db.rollback()
+        return 0
+    logger.info(f"Seeded {len(rows)} default skills")
+    return len(rows)
+
+async def load_skill_extractor(db: AsyncSession, generation: int = 0) -> SkillExtractor:
+    """Build an extractor from the skills table, seeding it when empty"""
+    query = select(Skill.id, Skill.name, Skill.synonyms)
+    skills = (await db.execute(query)).all()
+    if not skills:
+        await seed_default_skills(db)
+        skills = (await db.execute(query)).all()
+
+    extractor = SkillExtractor(skills, generation)
+    logger.info(f"Built skill extractor for {len(skills)} skills (generation {generation})")
+    return extractor
+
+_extractor: Optional[SkillExtractor] = None
+_checked_at = 0.0
+
+async def get_skill_extractor(db: AsyncSession) -> SkillExtractor:
+    """Process-wide extractor, rebuilt when the skills table has changed.
+
+    The generation counter in Redis is read at most every
+    ``SKILL_TAXONOMY_CHECK_SECONDS``, so taxonomy edits reach every worker
+    within that delay without a query per call.
+    """
+    global _extractor, _checked_at
+
+    now = time.monotonic()
+    if _extractor is not None and now - _checked_at < settings.SKILL_TAXONOMY_CHECK_SECONDS:
+        return _extractor
+
+    try:
+        generation = int(await get_redis().get(TAXONOMY_GENERATION_KEY) or 0)
+    except redis.RedisError as e:
+        logger.warning(f"Could not check skill taxonomy generation: {e}")
+        if _extractor is not None:
+            return _extractor
+        generation = -1  # rebuilt again once Redis answers
+
+    _checked_at = now
+    if _extractor is None or _extractor.generation != generation:
+        _extractor = await load_skill_extractor(db, generation)
+    return _extractor
+
+def _skill_invalidations(skill: Skill, change: str) -> Iterable[str]:
+    if change == "dirty":
+        state = sa_inspect(skill)
+        if not any(state.attrs[name].history.has_changes() for name in ('name', 'synonyms')):
+            return ()
+    return (TAXONOMY_GENERATION_KEY,)
+
+invalidate_on_commit(Skill, _skill_invalidations, action=INCREMENT)
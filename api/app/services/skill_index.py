@@ -0,0 +1,133 @@
+from typing import List, Iterable, Optional, Set
+import random
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select, delete, insert, func, union_all
+from app.config import settings
+from app.models.opportunity import Opportunity, OpportunitySkill, normalize_skills
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Random pivots drawn per exploration slot, and at most per query (SQLite
+# caps compound SELECTs at 500 terms)
+EXPLORATION_OVERSAMPLE = 2
+EXPLORATION_MAX_PIVOTS = 400
+
+class SkillIndex:
+    """Candidate lookup over the opportunity_skills inverted index"""
+
+    def __init__(self, db: AsyncSession):
+        self.db = db
+
+    async def candidate_ids(
+        self,
+        skills: Iterable[str],
+        exclude_ids: Iterable[int] = (),
+        limit: Optional[int] = None,
+        exploration: Optional[int] = None
+    ) -> List[int]:
+        """Return a bounded set of active opportunity IDs worth scoring.
+
+        The set contains opportunities sharing the most skills with the
+        user, opportunities that list no skills (they get a neutral skill
+        score, so they can still rank well), and a small exploration sample
+        of everything else.
+        """
+        limit = settings.RECOMMENDATION_CANDIDATE_LIMIT if limit is None else limit
+        exploration = settings.RECOMMENDATION_EXPLORATION_SAMPLE if exploration is None else exploration
+        exclude_ids = list(exclude_ids)
+
+        def _available(query):
+            query = query.where(Opportunity.status == 'active')
+            if exclude_ids:
+                query = query.where(~Opportunity.id.in_(exclude_ids))
+            return query
+
+        candidates: List[int] = []
+        normalized = normalize_skills(skills)
+
+        # Opportunities ranked by number of shared skills
+        if normalized:
+            matches = func.count(OpportunitySkill.skill)
+            result = await self.db.execute(
+                _available(
+                    select(OpportunitySkill.opportunity_id)
+                    .join(Opportunity, Opportunity.id == OpportunitySkill.opportunity_id)
+                    .where(OpportunitySkill.skill.in_(normalized))
+                )
+                .group_by(OpportunitySkill.opportunity_id)
+                .order_by(matches.desc(), OpportunitySkill.opportunity_id)
+                .limit(limit)
+            )
+            candidates.extend(result.scalars().all())
+
+        # Opportunities without listed skills
+        result = await self.db.execute(
+            _available(select(Opportunity.id).where(~Opportunity.skill_entries.any()))
+            .order_by(Opportunity.id.desc())
+            .limit(limit)
+        )
+        candidates.extend(result.scalars().all())
+
+        if exploration:
+            candidates.extend(await self._exploration_sample(
+                set(candidates).union(exclude_ids), exploration
+            ))
+
+        return candidates
+
+    async def _exploration_sample(self, seen: Set[int], size: int) -> List[int]:
+        """Sample active opportunities at independent random points in the ID range"""
+        active = Opportunity.status == 'active'
+        bounds = await self.db.execute(
+            select(func.min(Opportunity.id), func.max(Opportunity.id)).where(active)
+        )
+        low, high = bounds.one()
+        if low is None:
+            return []
+
+        # Each pivot takes the first active ID at or after it, all in one
+        # round trip. Adjacent IDs (one scrape batch, one company) are no more
+        # likely to be picked together than any others. Oversample to make up
+        # for pivots landing on the same ID or on IDs already seen or excluded.
+        draws = min(EXPLORATION_OVERSAMPLE * size, EXPLORATION_MAX_PIVOTS)
+        pivots = sorted({random.randint(low, high) for _ in range(draws)})
+        result = await self.db.execute(union_all(*(
+            select(func.min(Opportunity.id)).where(active, Opportunity.id >= pivot)
+            for pivot in pivots
+        )))
+
+        sample = list(dict.fromkeys(
+            opp_id for opp_id in result.scalars().all() if opp_id is not None and opp_id not in seen
+        ))
+        random.shuffle(sample)
+        return sample[:size]
+
+    async def rebuild(self) -> int:
+        """Rebuild the whole index from Opportunity.skills_required"""
+        await self.db.execute(delete(OpportunitySkill))
+
+        result = await self.db.stream(
+            select(Opportunity.id, Opportunity.skills_required)
+            .execution_options(yield_per=5000)
+        )
+
+        rows = []
+        indexed = 0
+        async for opportunity_id, skills_required in result:
+            rows.extend(
+                {'opportunity_id': opportunity_id, 'skill': skill}
+                for skill in normalize_skills(skills_required)
+            )
+            if len(rows) >= 5000:
+                await self.db.execute(insert(OpportunitySkill), rows)
+                indexed += len(rows)
+                rows = []
+
+        if rows:
+            await self.db.execute(insert(OpportunitySkill), rows)
+            indexed += len(rows)
+
+        await self.db.commit()
+        logger.info(f"Rebuilt skill index with {indexed} entries")
+        return indexed
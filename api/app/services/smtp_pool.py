@@ -0,0 +1,151 @@
+from typing import List, Optional, Sequence, Tuple
+from email.message import EmailMessage
+import asyncio
+import random
+import weakref
+import aiosmtplib
+from app.config import settings
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Worth another attempt on a fresh connection. 5xx replies (bad address,
+# rejected content) are permanent and raised straight away.
+_TRANSIENT_ERRORS = (
+    aiosmtplib.SMTPServerDisconnected,
+    aiosmtplib.SMTPConnectError,
+    aiosmtplib.SMTPTimeoutError,
+    OSError,
+)
+
+def build_message(to_email: str, subject: str, body: str, from_email: Optional[str] = None) -> EmailMessage:
+    message = EmailMessage()
+    message["From"] = from_email or settings.SMTP_FROM or settings.SMTP_USERNAME
+    message["To"] = to_email
+    message["Subject"] = subject
+    message.set_content(body)
+    return message
+
+class SMTPPool:
+    """Authenticated SMTP sessions reused across messages on one event loop.
+
+    At most ``size`` sessions send at once. Each session carries up to
+    ``max_messages`` messages before it is recycled, so a burst of thousands
+    of reminders costs a handful of logins instead of one per message.
+    Transient failures are retried on a fresh session with exponential
+    backoff.
+    """
+
+    def __init__(
+        self,
+        hostname: Optional[str] = None,
+        port: Optional[int] = None,
+        username: Optional[str] = None,
+        password: Optional[str] = None,
+        size: Optional[int] = None,
+        max_messages: Optional[int] = None,
+        retries: Optional[int] = None,
+        backoff: Optional[float] = None
+    ):
+        self.hostname = hostname or settings.SMTP_HOST
+        self.port = port or settings.SMTP_PORT
+        self.username = settings.SMTP_USERNAME if username is None else username
+        self.password = settings.SMTP_PASSWORD if password is None else password
+        self.size = size or settings.SMTP_POOL_SIZE
+        self.max_messages = max_messages or settings.SMTP_MESSAGES_PER_CONNECTION
+        self.retries = settings.SMTP_MAX_RETRIES if retries is None else retries
+        self.backoff = settings.SMTP_RETRY_BACKOFF_SECONDS if backoff is None else backoff
+        self._semaphore = asyncio.Semaphore(self.size)
+        # Idle sessions with the number of messages each has sent
+        self._idle: List[Tuple[aiosmtplib.SMTP, int]] = []
+
+    async def _acquire(self) -> Tuple[aiosmtplib.SMTP, int]:
+        while self._idle:
+            client, sent = self._idle.pop()
+            if client.is_connected:
+                return client, sent
+
+        client = aiosmtplib.SMTP(
+            hostname=self.hostname,
+            port=self.port,
+            username=self.username or None,
+            password=self.password or None,
+            timeout=settings.SMTP_TIMEOUT_SECONDS
+        )
+        await client.connect()
+        return client, 0
+
+    async def _release(self, client: aiosmtplib.SMTP, sent: int):
+        if sent < self.max_messages and client.is_connected:
+            self._idle.append((client, sent))
+        else:
+            await self._quit(client)
+
+    async def _quit(self, client: aiosmtplib.SMTP):
+        try:
+            await client.quit()
+        except (aiosmtplib.SMTPException, OSError):
+            client.close()
+
+    def _discard(self, client: Optional[aiosmtplib.SMTP]):
+        if client is not None and client.is_connected:
+            client.close()
+
+    async def send_message(self, message: EmailMessage):
+        async with self._semaphore:
+            for attempt in range(self.retries + 1):
+                client = None
+                try:
+                    client, sent = await self._acquire()
+                    await client.send_message(message)
+                except aiosmtplib.SMTPResponseException as e:
+                    # The session state after a refused transaction is unknown
+                    self._discard(client)
+                    if e.code < 400 or e.code >= 500 or attempt == self.retries:
+                        raise
+                    error = e
+                except _TRANSIENT_ERRORS as e:
+                    self._discard(client)
+                    if attempt == self.retries:
+                        raise
+                    error = e
+                except BaseException:
+                    # Anything else (refused recipients, unsupported extensions,
+                    # cancellation) still must not leak the session
+                    self._discard(client)
+                    raise
+                else:
+                    await self._release(client, sent + 1)
+                    return
+
+                delay = self.backoff * 2 ** attempt * (1 + random.random())
+                logger.warning(f"Sending email to {message['To']} failed ({error}), retrying in {delay:.1f}s")
+                await asyncio.sleep(delay)
+
+    async def send_email(self, to_email: str, subject: str, body: str):
+        await self.send_message(build_message(to_email, subject, body))
+
+    async def send_many(self, messages: Sequence[EmailMessage]) -> List[Optional[BaseException]]:
+        """Send concurrently; returns None or the final error for each message"""
+        results = await asyncio.gather(
+            *(self.send_message(message) for message in messages),
+            return_exceptions=True
+        )
+        return [result if isinstance(result, BaseException) else None for result in results]
+
+    async def close(self):
+        idle, self._idle = self._idle, []
+        for client, _ in idle:
+            await self._quit(client)
+
+# Sessions are bound to the loop that opened them, like the asyncio Redis clients
+_pools: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, SMTPPool]" = weakref.WeakKeyDictionary()
+
+def get_smtp_pool() -> SMTPPool:
+    """Shared SMTP pool for the running event loop"""
+    loop = asyncio.get_running_loop()
+    pool = _pools.get(loop)
+    if pool is None:
+        pool = SMTPPool()
+        _pools[loop] = pool
+    return pool
@@ -0,0 +1,312 @@
+from typing import Dict, List, Optional, Sequence, Tuple
+import fcntl
+import json
+import os
+import threading
+from contextlib import contextmanager
+import numpy as np
+from app.config import settings
+import logging
+
+logger = logging.getLogger(__name__)
+
+VECTOR_INDEX_DIR = os.path.join(settings.INDEX_DIR, "vectors")
+
+class VectorIndex:
+    """File-backed IVF (inverted file) index over float32 embeddings.
+
+    Vectors are L2-normalised and kept in a memory-mapped row file. After
+    ``train`` the rows are ordered by k-means cell, so a search scores only
+    the ``nprobe`` cells nearest the query plus the unsorted tail of rows
+    added since. Deletes are tombstones; ``train`` compacts them away.
+
+    Writers take an exclusive file lock, so several worker processes can
+    update one index. Readers reload when the on-disk version changes.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._version = None
+        self._rows_by_id: Optional[Dict[int, int]] = None
+        self._load()
+
+    # Files
+
+    def _file(self, name: str) -> str:
+        return os.path.join(self.path, name)
+
+    def _data_file(self, name: str, generation: Optional[int] = None) -> str:
+        # Each training pass writes a new generation of data files, so a
+        # reader never pairs metadata with rows reordered underneath it
+        generation = self.meta['generation'] if generation is None else generation
+        return self._file(f"{name}.{generation}")
+
+    def _read_meta(self) -> Dict:
+        try:
+            with open(self._file("meta.json")) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {
+                'version': 0, 'dim': None, 'count': 0, 'capacity': 0,
+                'sorted_count': 0, 'list_offsets': [], 'deleted': 0,
+                'generation': 0
+            }
+
+    def _write_meta(self):
+        self.meta['version'] += 1
+        tmp_path = self._file(".meta.json.tmp")
+        with open(tmp_path, "w") as f:
+            json.dump(self.meta, f)
+        os.replace(tmp_path, self._file("meta.json"))
+        self._version = self.meta['version']
+
+    def _map(self, name: str, dtype, shape, mode: str = 'r') -> Optional[np.memmap]:
+        if not shape[0]:
+            return None
+        return np.memmap(self._data_file(name), dtype=dtype, mode=mode, shape=shape)
+
+    def _load(self, mode: str = 'r'):
+        self.meta = self._read_meta()
+        capacity, dim = self.meta['capacity'], self.meta['dim']
+        self.vectors = self._map("vectors.f32", np.float32, (capacity, dim or 0), mode)
+        self.ids = self._map("ids.i64", np.int64, (capacity,), mode)
+        self.centroids = (
+            np.load(self._data_file("centroids.npy")) if self.meta['list_offsets'] else None
+        )
+        if self.meta['version'] != self._version:
+            # Written by another process (or never built); our own writes keep it current
+            self._rows_by_id = None
+        self._version = self.meta['version']
+
+    def _refresh(self):
+        """Pick up writes made by other processes"""
+        if self._read_meta()['version'] != self._version:
+            try:
+                self._load()
+            except FileNotFoundError:
+                # A writer retired the generation we just read; take the new one
+                self._load()
+
+    @contextmanager
+    def _writing(self):
+        os.makedirs(self.path, exist_ok=True)
+        with self._lock, open(self._file(".lock"), "w") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                self._load(mode='r+')
+                yield
+            except BaseException:
+                # The lookup may be ahead of what was published
+                self._rows_by_id = None
+                raise
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _grow(self, needed: int):
+        capacity = self.meta['capacity']
+        if needed <= capacity:
+            return
+
+        new_capacity = max(needed, capacity * 2, 1024)
+        dim = self.meta['dim']
+        for name, itemsize in (("vectors.f32", 4 * dim), ("ids.i64", 8)):
+            with open(self._data_file(name), "ab") as f:
+                f.truncate(new_capacity * itemsize)
+
+        self.meta['capacity'] = new_capacity
+        self.vectors = self._map("vectors.f32", np.float32, (new_capacity, dim), mode='r+')
+        self.ids = self._map("ids.i64", np.int64, (new_capacity,), mode='r+')
+
+    def _row_lookup(self) -> Dict[int, int]:
+        """Entity ID -> row map, kept up to date by this instance's writes"""
+        if self._rows_by_id is None:
+            self._rows_by_id = self._scan_rows()
+        return self._rows_by_id
+
+    def _scan_rows(self) -> Dict[int, int]:
+        count = self.meta['count']
+        if not count:
+            return {}
+        live = np.flatnonzero(self.ids[:count] >= 0)
+        return dict(zip(self.ids[live].tolist(), live.tolist()))
+
+    # Writes
+
+    def add(self, ids: Sequence[int], vectors) -> None:
+        """Insert or replace vectors for the given entity IDs"""
+        vectors = _normalize(np.asarray(vectors, dtype=np.float32).reshape(len(ids), -1))
+
+        with self._writing():
+            if self.meta['dim'] is None:
+                self.meta['dim'] = int(vectors.shape[1])
+            elif vectors.shape[1] != self.meta['dim']:
+                raise ValueError(f"Expected {self.meta['dim']}-d vectors, got {vectors.shape[1]}-d")
+
+            self._delete_rows(ids)
+
+            start = self.meta['count']
+            self._grow(start + len(ids))
+            self.vectors[start:start + len(ids)] = vectors
+            self.ids[start:start + len(ids)] = np.asarray(ids, dtype=np.int64)
+            self.vectors.flush()
+            self.ids.flush()
+            self._row_lookup().update(zip((int(entity_id) for entity_id in ids), range(start, start + len(ids))))
+
+            self.meta['count'] = start + len(ids)
+            self._write_meta()
+            self._maybe_retrain()
+
+    def delete(self, ids: Sequence[int]) -> None:
+        """Remove vectors for the given entity IDs"""
+        with self._writing():
+            if self._delete_rows(ids):
+                self._write_meta()
+
+    def _delete_rows(self, ids: Sequence[int]) -> int:
+        lookup = self._row_lookup()
+        rows = [lookup.pop(int(entity_id)) for entity_id in ids if int(entity_id) in lookup]
+        if not rows:
+            return 0
+
+        self.ids[rows] = -1  # Tombstone
+        self.ids.flush()
+        self.meta['deleted'] += len(rows)
+        return len(rows)
+
+    def _maybe_retrain(self):
+        count = self.meta['count']
+        tail = count - self.meta['sorted_count']
+        if count >= settings.VECTOR_INDEX_MIN_TRAIN_SIZE and (
+            tail > 0.2 * max(self.meta['sorted_count'], 1) or
+            self.meta['deleted'] > 0.2 * count
+        ):
+            self._train()
+
+    def train(self) -> None:
+        """Cluster live vectors into cells and compact deleted rows"""
+        with self._writing():
+            self._train()
+
+    def _train(self):
+        count = self.meta['count']
+        live = np.flatnonzero(self.ids[:count] >= 0)
+        vectors = np.asarray(self.vectors[live])
+        ids = np.asarray(self.ids[live])
+
+        nlist = max(1, int(np.sqrt(len(live))))
+        centroids = _kmeans(vectors, nlist)
+        assignments = np.argmax(vectors @ centroids.T, axis=1) if len(live) else np.zeros(0, dtype=np.int64)
+
+        order = np.argsort(assignments, kind='stable')
+        offsets = np.searchsorted(assignments[order], np.arange(nlist + 1))
+
+        # Write the compacted, cell-ordered rows as the next generation and
+        # publish it through the metadata; open maps keep the old files alive
+        old_generation = self.meta['generation']
+        generation = old_generation + 1
+        capacity = max(len(live), 1024)
+        dim = self.meta['dim']
+        for name, dtype, data, shape in (
+            ("vectors.f32", np.float32, vectors[order], (capacity, dim)),
+            ("ids.i64", np.int64, ids[order], (capacity,))
+        ):
+            new_map = np.memmap(self._data_file(name, generation), dtype=dtype, mode='w+', shape=shape)
+            new_map[:len(live)] = data
+            new_map.flush()
+            del new_map
+
+        with open(self._data_file("centroids.npy", generation), "wb") as f:
+            np.save(f, centroids)
+
+        self.meta.update({
+            'generation': generation,
+            'count': len(live),
+            'capacity': capacity,
+            'sorted_count': len(live),
+            'list_offsets': offsets.tolist(),
+            'deleted': 0
+        })
+        self._write_meta()
+        self._rows_by_id = None  # rows were reordered
+        self._load()
+
+        for name in ("vectors.f32", "ids.i64", "centroids.npy"):
+            try:
+                os.remove(self._data_file(name, old_generation))
+            except FileNotFoundError:
+                pass
+
+        logger.info(f"Trained vector index {self.path}: {len(live)} vectors in {nlist} cells")
+
+    # Reads
+
+    def get(self, entity_id: int) -> Optional[np.ndarray]:
+        """Stored (normalised) vector for an entity, if indexed"""
+        with self._lock:
+            self._refresh()
+            row = self._row_lookup().get(int(entity_id))
+            return None if row is None else np.array(self.vectors[row])
+
+    def search(self, query, k: int = 10, nprobe: Optional[int] = None) -> List[Tuple[int, float]]:
+        """Top-k (entity_id, cosine similarity) pairs for a query vector"""
+        with self._lock:
+            self._refresh()
+            count = self.meta['count']
+            if not count:
+                return []
+
+            query = _normalize(np.asarray(query, dtype=np.float32).reshape(1, -1))[0]
+            rows = self._candidate_rows(query, nprobe or settings.VECTOR_INDEX_NPROBE)
+            rows = rows[self.ids[rows] >= 0]
+            if not len(rows):
+                return []
+
+            scores = np.asarray(self.vectors[rows]) @ query
+            top = np.argpartition(-scores, min(k, len(rows)) - 1)[:k]
+            top = top[np.argsort(-scores[top])]
+            return [(int(self.ids[rows[i]]), float(scores[i])) for i in top]
+
+    def _candidate_rows(self, query: np.ndarray, nprobe: int) -> np.ndarray:
+        count, sorted_count = self.meta['count'], self.meta['sorted_count']
+        tail = np.arange(sorted_count, count)
+        if self.centroids is None:
+            return np.arange(count)
+
+        offsets = self.meta['list_offsets']
+        cells = np.argsort(-(self.centroids @ query))[:nprobe]
+        ranges = [np.arange(offsets[c], offsets[c + 1]) for c in cells]
+        return np.concatenate(ranges + [tail])
+
+def _normalize(vectors: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors / np.where(norms > 0, norms, 1.0)
+
+def _kmeans(vectors: np.ndarray, k: int, iterations: int = 10, seed: int = 0) -> np.ndarray:
+    """Spherical k-means; good enough to partition cells for IVF search"""
+    if not len(vectors):
+        return np.zeros((1, vectors.shape[1]), dtype=np.float32)
+
+    rng = np.random.default_rng(seed)
+    sample = vectors[rng.choice(len(vectors), size=min(len(vectors), k * 256), replace=False)]
+    centroids = sample[rng.choice(len(sample), size=k, replace=False)]
+
+    for _ in range(iterations):
+        assignments = np.argmax(sample @ centroids.T, axis=1)
+        for cell in range(k):
+            members = sample[assignments == cell]
+            if len(members):
+                centroids[cell] = members.sum(axis=0)
+        centroids = _normalize(centroids)
+
+    return centroids.astype(np.float32)
+
+_indexes: Dict[str, VectorIndex] = {}
+_indexes_lock = threading.Lock()
+
+def get_vector_index(name: str) -> VectorIndex:
+    """Process-wide index by name, e.g. ``"documents"`` or ``"opportunities"``"""
+    with _indexes_lock:
+        if name not in _indexes:
+            _indexes[name] = VectorIndex(os.path.join(VECTOR_INDEX_DIR, name))
+        return _indexes[name]
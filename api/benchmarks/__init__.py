@@ -0,0 +1 @@
+"""Scoring and recommendation benchmarks over synthetic data"""
@@ -0,0 +1,106 @@
+"""Fixtures for the scoring and recommendation benchmarks.
+
+Run from ``api/``::
+
+    pip install -r requirements-bench.txt
+    pytest benchmarks
+
+``BENCH_SIZES`` (default ``1000,10000,100000``) picks the opportunity counts,
+``BENCH_DATABASE_URL`` points at a Postgres stand-in instead of the default
+SQLite files, and ``BENCH_DATA_DIR`` is where generated SQLite datasets are
+kept between runs.
+"""
+import asyncio
+import os
+import tempfile
+
+BENCH_DATA_DIR = os.path.abspath(os.getenv("BENCH_DATA_DIR", ".bench-data"))
+BENCH_DATABASE_URL = os.getenv("BENCH_DATABASE_URL")
+BENCH_SIZES = [int(size) for size in os.getenv("BENCH_SIZES", "1000,10000,100000").split(",")]
+BENCH_SEED = int(os.getenv("BENCH_SEED", "42"))
+
+# Settings are read at import time, so point the app at local stand-ins first.
+# Precomputed indexes go to an empty directory so the scoring path under test
+# does not depend on whatever model happens to be on disk.
+os.environ.setdefault("DATABASE_URL", "sqlite+aiosqlite:///:memory:")
+os.environ.setdefault("REDIS_URL", "redis://localhost:6379/15")
+os.environ["INDEX_DIR"] = tempfile.mkdtemp(prefix="bench-indexes-")
+
+import pytest
+from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
+from sqlalchemy.orm import sessionmaker
+import app.database
+from app.services.cache import HookedAsyncSession
+from app.database import Base
+from app.models import user, rule, contact, document, opportunity, application, task  # noqa: F401 (register mappers)
+from benchmarks.instrumentation import QueryCounter, MEASUREMENTS
+from benchmarks.synthetic import SyntheticConfig, generate
+
+app.database.engine.echo = False
+
+class BenchDatabase:
+    """A populated database for one dataset size"""
+
+    def __init__(self, loop: asyncio.AbstractEventLoop, engine, config: SyntheticConfig):
+        self.loop = loop
+        self.engine = engine
+        self.config = config
+        self.session_factory = sessionmaker(engine, class_=HookedAsyncSession, expire_on_commit=False)
+        self.queries = QueryCounter(engine.sync_engine)
+
+    def run(self, coroutine):
+        return self.loop.run_until_complete(coroutine)
+
+    def session(self) -> AsyncSession:
+        return self.session_factory()
+
+@pytest.fixture(scope="session")
+def bench_loop():
+    loop = asyncio.new_event_loop()
+    yield loop
+    loop.close()
+
+def _database_url(config: SyntheticConfig) -> str:
+    if BENCH_DATABASE_URL:
+        return BENCH_DATABASE_URL
+    os.makedirs(BENCH_DATA_DIR, exist_ok=True)
+    return f"sqlite+aiosqlite:///{BENCH_DATA_DIR}/synthetic-{config.opportunities}-{config.seed}.db"
+
+async def _prepare(engine, config: SyntheticConfig, session_factory):
+    """Create and populate the schema unless a matching dataset already exists"""
+    from sqlalchemy import select, func
+    from app.models.opportunity import Opportunity
+
+    async with engine.begin() as conn:
+        if BENCH_DATABASE_URL:
+            await conn.run_sync(Base.metadata.drop_all)
+        await conn.run_sync(Base.metadata.create_all)
+
+    async with session_factory() as db:
+        existing = (await db.execute(select(func.count(Opportunity.id)))).scalar()
+        if existing == config.opportunities:
+            return
+        if existing:
+            raise RuntimeError(f"Stale benchmark dataset at {engine.url}; delete it and rerun")
+        await generate(db, config)
+
+@pytest.fixture(scope="session", params=BENCH_SIZES, ids=lambda size: f"{size}opps")
+def bench_db(request, bench_loop) -> BenchDatabase:
+    config = SyntheticConfig(opportunities=request.param, seed=BENCH_SEED)
+    engine = create_async_engine(_database_url(config))
+    database = BenchDatabase(bench_loop, engine, config)
+    database.run(_prepare(engine, config, database.session_factory))
+    yield database
+    database.queries.close()
+    database.run(engine.dispose())
+
+def pytest_terminal_summary(terminalreporter):
+    if not MEASUREMENTS:
+        return
+
+    terminalreporter.section("instrumented runs (wall time, peak memory, queries)")
+    for row in MEASUREMENTS:
+        terminalreporter.write_line(
+            f"{row['name']:<60} {row['wall_seconds'] * 1000:>10.1f} ms "
+            f"{row['peak_memory_bytes'] / 1024 / 1024:>9.1f} MiB {row['queries']:>6} queries"
+        )
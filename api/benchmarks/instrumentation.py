@@ -0,0 +1,58 @@
+from typing import Dict, List
+from contextlib import contextmanager
+from dataclasses import dataclass, asdict
+import time
+import tracemalloc
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+class QueryCounter:
+    """Counts statements executed on an engine (sync or the sync side of async)"""
+
+    def __init__(self, engine: Engine):
+        self.engine = engine
+        self.count = 0
+        event.listen(engine, "before_cursor_execute", self._on_execute)
+
+    def _on_execute(self, conn, cursor, statement, parameters, context, executemany):
+        self.count += 1
+
+    def close(self):
+        event.remove(self.engine, "before_cursor_execute", self._on_execute)
+
+@dataclass
+class Measurement:
+    wall_seconds: float = 0.0
+    peak_memory_bytes: int = 0
+    queries: int = 0
+
+    def as_dict(self) -> Dict[str, float]:
+        return asdict(self)
+
+@contextmanager
+def measure(counter: QueryCounter):
+    """Record wall time, peak Python memory and query count for a block.
+
+    tracemalloc slows allocation-heavy code down, so timings taken here are
+    only comparable with each other; pytest-benchmark's own rounds run
+    without it.
+    """
+    result = Measurement()
+    start_queries = counter.count
+    tracemalloc.start()
+    start = time.perf_counter()
+    try:
+        yield result
+    finally:
+        result.wall_seconds = time.perf_counter() - start
+        result.peak_memory_bytes = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        result.queries = counter.count - start_queries
+
+# Instrumented runs collected for the end-of-session summary
+MEASUREMENTS: List[Dict] = []
+
+def record(benchmark, measurement: Measurement, **extra):
+    """Attach an instrumented run to the benchmark report and the summary table"""
+    benchmark.extra_info.update(measurement.as_dict(), **extra)
+    MEASUREMENTS.append({'name': benchmark.name, **measurement.as_dict()})
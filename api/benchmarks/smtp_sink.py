@@ -0,0 +1,48 @@
+"""Local SMTP stand-in for email throughput benchmarks.
+
+An aiosmtpd server on a background thread that accepts everything, counts
+messages and sessions, and can add per-message latency to mimic a remote
+relay.
+"""
+from contextlib import contextmanager
+import asyncio
+import socket
+import threading
+from aiosmtpd.controller import Controller
+
+class CountingHandler:
+    def __init__(self, latency: float = 0.0):
+        self.latency = latency
+        self.messages = 0
+        self.peers = set()
+        self._lock = threading.Lock()
+
+    async def handle_DATA(self, server, session, envelope):
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        with self._lock:
+            self.messages += 1
+            # One peer address per client connection
+            self.peers.add(session.peer)
+        return "250 Message accepted"
+
+    @property
+    def sessions(self) -> int:
+        return len(self.peers)
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+@contextmanager
+def smtp_sink(latency: float = 0.0):
+    """Run a sink for the duration of the block; yields (handler, port)"""
+    handler = CountingHandler(latency)
+    port = _free_port()
+    controller = Controller(handler, hostname="127.0.0.1", port=port)
+    controller.start()
+    try:
+        yield handler, port
+    finally:
+        controller.stop()
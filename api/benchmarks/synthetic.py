@@ -0,0 +1,161 @@
+from typing import Dict, List
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+import random
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import insert
+from app.models.application import Application
+from app.models.opportunity import (
+    Opportunity, Organization, OpportunitySkill, OpportunityType, WorkMode, normalize_skills
+)
+from app.models.user import User, Skill, UserSkill
+
+SKILL_NAMES = [
+    "python", "java", "javascript", "typescript", "go", "rust", "c++", "c#", "sql", "r",
+    "react", "vue", "angular", "node.js", "django", "flask", "fastapi", "spring", "rails", "graphql",
+    "docker", "kubernetes", "terraform", "aws", "gcp", "azure", "linux", "git", "ci/cd", "kafka",
+    "postgresql", "mysql", "mongodb", "redis", "elasticsearch", "spark", "hadoop", "airflow", "dbt", "tableau",
+    "machine learning", "deep learning", "pytorch", "tensorflow", "nlp", "computer vision", "statistics",
+    "data analysis", "excel", "figma", "product management", "agile", "communication", "leadership",
+    "matlab", "labview", "cad", "solidworks", "embedded systems", "verilog", "bioinformatics", "chemistry",
+    "research", "technical writing", "public speaking", "marketing", "finance", "accounting", "ux research"
+]
+
+TITLE_WORDS = [
+    "Software Engineer", "Data Scientist", "Research Assistant", "Product Intern", "Backend Developer",
+    "Frontend Developer", "ML Engineer", "Analyst", "Fellow", "Lab Technician", "DevOps Engineer"
+]
+
+FILLER_WORDS = [
+    "team", "build", "design", "scalable", "systems", "customers", "collaborate", "impact", "ship",
+    "features", "platform", "research", "analysis", "experience", "projects", "students", "growth",
+    "mentorship", "ownership", "quality", "testing", "production", "data", "models", "pipelines"
+]
+
+STATUSES = ["to_apply", "applied", "applied", "interview", "rejected", "offer", "accepted"]
+
+@dataclass(frozen=True)
+class SyntheticConfig:
+    """Sizes for a generated dataset; the same seed always yields the same rows"""
+    opportunities: int = 1000
+    users: int = 50
+    organizations: int = 0  # 0 = one per 20 opportunities
+    applications_per_user: int = 20
+    skills_per_user: int = 8
+    skills_per_opportunity: int = 6
+    seed: int = 42
+
+    @property
+    def organization_count(self) -> int:
+        return self.organizations or max(1, self.opportunities // 20)
+
+def _description(rng: random.Random, skills: List[str], words: int = 80) -> str:
+    tokens = [rng.choice(FILLER_WORDS) for _ in range(words)] + skills * 2
+    rng.shuffle(tokens)
+    return " ".join(tokens)
+
+async def generate(db: AsyncSession, config: SyntheticConfig, batch_size: int = 5000) -> Dict[str, int]:
+    """Populate an empty database with synthetic users, skills and opportunities.
+
+    Rows are written with bulk inserts, so ORM flush hooks (such as the
+    opportunity skill index sync) do not run and their rows are written here.
+    """
+    rng = random.Random(config.seed)
+    now = datetime.now(timezone.utc)
+
+    async def _insert(model, rows: List[Dict]):
+        for start in range(0, len(rows), batch_size):
+            await db.execute(insert(model), rows[start:start + batch_size])
+
+    await _insert(Skill, [
+        {'id': i + 1, 'name': name, 'category': 'technical'}
+        for i, name in enumerate(SKILL_NAMES)
+    ])
+
+    await _insert(Organization, [
+        {'id': i + 1, 'name': f"Organization {i + 1}", 'type': rng.choice(["startup", "corporation", "university", "lab"])}
+        for i in range(config.organization_count)
+    ])
+
+    kinds = list(OpportunityType)
+    modes = list(WorkMode)
+    opportunity_rows = []
+    opportunity_skill_rows = []
+    for i in range(config.opportunities):
+        opportunity_id = i + 1
+        # Skew skill popularity so some index postings are much longer than others
+        skills = list({
+            SKILL_NAMES[min(int(rng.paretovariate(1.2)) - 1, len(SKILL_NAMES) - 1)]
+            if rng.random() < 0.5 else rng.choice(SKILL_NAMES)
+            for _ in range(rng.randint(0, config.skills_per_opportunity))
+        })
+        deadline = now + timedelta(days=rng.randint(-10, 90)) if rng.random() < 0.7 else None
+        created_at = now - timedelta(days=rng.randint(0, 180), seconds=rng.randint(0, 86400))
+        opportunity_rows.append({
+            'id': opportunity_id,
+            'organization_id': rng.randint(1, config.organization_count),
+            'title': rng.choice(TITLE_WORDS),
+            'kind': rng.choice(kinds),
+            'mode': rng.choice(modes),
+            'deadline_at': deadline,
+            'jd_text': _description(rng, skills) if rng.random() < 0.9 else None,
+            'skills_required': skills,
+            'status': 'active' if rng.random() < 0.9 else 'expired',
+            'source': 'synthetic',
+            'created_at': created_at,
+            'updated_at': created_at
+        })
+        opportunity_skill_rows.extend(
+            {'opportunity_id': opportunity_id, 'skill': skill}
+            for skill in normalize_skills(skills)
+        )
+
+    await _insert(Opportunity, opportunity_rows)
+    await _insert(OpportunitySkill, opportunity_skill_rows)
+
+    user_rows = []
+    user_skill_rows = []
+    application_rows = []
+    for i in range(config.users):
+        user_id = i + 1
+        skill_ids = rng.sample(range(1, len(SKILL_NAMES) + 1), config.skills_per_user)
+        user_rows.append({
+            'id': user_id,
+            'email': f"user{user_id}@example.com",
+            'hashed_password': "x",
+            'full_name': f"User {user_id}",
+            'is_active': True,
+            'profile_data': {'experience': _description(rng, [SKILL_NAMES[s - 1] for s in skill_ids], words=40)}
+        })
+        user_skill_rows.extend(
+            {'user_id': user_id, 'skill_id': skill_id, 'weight': rng.randint(1, 5)}
+            for skill_id in skill_ids
+        )
+
+        applied = rng.sample(
+            range(1, config.opportunities + 1),
+            min(config.applications_per_user, config.opportunities)
+        )
+        application_rows.extend(
+            {
+                'user_id': user_id,
+                'opportunity_id': opportunity_id,
+                'status': rng.choice(STATUSES),
+                'created_at': now - timedelta(days=rng.randint(0, 365))
+            }
+            for opportunity_id in applied
+        )
+
+    await _insert(User, user_rows)
+    await _insert(UserSkill, user_skill_rows)
+    await _insert(Application, application_rows)
+    await db.commit()
+
+    return {
+        'skills': len(SKILL_NAMES),
+        'organizations': config.organization_count,
+        'opportunities': len(opportunity_rows),
+        'opportunity_skills': len(opportunity_skill_rows),
+        'users': len(user_rows),
+        'applications': len(application_rows)
+    }
@@ -0,0 +1,69 @@
+"""Email delivery throughput against a local SMTP sink.
+
+``BENCH_SMTP_MESSAGES`` (default 1000) sets the burst size and
+``BENCH_SMTP_LATENCY_MS`` (default 20) the sink's per-message latency.
+The connection-per-message baseline sends a tenth of the burst.
+"""
+import os
+import time
+import aiosmtplib
+import pytest
+from app.services.smtp_pool import SMTPPool, build_message
+from benchmarks.smtp_sink import smtp_sink
+
+BENCH_SMTP_MESSAGES = int(os.getenv("BENCH_SMTP_MESSAGES", "1000"))
+BENCH_SMTP_LATENCY = float(os.getenv("BENCH_SMTP_LATENCY_MS", "20")) / 1000
+
+def _messages(count: int):
+    return [
+        build_message(f"student{i}@example.com", f"Deadline Alert {i}", "Time to submit!", from_email="crm@example.com")
+        for i in range(count)
+    ]
+
+async def _send_pooled(port: int, messages, size: int):
+    pool = SMTPPool(hostname="127.0.0.1", port=port, username="", password="", size=size)
+    try:
+        errors = await pool.send_many(messages)
+    finally:
+        await pool.close()
+    assert not any(errors)
+
+async def _send_connection_per_message(port: int, messages):
+    """The previous behaviour: connect, send and quit for every message in turn"""
+    for message in messages:
+        client = aiosmtplib.SMTP(hostname="127.0.0.1", port=port)
+        await client.connect()
+        await client.send_message(message)
+        await client.quit()
+
+def _report(benchmark, handler, count: int, elapsed: float):
+    benchmark.extra_info.update(
+        messages=count,
+        sessions=handler.sessions,
+        messages_per_second=round(count / elapsed, 1)
+    )
+
+@pytest.mark.parametrize("size", [1, 8, 32])
+def test_pooled_burst(benchmark, bench_loop, size):
+    messages = _messages(BENCH_SMTP_MESSAGES)
+    with smtp_sink(BENCH_SMTP_LATENCY) as (handler, port):
+        def run():
+            start = time.perf_counter()
+            bench_loop.run_until_complete(_send_pooled(port, messages, size))
+            return time.perf_counter() - start
+
+        elapsed = benchmark.pedantic(run, rounds=1, iterations=1)
+        _report(benchmark, handler, len(messages), elapsed)
+        assert handler.messages == len(messages)
+
+def test_connection_per_message(benchmark, bench_loop):
+    messages = _messages(max(BENCH_SMTP_MESSAGES // 10, 1))
+    with smtp_sink(BENCH_SMTP_LATENCY) as (handler, port):
+        def run():
+            start = time.perf_counter()
+            bench_loop.run_until_complete(_send_connection_per_message(port, messages))
+            return time.perf_counter() - start
+
+        elapsed = benchmark.pedantic(run, rounds=1, iterations=1)
+        _report(benchmark, handler, len(messages), elapsed)
+        assert handler.sessions == len(messages)
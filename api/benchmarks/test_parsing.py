@@ -0,0 +1,155 @@
+"""Parse time and memory per HTML backend on job pages.
+
+Pages come from ``BENCH_PAGES_DIR``: saved job pages as ``.html`` files,
+named after their site (``linkedin-*.html``, ``indeed-*.html``,
+``glassdoor-*.html``; anything else uses the generic selectors). Without
+it, synthetic pages shaped like each site's markup are generated, with
+the navigation, inline scripts and footer that dominate real pages.
+
+``baseline`` is the previous behaviour: ``html.parser`` over the whole
+document and ``get_text()`` over all of it for generic pages.
+"""
+from typing import List, Tuple
+import glob
+import os
+import random
+import time
+import tracemalloc
+import pytest
+from bs4 import BeautifulSoup
+from app.services.html_parser import GENERIC_SPEC, SITE_SPECS, SiteSpec, available_backends, parse_html
+from benchmarks.instrumentation import Measurement, record
+
+BENCH_PAGES_DIR = os.getenv("BENCH_PAGES_DIR")
+BENCH_SYNTHETIC_PAGES = int(os.getenv("BENCH_SYNTHETIC_PAGES", "40"))
+
+_SPECS_BY_NAME = {spec.name: spec for spec in SITE_SPECS.values()}
+
+_JOB_MARKUP = {
+    'linkedin': """
+        <h1 class="top-card-layout__title">{title}</h1>
+        <a class="topcard__org-name-link" href="/company/{n}">{company}</a>
+        <span class="topcard__flavor topcard__flavor--bullet">{location}</span>
+        <div class="show-more-less-html__markup">{description}</div>""",
+    'indeed': """
+        <h1 class="jobsearch-JobInfoHeader-title"><span>{title}</span></h1>
+        <div data-testid="inlineHeader-companyName"><a href="/cmp/{n}">{company}</a></div>
+        <div data-testid="inlineHeader-companyLocation">{location}</div>
+        <div id="jobDescriptionText">{description}</div>""",
+    'glassdoor': """
+        <h1 id="jd-job-title-{n}" data-test="job-title">{title}</h1>
+        <div data-test="employer-name">{company}</div>
+        <div data-test="location">{location}</div>
+        <div class="JobDetails_jobDescription__x1 jobDescriptionContent">{description}</div>""",
+    'generic': """
+        <h1 class="job-title">{title}</h1>
+        <div class="company-name">{company}</div>
+        <div class="job-location">{location}</div>
+        <section class="job-description">{description}</section>""",
+}
+
+def _synthetic_page(site: str, n: int, rng: random.Random) -> bytes:
+    words = ["python", "react", "kubernetes", "team", "build", "customers", "data", "design", "ship", "scale"]
+    description = "".join(
+        f"<p>{' '.join(rng.choice(words) for _ in range(60))}</p><ul>{'<li>requirement</li>' * 8}</ul>"
+        for _ in range(12)
+    )
+    job = _JOB_MARKUP[site].format(
+        n=n, title=f"Software Engineer {n}", company=f"Company {n % 50}",
+        location="Berlin, Germany", description=description
+    )
+    navigation = "".join(f'<li class="nav-item"><a href="/jobs/{i}">Related job {i}</a></li>' for i in range(300))
+    script = "var state = " + ",".join(str(rng.random()) for _ in range(4000)) + ";"
+    footer = "".join(f'<div class="footer-col"><a href="/f/{i}">Link {i}</a></div>' for i in range(150))
+    return (
+        f"<!DOCTYPE html><html><head><title>Job {n}</title><style>.a{{color:red}}</style>"
+        f"<script>{script}</script></head><body><header><ul>{navigation}</ul></header>"
+        f"<main><article>{job}</article><aside><ul>{navigation}</ul></aside></main>"
+        f"<footer>{footer}</footer><script>{script}</script></body></html>"
+    ).encode()
+
+def _load_pages() -> List[Tuple[SiteSpec, bytes]]:
+    if BENCH_PAGES_DIR:
+        pages = []
+        for path in sorted(glob.glob(os.path.join(BENCH_PAGES_DIR, "*.html"))):
+            site = os.path.basename(path).split("-", 1)[0].lower()
+            with open(path, "rb") as f:
+                pages.append((_SPECS_BY_NAME.get(site, GENERIC_SPEC), f.read()))
+        if not pages:
+            raise RuntimeError(f"No .html pages in {BENCH_PAGES_DIR}")
+        return pages
+
+    rng = random.Random(42)
+    sites = list(_JOB_MARKUP)
+    return [
+        (_SPECS_BY_NAME.get(sites[n % len(sites)], GENERIC_SPEC), _synthetic_page(sites[n % len(sites)], n, rng))
+        for n in range(BENCH_SYNTHETIC_PAGES)
+    ]
+
+PAGES = _load_pages()
+
+def _extract(spec: SiteSpec, content: bytes, backend: str):
+    page = parse_html(content, spec, backend=backend)
+    fields = (
+        page.text(spec.title),
+        page.text(spec.company),
+        page.text(spec.location),
+        page.text(spec.description)
+    )
+    return page, fields
+
+def _extract_baseline(spec: SiteSpec, content: bytes):
+    soup = BeautifulSoup(content, 'html.parser')
+    description = soup.get_text(separator=' ', strip=True) if spec is GENERIC_SPEC else None
+    return soup, (description,)
+
+def _rss_bytes() -> int:
+    # Parse trees of the C-backed parsers are invisible to tracemalloc
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except OSError:
+        return 0
+
+def _measure(benchmark, parse, **extra):
+    """Time one pass over the pages, keeping every tree to see what they hold"""
+    trees = []
+    rss_before = _rss_bytes()
+    tracemalloc.start()
+    start = time.perf_counter()
+    for spec, content in PAGES:
+        trees.append(parse(spec, content)[0])
+    wall = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    rss_growth = _rss_bytes() - rss_before
+    record(
+        benchmark,
+        Measurement(wall_seconds=wall, peak_memory_bytes=peak),
+        pages=len(PAGES),
+        page_bytes=sum(len(content) for _, content in PAGES),
+        rss_growth_bytes=rss_growth,
+        **extra
+    )
+
+def _parse_all(parse):
+    for spec, content in PAGES:
+        parse(spec, content)
+
+@pytest.mark.parametrize("backend", ["selectolax", "lxml", "bs4"])
+def test_parse(benchmark, backend):
+    if backend not in available_backends():
+        pytest.skip(f"{backend} is not installed")
+
+    parse = lambda spec, content: _extract(spec, content, backend)
+    _measure(benchmark, parse, backend=backend)
+    benchmark(_parse_all, parse)
+
+    # Every backend must find the fields the site's selectors point at
+    for spec, content in PAGES[:len(_JOB_MARKUP)]:
+        title, company, location, description = parse(spec, content)[1]
+        assert title and company and description
+
+def test_parse_baseline(benchmark):
+    _measure(benchmark, _extract_baseline, backend="html.parser (full document)")
+    benchmark(_parse_all, _extract_baseline)
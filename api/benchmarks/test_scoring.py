@@ -0,0 +1,92 @@
+import itertools
+import pytest
+from sqlalchemy import select
+from sqlalchemy.orm import selectinload
+from app.models.opportunity import Opportunity
+from app.models.user import User
+from app.services.conversion_stats import ConversionStats
+from app.services.experience_model import ExperienceModel
+from app.services.scoring_service import ScoringService
+from benchmarks.instrumentation import measure, record
+
+async def _load_user_and_opportunities(bench_db):
+    async with bench_db.session() as db:
+        user = await db.get(User, 1)
+        service = ScoringService()
+        features = await service.load_user_features(db, user)
+        result = await db.execute(
+            select(Opportunity)
+            .options(selectinload(Opportunity.organization))
+            .where(Opportunity.status == 'active')
+        )
+        return features, list(result.scalars().all())
+
+async def _fit_experience_model(bench_db) -> ExperienceModel:
+    async with bench_db.session() as db:
+        return await ExperienceModel.fit(db)
+
+def test_calculate_fit_score(benchmark, bench_db):
+    """Single-opportunity scoring, as used when one application is rescored"""
+    features, opportunities = bench_db.run(_load_user_and_opportunities(bench_db))
+    service = ScoringService()
+    cycle = itertools.cycle(opportunities)
+
+    def score_one():
+        return bench_db.run(service.calculate_fit_score(
+            features.skills, features.experience, next(cycle), features.conversion
+        ))
+
+    with measure(bench_db.queries) as measurement:
+        for _ in range(100):
+            score_one()
+    record(benchmark, measurement, calls=100)
+
+    benchmark(score_one)
+
+@pytest.mark.parametrize("experience", ["pairwise", "corpus"])
+def test_score_opportunities(benchmark, bench_db, experience):
+    """Vectorised scoring of every active opportunity for one user"""
+    features, opportunities = bench_db.run(_load_user_and_opportunities(bench_db))
+    model = bench_db.run(_fit_experience_model(bench_db)) if experience == "corpus" else None
+    service = ScoringService(experience_model=model)
+
+    with measure(bench_db.queries) as measurement:
+        scores = service.score_opportunities(features, opportunities)
+    record(benchmark, measurement, opportunities=len(opportunities))
+    assert len(scores) == len(opportunities)
+
+    benchmark.pedantic(
+        service.score_opportunities, args=(features, opportunities),
+        rounds=5, warmup_rounds=1
+    )
+
+def test_generate_recommendations(benchmark, bench_db):
+    """Full recommendation pass for one user, including candidate loading"""
+    service = ScoringService()
+    user_ids = itertools.cycle(range(1, bench_db.config.users + 1))
+
+    async def _generate(user_id: int):
+        async with bench_db.session() as db:
+            return await service.generate_recommendations(user_id, db, limit=10)
+
+    with measure(bench_db.queries) as measurement:
+        recommendations = bench_db.run(_generate(next(user_ids)))
+    record(benchmark, measurement)
+    assert len(recommendations) <= 10
+
+    benchmark.pedantic(
+        lambda: bench_db.run(_generate(next(user_ids))),
+        rounds=5, warmup_rounds=1
+    )
+
+def test_conversion_stats(benchmark, bench_db):
+    """Grouped conversion-history query feeding the conversion component"""
+    async def _load():
+        async with bench_db.session() as db:
+            return await ConversionStats.load(db, 1)
+
+    with measure(bench_db.queries) as measurement:
+        bench_db.run(_load())
+    record(benchmark, measurement)
+
+    benchmark(lambda: bench_db.run(_load()))
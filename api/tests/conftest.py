@@ -0,0 +1,13 @@
+"""Settings are read at import time, so point the app at local stand-ins first.
+
+Indexes and models go to an empty directory, so scoring does not depend on
+whatever happens to be on disk.
+"""
+import os
+import tempfile
+
+os.environ.setdefault("DATABASE_URL", "sqlite+aiosqlite:///:memory:")
+os.environ.setdefault("REDIS_URL", "redis://localhost:6379/15")
+os.environ["INDEX_DIR"] = tempfile.mkdtemp(prefix="test-indexes-")
+
+from app.models import user, rule, contact, document, opportunity, application, task  # noqa: F401,E402 (register mappers)
@@ -0,0 +1,81 @@
+"""URL canonicalization and SimHash matching used to de-duplicate opportunities.
+
+Run from ``api/``::
+
+    pytest tests
+"""
+import random
+from urllib.parse import parse_qsl, urlsplit
+import pytest
+from app.models.opportunity import canonicalize_url, simhash_bands
+from app.services.opportunity_dedup import content_simhash, hamming_distance
+
+@pytest.mark.parametrize("url, expected", [
+    ("HTTP://www.Example.com:443/jobs/42/?b=2&a=1#apply", "https://example.com/jobs/42?a=1&b=2"),
+    ("https://example.com:8080/jobs/42", "https://example.com:8080/jobs/42"),
+    ("https://example.com/jobs/42?utm_source=x&UTM_Medium=y&gclid=z&fbclid=w", "https://example.com/jobs/42"),
+    ("https://www.linkedin.com/jobs/view/123/?trk=public&refId=abc&trackingId=q", "https://linkedin.com/jobs/view/123"),
+    ("https://uk.indeed.com/viewjob?jk=9f&from=serp&tk=1h&vjs=3", "https://uk.indeed.com/viewjob?jk=9f"),
+    ("https://example.com/", "https://example.com/"),
+    ("  ", None),
+    (None, None),
+])
+def test_canonicalize_url(url, expected):
+    assert canonicalize_url(url) == expected
+
+@pytest.mark.parametrize("url", [
+    "https://jobs.example.com/view?guid=abc123",
+    "https://example.com/partner/jobListing.htm?ao=1136043&jobListingId=1",
+    "https://example.com/careers?ref=ENG-42",
+    "https://example.com/careers?src=board&pos=7&from=home&cs=1&cb=2&tk=9",
+])
+def test_canonicalize_url_keeps_possible_posting_ids(url):
+    query = lambda value: sorted(parse_qsl(urlsplit(value).query))
+    assert query(canonicalize_url(url)) == query(url)
+
+def test_distinct_postings_keep_distinct_urls():
+    assert canonicalize_url("https://example.com/view?guid=1") != canonicalize_url("https://example.com/view?guid=2")
+
+def _posting(rng: random.Random, words: int = 300) -> str:
+    vocabulary = [f"word{i}" for i in range(2000)]
+    return " ".join(rng.choice(vocabulary) for _ in range(words))
+
+def test_simhash_ignores_case_punctuation_and_whitespace():
+    text = _posting(random.Random(1))
+    reformatted = "\n".join(f"  {word.upper()}," for word in text.split())
+    assert content_simhash("Engineer", "Acme", text) == content_simhash("ENGINEER", "acme", reformatted)
+
+def test_simhash_needs_enough_words():
+    assert content_simhash("Engineer", "Acme", "short text") is None
+
+def test_simhash_separates_unrelated_postings():
+    rng = random.Random(2)
+    a = content_simhash("Engineer", "Acme", _posting(rng))
+    b = content_simhash("Engineer", "Acme", _posting(rng))
+    assert hamming_distance(a, b) > 10
+
+def test_simhash_is_signed_64_bit():
+    rng = random.Random(3)
+    for _ in range(50):
+        value = content_simhash("Engineer", "Acme", _posting(rng))
+        assert -(1 << 63) <= value < (1 << 63)
+
+def test_hamming_distance_handles_signed_values():
+    assert hamming_distance(-1, 0) == 64
+    assert hamming_distance(-1, -2) == 1
+
+def test_bands_cover_every_bit():
+    value = 0x0123456789ABCDEF
+    assert simhash_bands(value) == [(0, 0xCDEF), (1, 0x89AB), (2, 0x4567), (3, 0x0123)]
+    assert simhash_bands(value - (1 << 64)) == simhash_bands(value)
+
+@pytest.mark.parametrize("distance", [0, 1, 2, 3])
+def test_hashes_within_three_bits_share_a_band(distance):
+    rng = random.Random(distance)
+    for _ in range(200):
+        value = rng.getrandbits(64)
+        flipped = value
+        for bit in rng.sample(range(64), distance):
+            flipped ^= 1 << bit
+        assert hamming_distance(value, flipped) == distance
+        assert set(simhash_bands(value)) & set(simhash_bands(flipped))
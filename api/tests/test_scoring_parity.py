@@ -0,0 +1,88 @@
+"""Batch scoring against the per-opportunity fit score it replaced.
+
+``_reference_fit_score`` is the scorer as it was before scoring was
+vectorized: Jaccard skill overlap, a TF-IDF model fitted on each
+(experience, description) pair, and deadline urgency. Users here have no
+application history, so the conversion component is the neutral 50 on
+both sides.
+"""
+from datetime import datetime, timedelta
+import random
+import numpy as np
+import pytest
+from sklearn.feature_extraction.text import TfidfVectorizer
+from sklearn.metrics.pairwise import cosine_similarity
+from app.models.opportunity import Opportunity, OpportunityType
+from app.services.conversion_stats import ConversionStats
+from app.services.scoring_service import PAIR_MAX_FEATURES, ScoringService, UserFeatures
+
+WORDS = [f"term{i}" for i in range(4000)] + ["the", "and", "with", "of", "python", "Python", "SQL"]
+SKILLS = ["Python", "python", "Go", "SQL", "React", "Docker", "AWS", "Kubernetes", "Rust", "Java"]
+
+def _reference_fit_score(user_skills, user_experience, opportunity) -> float:
+    required = opportunity.skills_required or []
+    if not required:
+        skill_score = 50.0
+    elif not user_skills:
+        skill_score = 0.0
+    else:
+        user_set = {skill.lower() for skill in user_skills}
+        required_set = {skill.lower() for skill in required}
+        skill_score = len(user_set & required_set) / len(user_set | required_set) * 100.0
+
+    job_description = opportunity.jd_text or ""
+    if not user_experience or not job_description:
+        experience_score = 50.0
+    else:
+        try:
+            vectorizer = TfidfVectorizer(stop_words='english', max_features=1000)
+            tfidf = vectorizer.fit_transform([user_experience.lower(), job_description.lower()])
+            experience_score = cosine_similarity(tfidf[0:1], tfidf[1:2])[0][0] * 100.0
+        except ValueError:
+            experience_score = 50.0
+
+    if not opportunity.deadline_at:
+        urgency_score = 50.0
+    else:
+        days = (opportunity.deadline_at - datetime.utcnow()).days
+        urgency_score = (
+            0.0 if days < 0 else 100.0 if days <= 2 else 80.0 if days <= 7 else 60.0 if days <= 30 else 40.0
+        )
+
+    score = skill_score * 0.35 + experience_score * 0.25 + urgency_score * 0.15 + 50.0 * 0.25
+    return min(100.0, max(0.0, score))
+
+def _text(rng: random.Random, words: int) -> str:
+    return " ".join(rng.choice(WORDS) for _ in range(words))
+
+def _opportunity(rng: random.Random) -> Opportunity:
+    length = rng.choice([0, 0, 3, 40, 300, 1500, 4000])
+    deadline = None
+    if rng.random() < 0.7:
+        # Half a day off the boundary, so .days agrees on both sides
+        deadline = datetime.utcnow() + timedelta(days=rng.randint(-5, 60), hours=12)
+    return Opportunity(
+        title="Engineer",
+        kind=rng.choice(list(OpportunityType)),
+        skills_required=rng.sample(SKILLS, rng.randint(0, 5)),
+        jd_text=rng.choice(["the and of with", ""]) if length == 3 else _text(rng, length),
+        deadline_at=deadline
+    )
+
+@pytest.mark.parametrize("seed", range(8))
+def test_score_opportunities_matches_per_opportunity_scores(seed):
+    rng = random.Random(seed)
+    user_skills = rng.sample(SKILLS, rng.randint(0, 4))
+    user_experience = rng.choice(["", "the and", _text(rng, 30), _text(rng, 400), _text(rng, 1500)])
+    opportunities = [_opportunity(rng) for _ in range(40)]
+
+    features = UserFeatures(skills=user_skills, experience=user_experience, conversion=ConversionStats())
+    scores = ScoringService().score_opportunities(features, opportunities)
+    expected = [_reference_fit_score(user_skills, user_experience, opp) for opp in opportunities]
+
+    np.testing.assert_allclose(scores, expected, rtol=0, atol=1e-6)
+
+def test_pairs_over_the_vocabulary_cap_are_covered():
+    rng = random.Random(0)
+    text = _text(rng, 4000)
+    assert len(set(text.split())) > PAIR_MAX_FEATURES
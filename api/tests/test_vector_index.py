@@ -0,0 +1,72 @@
+"""Writes and reads on one ``VectorIndex`` instance in the same process.
+
+Run from ``api/``::
+
+    pytest tests
+"""
+import numpy as np
+from app.services.vector_index import VectorIndex
+
+def _vector(seed: int) -> np.ndarray:
+    return np.random.default_rng(seed).random(8, dtype=np.float32)
+
+def test_add_then_get(tmp_path):
+    index = VectorIndex(str(tmp_path))
+    index.add([1, 2], [_vector(1), _vector(2)])
+
+    assert index.get(1) is not None
+    assert index.get(2) is not None
+    assert VectorIndex(str(tmp_path)).get(2) is not None
+
+def test_add_then_delete(tmp_path):
+    index = VectorIndex(str(tmp_path))
+    index.add([1], [_vector(1)])
+    index.delete([1])
+
+    assert index.get(1) is None
+    assert index.search(_vector(1)) == []
+    assert VectorIndex(str(tmp_path)).get(1) is None
+
+def test_add_twice_replaces(tmp_path):
+    index = VectorIndex(str(tmp_path))
+    index.add([1], [_vector(1)])
+    index.add([1], [_vector(2)])
+
+    assert [entity_id for entity_id, _ in index.search(_vector(2))] == [1]
+    expected = _vector(2) / np.linalg.norm(_vector(2))
+    assert np.allclose(index.get(1), expected)
+
+def test_writes_reuse_the_row_lookup(tmp_path, monkeypatch):
+    index = VectorIndex(str(tmp_path))
+    index.add([1], [_vector(1)])
+
+    scans = []
+    scan_rows = VectorIndex._scan_rows
+    monkeypatch.setattr(VectorIndex, "_scan_rows", lambda self: scans.append(1) or scan_rows(self))
+    index.add([2], [_vector(2)])
+    index.delete([1])
+    index.add([2], [_vector(3)])
+
+    assert scans == []
+    assert index.get(1) is None
+    assert index.get(2) is not None
+
+def test_writes_from_another_instance_are_picked_up(tmp_path):
+    index = VectorIndex(str(tmp_path))
+    index.add([1], [_vector(1)])
+    VectorIndex(str(tmp_path)).add([2], [_vector(2)])
+    index.delete([2])
+
+    assert index.get(1) is not None
+    assert index.get(2) is None
+    assert VectorIndex(str(tmp_path)).get(2) is None
+
+def test_train_rebuilds_the_row_lookup(tmp_path):
+    index = VectorIndex(str(tmp_path))
+    index.add(list(range(50)), [_vector(seed) for seed in range(50)])
+    index.delete([0, 1])
+    index.train()
+
+    assert index.get(0) is None
+    expected = _vector(7) / np.linalg.norm(_vector(7))
+    assert np.allclose(index.get(7), expected)
@@ -0,0 +1,146 @@
+"""Concurrent page fetching for the scrapers.
+
+All requests go through the runtime's shared ``httpx.AsyncClient``, so
+connections to a job board are kept alive and reused across pages (and
+multiplexed when HTTP/2 is enabled). A global semaphore bounds the number of
+requests in flight and a per-host one keeps a bulk import from hammering a
+single site. Timeouts, connection errors, 429 and 5xx responses are retried
+with exponential backoff, honouring ``Retry-After``.
+
+With the HTTP cache enabled, ``get`` sends conditional requests and flags
+pages that have not changed since they were last saved.
+"""
+from typing import AsyncIterator, Dict, Iterable, Optional
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from urllib.parse import urlsplit
+import asyncio
+import random
+import sqlite3
+import httpx
+from app.config import settings
+from app.http_cache import HTTPCache, content_digest, get_http_cache
+from app.runtime import get_http_client
+import logging
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
+}
+
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+@dataclass
+class CrawlResult:
+    url: str
+    response: Optional[httpx.Response] = None
+    error: Optional[str] = None
+    digest: Optional[str] = None
+    # Not modified since the cached copy, which was already saved
+    unchanged: bool = False
+
+def _retry_after(response: httpx.Response) -> Optional[float]:
+    value = response.headers.get('Retry-After')
+    if not value:
+        return None
+    if value.isdigit():
+        return float(value)
+    try:
+        return (parsedate_to_datetime(value) - datetime.now(timezone.utc)).total_seconds()
+    except (TypeError, ValueError):
+        return None
+
+class Crawler:
+    def __init__(
+        self,
+        client: Optional[httpx.AsyncClient] = None,
+        cache: Optional[HTTPCache] = None,
+        concurrency: Optional[int] = None,
+        per_host: Optional[int] = None,
+        retries: Optional[int] = None,
+        backoff: Optional[float] = None
+    ):
+        self.client = client or get_http_client()
+        self.cache = cache or get_http_cache()
+        self.per_host = per_host or settings.SCRAPE_PER_HOST_CONCURRENCY
+        self.retries = settings.SCRAPE_MAX_RETRIES if retries is None else retries
+        self.backoff = settings.SCRAPE_RETRY_BACKOFF_SECONDS if backoff is None else backoff
+        self.timeout = httpx.Timeout(settings.SCRAPE_TIMEOUT_SECONDS, connect=min(settings.SCRAPE_TIMEOUT_SECONDS, 10))
+        self._semaphore = asyncio.Semaphore(concurrency or settings.SCRAPE_CONCURRENCY)
+        self._hosts: Dict[str, asyncio.Semaphore] = {}
+
+    def _host_semaphore(self, url: str) -> asyncio.Semaphore:
+        host = urlsplit(url).netloc.lower()
+        if host not in self._hosts:
+            self._hosts[host] = asyncio.Semaphore(self.per_host)
+        return self._hosts[host]
+
+    async def fetch(self, url: str, headers: Optional[Dict[str, str]] = None) -> httpx.Response:
+        """GET ``url`` with retries; raises for the final failure or a 4xx"""
+        headers = {**DEFAULT_HEADERS, **(headers or {})}
+        host = self._host_semaphore(url)
+        for attempt in range(self.retries + 1):
+            wait = None
+            # Host slot first, so requests queued for a busy host hold no global slot
+            async with host, self._semaphore:
+                try:
+                    response = await self.client.get(url, headers=headers, timeout=self.timeout)
+                except (httpx.TimeoutException, httpx.TransportError) as e:
+                    if attempt == self.retries:
+                        raise
+                    error = f"{type(e).__name__}: {e}"
+                else:
+                    if response.status_code not in RETRY_STATUSES or attempt == self.retries:
+                        # 304 answers a conditional request; httpx counts it as an error
+                        if response.status_code != 304:
+                            response.raise_for_status()
+                        return response
+                    error = f"HTTP {response.status_code}"
+                    wait = _retry_after(response)
+
+            # Back off outside the semaphores so other requests can proceed
+            if wait is None:
+                wait = self.backoff * 2 ** attempt * (1 + random.random())
+            wait = min(max(wait, 0), settings.SCRAPE_MAX_RETRY_WAIT_SECONDS)
+            logger.warning(f"Fetching {url} failed ({error}), retrying in {wait:.1f}s")
+            await asyncio.sleep(wait)
+
+    async def get(self, url: str) -> CrawlResult:
+        """Fetch ``url``, conditionally when it is cached; never raises"""
+        try:
+            entry = await self.cache.lookup(url) if self.cache else None
+            response = await self.fetch(url, entry.conditional_headers() if entry else None)
+            if entry and response.status_code == 304:
+                await self.cache.touch(url, response.headers)
+                return CrawlResult(url, response=response, digest=entry.digest, unchanged=True)
+
+            digest = content_digest(response.content)
+            if entry and entry.digest == digest:
+                # Servers without validators still resend identical pages
+                await self.cache.touch(url, response.headers)
+                return CrawlResult(url, response=response, digest=digest, unchanged=True)
+            return CrawlResult(url, response=response, digest=digest)
+        except Exception as e:
+            return CrawlResult(url, error=str(e) or type(e).__name__)
+
+    async def remember(self, result: CrawlResult):
+        """Cache a page once it is saved, so unchanged re-fetches can be skipped"""
+        if not self.cache or result.response is None or result.unchanged:
+            return
+        try:
+            await self.cache.store(result.url, result.response.content, result.response.headers, result.digest)
+        except (OSError, sqlite3.Error) as e:
+            logger.warning(f"Could not cache {result.url}: {str(e)}")
+
+    async def crawl(self, urls: Iterable[str]) -> AsyncIterator[CrawlResult]:
+        """Fetch ``urls`` concurrently, yielding each result as soon as it arrives"""
+        tasks = [asyncio.create_task(self.get(url)) for url in dict.fromkeys(urls)]
+        try:
+            for completed in asyncio.as_completed(tasks):
+                yield await completed
+        finally:
+            # The consumer stopped early or was cancelled
+            for task in tasks:
+                task.cancel()
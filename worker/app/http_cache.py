@@ -0,0 +1,229 @@
+"""On-disk cache of scraped pages for conditional re-fetching.
+
+Bodies are stored once per content hash under ``objects/``; a SQLite index
+maps each URL to its body and the ETag/Last-Modified validators the server
+sent. The crawler turns those into ``If-None-Match``/``If-Modified-Since``
+headers, and a 304, or a 200 whose body hashes the same, means the page is
+unchanged and the scraper skips parsing and saving it. The cache is shared
+by the worker processes on a host and bounded in size: least recently used
+URLs are evicted first.
+
+A cache directory doubles as a set of fixtures. ``HTTPCache.transport()``
+replays the stored pages, validators included, without touching the
+network; setting ``SCRAPE_FIXTURE_DIR`` makes the scrapers use it, for
+tests and benchmarks.
+"""
+from typing import Dict, Iterable, List, Mapping, Optional
+from dataclasses import dataclass
+import asyncio
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+import httpx
+from app.config import settings
+import logging
+
+logger = logging.getLogger(__name__)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+    url TEXT PRIMARY KEY,
+    digest TEXT NOT NULL,
+    etag TEXT,
+    last_modified TEXT,
+    content_type TEXT,
+    accessed_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS ix_entries_accessed ON entries (accessed_at);
+CREATE INDEX IF NOT EXISTS ix_entries_digest ON entries (digest);
+CREATE TABLE IF NOT EXISTS objects (
+    digest TEXT PRIMARY KEY,
+    size INTEGER NOT NULL
+);
+"""
+
+@dataclass
+class CacheEntry:
+    url: str
+    digest: str
+    etag: Optional[str] = None
+    last_modified: Optional[str] = None
+    content_type: Optional[str] = None
+
+    def conditional_headers(self) -> Dict[str, str]:
+        headers = {}
+        if self.etag:
+            headers['If-None-Match'] = self.etag
+        if self.last_modified:
+            headers['If-Modified-Since'] = self.last_modified
+        return headers
+
+def content_digest(content: bytes) -> str:
+    return hashlib.sha256(content).hexdigest()
+
+class HTTPCache:
+    def __init__(self, directory: str, max_bytes: Optional[int] = None):
+        self.directory = directory
+        self.max_bytes = max_bytes or settings.SCRAPE_CACHE_MAX_BYTES
+        os.makedirs(os.path.join(directory, "objects"), exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(
+            os.path.join(directory, "index.sqlite3"),
+            timeout=30,
+            isolation_level=None,
+            check_same_thread=False
+        )
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(_SCHEMA)
+
+    def _object_path(self, digest: str) -> str:
+        return os.path.join(self.directory, "objects", digest[:2], digest)
+
+    # Blocking index and file operations; the async wrappers below run them
+    # off the event loop
+
+    def lookup_sync(self, url: str) -> Optional[CacheEntry]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT url, digest, etag, last_modified, content_type FROM entries WHERE url = ?", (url,)
+            ).fetchone()
+        return CacheEntry(*row) if row else None
+
+    def read_sync(self, entry: CacheEntry) -> Optional[bytes]:
+        try:
+            with open(self._object_path(entry.digest), 'rb') as f:
+                return f.read()
+        except FileNotFoundError:
+            # Evicted by another process since the lookup
+            return None
+
+    def store_sync(self, url: str, content: bytes, headers: Mapping[str, str], digest: Optional[str] = None):
+        digest = digest or content_digest(content)
+        path = self._object_path(digest)
+        if not os.path.exists(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            # Written under a temporary name so readers never see a partial body
+            temp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(temp_path, 'wb') as f:
+                f.write(content)
+            os.replace(temp_path, path)
+
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                previous = self._conn.execute("SELECT digest FROM entries WHERE url = ?", (url,)).fetchone()
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO entries (url, digest, etag, last_modified, content_type, accessed_at) "
+                    "VALUES (?, ?, ?, ?, ?, ?)",
+                    (url, digest, headers.get('etag'), headers.get('last-modified'), headers.get('content-type'), time.time())
+                )
+                self._conn.execute("INSERT OR IGNORE INTO objects (digest, size) VALUES (?, ?)", (digest, len(content)))
+                orphans = []
+                if previous and previous[0] != digest:
+                    orphans = self._release_objects([previous[0]])
+                orphans += self._evict()
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+        self._remove_files(orphans)
+
+    def touch_sync(self, url: str, headers: Optional[Mapping[str, str]] = None):
+        """Mark ``url`` as used, taking any refreshed validators"""
+        headers = headers or {}
+        with self._lock:
+            self._conn.execute(
+                "UPDATE entries SET accessed_at = ?, etag = COALESCE(?, etag), "
+                "last_modified = COALESCE(?, last_modified) WHERE url = ?",
+                (time.time(), headers.get('etag'), headers.get('last-modified'), url)
+            )
+
+    def _release_objects(self, digests: Iterable[str]) -> List[str]:
+        """Drop objects no entry refers to any more; returns their digests"""
+        orphans = []
+        for digest in digests:
+            referenced = self._conn.execute("SELECT 1 FROM entries WHERE digest = ? LIMIT 1", (digest,)).fetchone()
+            if not referenced:
+                self._conn.execute("DELETE FROM objects WHERE digest = ?", (digest,))
+                orphans.append(digest)
+        return orphans
+
+    def _evict(self) -> List[str]:
+        total = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM objects").fetchone()[0]
+        if total <= self.max_bytes:
+            return []
+
+        # Evict down to 90% so every store near the limit does not evict again
+        target = self.max_bytes * 0.9
+        orphans = []
+        while total > target:
+            rows = self._conn.execute(
+                "SELECT entries.url, entries.digest, objects.size FROM entries "
+                "JOIN objects ON objects.digest = entries.digest ORDER BY entries.accessed_at LIMIT 64"
+            ).fetchall()
+            if not rows:
+                break
+            for url, digest, size in rows:
+                self._conn.execute("DELETE FROM entries WHERE url = ?", (url,))
+                if self._release_objects([digest]):
+                    orphans.append(digest)
+                    total -= size
+                    if total <= target:
+                        break
+        logger.info(f"Evicted {len(orphans)} cached page bodies from {self.directory}")
+        return orphans
+
+    def _remove_files(self, digests: Iterable[str]):
+        for digest in digests:
+            try:
+                os.remove(self._object_path(digest))
+            except FileNotFoundError:
+                pass
+
+    async def lookup(self, url: str) -> Optional[CacheEntry]:
+        return await asyncio.to_thread(self.lookup_sync, url)
+
+    async def read(self, entry: CacheEntry) -> Optional[bytes]:
+        return await asyncio.to_thread(self.read_sync, entry)
+
+    async def store(self, url: str, content: bytes, headers: Mapping[str, str], digest: Optional[str] = None):
+        await asyncio.to_thread(self.store_sync, url, content, headers, digest)
+
+    async def touch(self, url: str, headers: Optional[Mapping[str, str]] = None):
+        await asyncio.to_thread(self.touch_sync, url, headers)
+
+    def transport(self) -> httpx.MockTransport:
+        """Serve the cached pages as fixtures; unknown URLs get a 404"""
+        async def handle(request: httpx.Request) -> httpx.Response:
+            entry = await self.lookup(str(request.url))
+            content = await self.read(entry) if entry else None
+            if content is None:
+                return httpx.Response(404, request=request)
+
+            headers = {'content-type': entry.content_type or 'text/html'}
+            if entry.etag:
+                headers['etag'] = entry.etag
+            if entry.last_modified:
+                headers['last-modified'] = entry.last_modified
+            if entry.etag and request.headers.get('if-none-match') == entry.etag:
+                return httpx.Response(304, headers=headers, request=request)
+            return httpx.Response(200, headers=headers, content=content, request=request)
+
+        return httpx.MockTransport(handle)
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+_caches: Dict[str, HTTPCache] = {}
+
+def get_http_cache(directory: Optional[str] = None) -> Optional[HTTPCache]:
+    """Shared cache for ``directory`` (default ``SCRAPE_CACHE_DIR``); None when disabled"""
+    directory = directory or settings.SCRAPE_CACHE_DIR
+    if not directory:
+        return None
+    if directory not in _caches:
+        _caches[directory] = HTTPCache(directory)
+    return _caches[directory]
@@ -0,0 +1,126 @@
+"""Rule dispatcher: fires rules as changes and due times arrive.
+
+Consumes the rule event stream (application status changes, application
+events, rule edits) and the due-time queue, sleeping until whichever comes
+first. Run it next to the Celery workers::
+
+    python -m app.rule_dispatcher
+
+Several dispatchers can run at once: stream entries are shared through a
+consumer group and due pairs are claimed atomically.
+"""
+from typing import List, Optional, Tuple
+import asyncio
+import logging
+import os
+import signal
+import socket
+from datetime import datetime, timezone
+import redis
+from app.config import settings
+from app.services.cache import get_redis
+from app.runtime import runtime, get_async_session
+from app.services.rules_engine import RulesEngine
+from app.services.rule_scheduler import RuleScheduler, EVENT_STREAM, CONSUMER_GROUP
+
+logger = logging.getLogger(__name__)
+
+class RuleDispatcher:
+    def __init__(self, consumer: Optional[str] = None):
+        self.consumer = consumer or f"{socket.gethostname()}-{os.getpid()}"
+        self.stopping = asyncio.Event()
+
+    async def run(self):
+        self.client = get_redis()
+        self.scheduler = RuleScheduler(self.client)
+        await self._ensure_group()
+
+        # Entries delivered to this consumer before a restart come first
+        pending = await self.client.xreadgroup(CONSUMER_GROUP, self.consumer, {EVENT_STREAM: '0'}, count=500)
+        await self._handle_entries(pending)
+
+        logger.info(f"Rule dispatcher {self.consumer} started")
+        while not self.stopping.is_set():
+            try:
+                await self.step()
+            except Exception as e:
+                logger.error(f"Rule dispatcher error: {str(e)}")
+                await asyncio.sleep(1)
+        logger.info(f"Rule dispatcher {self.consumer} stopped")
+
+    async def step(self):
+        """Wait for events or the next due time, then handle both"""
+        wait_ms = await self._wait_ms()
+        entries = await self.client.xreadgroup(
+            CONSUMER_GROUP, self.consumer, {EVENT_STREAM: '>'},
+            count=500,
+            # BLOCK 0 would wait forever; omit it when something is already due
+            block=wait_ms or None
+        )
+        await self._handle_entries(entries)
+
+        due = await self.scheduler.claim_due()
+        if due:
+            async with get_async_session() as db:
+                results = await RulesEngine(db).process_due(due)
+            fired = sum(1 for result in results if result.get('triggered'))
+            logger.info(f"Processed {len(due)} due rule checks, {fired} rules fired")
+
+    async def _wait_ms(self) -> int:
+        wait = settings.RULE_DISPATCH_MAX_WAIT_SECONDS
+        next_due = await self.scheduler.next_due()
+        if next_due is not None:
+            wait = min(wait, next_due - datetime.now(timezone.utc).timestamp())
+        return max(int(wait * 1000), 0)
+
+    async def _handle_entries(self, streams: List[Tuple[str, List]]):
+        entry_ids = []
+        application_ids = set()
+        rule_ids = set()
+        for _, entries in streams or []:
+            for entry_id, fields in entries:
+                entry_ids.append(entry_id)
+                if 'application_id' in fields:
+                    application_ids.add(int(fields['application_id']))
+                if 'rule_id' in fields:
+                    rule_ids.add(int(fields['rule_id']))
+
+        if not entry_ids:
+            return
+
+        # Unacknowledged entries are retried on restart; the reconcile run
+        # covers anything that keeps failing
+        async with get_async_session() as db:
+            engine = RulesEngine(db)
+            queued = 0
+            if application_ids:
+                queued += await engine.process_application_changes(sorted(application_ids))
+            if rule_ids:
+                queued += await engine.process_rule_changes(sorted(rule_ids))
+
+        await self.client.xack(EVENT_STREAM, CONSUMER_GROUP, *entry_ids)
+        logger.debug(f"Handled {len(entry_ids)} rule events, queued {queued} due checks")
+
+    async def _ensure_group(self):
+        try:
+            await self.client.xgroup_create(EVENT_STREAM, CONSUMER_GROUP, id='0', mkstream=True)
+        except redis.ResponseError as e:
+            if 'BUSYGROUP' not in str(e):
+                raise
+
+async def main():
+    dispatcher = RuleDispatcher()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, dispatcher.stopping.set)
+
+    # The dispatcher owns its loop, so it hosts the runtime's clients itself
+    await runtime.open()
+    try:
+        await dispatcher.run()
+    finally:
+        await runtime.close()
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(main())
@@ -0,0 +1,163 @@
+"""Async runtime shared by every task in a worker process.
+
+Celery tasks are synchronous, so each used to wrap its coroutine in
+``asyncio.run``: a new event loop per task, and with it a new database
+engine, HTTP client and connection pools. Instead, every worker process
+starts one event loop on a background thread when it boots and keeps the
+engine, HTTP client and search client open on it; ``run_async`` submits a
+task's coroutine to that loop and waits for the result.
+
+The rule dispatcher, which runs its own loop, calls ``runtime.open()`` and
+``runtime.close()`` on it directly.
+"""
+from typing import Any, Coroutine, Optional, TypeVar
+import asyncio
+import os
+import threading
+import httpx
+from celery.signals import worker_process_init, worker_process_shutdown, worker_shutdown
+from meilisearch import Client
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, async_sessionmaker, create_async_engine
+from app.config import settings
+from app.services.cache import HookedAsyncSession
+import logging
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+class WorkerRuntime:
+    def __init__(self):
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+        self.engine: Optional[AsyncEngine] = None
+        self.session_factory: Optional[async_sessionmaker] = None
+        self.http: Optional[httpx.AsyncClient] = None
+        self.search: Optional[Client] = None
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+
+    async def open(self):
+        """Create the long-lived clients on the running loop"""
+        self.loop = asyncio.get_running_loop()
+        database_url = settings.DATABASE_URL.replace("postgresql://", "postgresql+asyncpg://")
+        pool_options = {}
+        if database_url.startswith("postgresql"):
+            # SQLite (local runs) uses a pool without these knobs
+            pool_options = {
+                'pool_size': settings.WORKER_DB_POOL_SIZE,
+                'max_overflow': settings.WORKER_DB_MAX_OVERFLOW
+            }
+        self.engine = create_async_engine(database_url, pool_pre_ping=True, **pool_options)
+        self.session_factory = async_sessionmaker(self.engine, class_=HookedAsyncSession, expire_on_commit=False)
+        transport = None
+        if settings.SCRAPE_FIXTURE_DIR:
+            from app.http_cache import HTTPCache
+            transport = HTTPCache(settings.SCRAPE_FIXTURE_DIR).transport()
+            logger.info(f"Serving HTTP requests from fixtures in {settings.SCRAPE_FIXTURE_DIR}")
+        self.http = httpx.AsyncClient(
+            transport=transport,
+            timeout=30.0,
+            follow_redirects=True,
+            http2=settings.WORKER_HTTP2,
+            limits=httpx.Limits(
+                max_connections=settings.WORKER_HTTP_MAX_CONNECTIONS,
+                max_keepalive_connections=settings.WORKER_HTTP_KEEPALIVE_CONNECTIONS
+            )
+        )
+        self.search = Client(
+            os.getenv("MEILISEARCH_URL", "http://localhost:7700"),
+            os.getenv("MEILI_MASTER_KEY", "")
+        )
+
+    async def close(self):
+        """Close the clients and any per-loop SMTP and Redis connections"""
+        from app.services.cache import get_redis
+        from app.services.smtp_pool import get_smtp_pool
+
+        await get_smtp_pool().close()
+        await get_redis().aclose()
+        if self.http is not None:
+            await self.http.aclose()
+        if self.engine is not None:
+            await self.engine.dispose()
+        self.engine = self.session_factory = self.http = self.search = None
+        self.loop = None
+
+    def start(self):
+        """Start the loop thread and open the clients; idempotent"""
+        with self._lock:
+            if self._thread is not None:
+                return
+            loop = asyncio.new_event_loop()
+            self._thread = threading.Thread(target=loop.run_forever, name="worker-async-runtime", daemon=True)
+            self._thread.start()
+            asyncio.run_coroutine_threadsafe(self.open(), loop).result()
+            logger.info(f"Async runtime started in worker process {os.getpid()}")
+
+    def stop(self):
+        with self._lock:
+            if self._thread is None:
+                return
+            loop = self.loop
+            try:
+                asyncio.run_coroutine_threadsafe(self.close(), loop).result(timeout=30)
+            except Exception as e:
+                logger.error(f"Error closing async runtime: {str(e)}")
+            loop.call_soon_threadsafe(loop.stop)
+            self._thread.join(timeout=10)
+            loop.close()
+            self._thread = None
+            logger.info(f"Async runtime stopped in worker process {os.getpid()}")
+
+    def run(self, coroutine: Coroutine[Any, Any, T]) -> T:
+        """Run a coroutine on the runtime loop from synchronous task code"""
+        if self._thread is None:
+            # Solo/threads pools and eager tasks never see worker_process_init
+            self.start()
+        if threading.current_thread() is self._thread:
+            raise RuntimeError("run_async called from the runtime loop; await the coroutine instead")
+
+        future = asyncio.run_coroutine_threadsafe(coroutine, self.loop)
+        try:
+            return future.result()
+        except BaseException:
+            # e.g. SoftTimeLimitExceeded raised in this thread: stop the coroutine too
+            future.cancel()
+            raise
+
+runtime = WorkerRuntime()
+
+def run_async(coroutine: Coroutine[Any, Any, T]) -> T:
+    return runtime.run(coroutine)
+
+def get_async_session() -> AsyncSession:
+    """New session on the runtime's engine; use as ``async with get_async_session() as db``"""
+    if runtime.session_factory is None:
+        raise RuntimeError("Worker async runtime is not running")
+    return runtime.session_factory()
+
+def _opened() -> WorkerRuntime:
+    # Sync tasks on solo/threads pools or run eagerly may need a client
+    # before anything has gone through run_async
+    if runtime.loop is None:
+        runtime.start()
+    return runtime
+
+def get_http_client() -> httpx.AsyncClient:
+    return _opened().http
+
+def get_search_client() -> Client:
+    return _opened().search
+
+# Each prefork child gets its own loop and pools; nothing is opened before the fork
+@worker_process_init.connect
+def _start_runtime(**kwargs):
+    runtime.start()
+
+@worker_process_shutdown.connect
+def _stop_runtime_process(**kwargs):
+    runtime.stop()
+
+@worker_shutdown.connect
+def _stop_runtime(**kwargs):
+    runtime.stop()
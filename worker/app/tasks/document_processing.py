@@ -4,10 +4,11 @@ from PIL import Image
 import PyPDF2
 from docx import Document
 import os
-import asyncio
-from app.services.database import get_async_session
+from typing import List
+from app.runtime import run_async, get_async_session
 from app.models.document import Document as DocModel
 from app.services.embedding_service import EmbeddingService
+from app.services.vector_index import get_vector_index
 import logging
 
 logger = logging.getLogger(__name__)
@@ -15,7 +16,7 @@ logger = logging.getLogger(__name__)
 @shared_task
 def process_document(document_id: int):
     """Process uploaded document: extract text, generate embeddings"""
-    return asyncio.run(_process_document_async(document_id))
+    return run_async(_process_document_async(document_id))
 
 async def _process_document_async(document_id: int):
     try:
@@ -58,6 +59,13 @@ async def _process_document_async(document_id: int):
             
             await db.commit()
             
+            # Replace this version's vector in the ANN index
+            vector_index = get_vector_index("documents")
+            if len(embeddings) > 0:
+                vector_index.add([document_id], [embeddings])
+            else:
+                vector_index.delete([document_id])
+            
             logger.info(f"Successfully processed document {document_id}")
             
             return {
@@ -1,7 +1,7 @@
 from celery import shared_task
-import asyncio
-from app.services.email_service import EmailService
-from app.services.database import get_async_session
+from typing import List
+from app.services.smtp_pool import get_smtp_pool, build_message
+from app.runtime import run_async, get_async_session
 import logging
 
 logger = logging.getLogger(__name__)
@@ -9,12 +9,11 @@ logger = logging.getLogger(__name__)
 @shared_task
 def send_email(to_email: str, subject: str, body: str, user_id: int = None):
     """Send email notification"""
-    return asyncio.run(_send_email_async(to_email, subject, body, user_id))
+    return run_async(_send_email_async(to_email, subject, body, user_id))
 
 async def _send_email_async(to_email: str, subject: str, body: str, user_id: int = None):
     try:
-        email_service = EmailService()
-        result = await email_service.send_email(to_email, subject, body)
+        await get_smtp_pool().send_email(to_email, subject, body)
         
         logger.info(f"Email sent to {to_email}: {subject}")
         
@@ -33,19 +32,94 @@ async def _send_email_async(to_email: str, subject: str, body: str, user_id: int
         }
 
 @shared_task
-def send_recommendations_email(user_id: int, recommendations: List[Dict]):
-    """Send daily recommendations email"""
-    return asyncio.run(_send_recommendations_email_async(user_id, recommendations))
+def flush_email_digests():
+    """Send one combined email per recipient for digest windows that have closed"""
+    return run_async(_flush_email_digests_async())
 
-async def _send_recommendations_email_async(user_id: int, recommendations: List[Dict]):
+async def _flush_email_digests_async():
     try:
         from app.models.user import User
+        from app.services.email_digest import EmailDigest, render_digest
+        from sqlalchemy import select
+        
+        digest = EmailDigest()
+        digests = await digest.claim_due()
+        if not digests:
+            return {'success': True, 'digests': 0, 'messages': 0, 'sent': 0, 'failed': 0}
+        
+        # Rule emails without an explicit address go to the rule owner
+        user_ids = {int(recipient[5:]) for _, recipient, _ in digests if recipient.startswith('user:')}
+        addresses = {}
+        if user_ids:
+            async with get_async_session() as db:
+                result = await db.execute(select(User.id, User.email).where(User.id.in_(user_ids)))
+                addresses = dict(result.all())
+        
+        outgoing = []
+        outgoing_keys = []
+        failed_keys = []
+        for key, recipient, emails in digests:
+            to_email = addresses.get(int(recipient[5:])) if recipient.startswith('user:') else recipient
+            if not to_email:
+                logger.warning(f"No address for email digest recipient {recipient}, retrying later")
+                failed_keys.append(key)
+                continue
+            
+            subject, body = render_digest(emails)
+            outgoing.append(build_message(to_email, subject, body))
+            outgoing_keys.append(key)
+        
+        try:
+            errors = await get_smtp_pool().send_many(outgoing)
+        except Exception:
+            await digest.release(failed_keys + outgoing_keys)
+            raise
+        
+        sent_keys = []
+        for key, message, error in zip(outgoing_keys, outgoing, errors):
+            if error is None:
+                sent_keys.append(key)
+            else:
+                logger.error(f"Error sending email digest to {message['To']}, retrying later: {str(error)}")
+                failed_keys.append(key)
+        
+        # Kept until sent; failed digests go back in the queue
+        await digest.ack(sent_keys)
+        await digest.release(failed_keys)
+        sent, failed = len(sent_keys), len(failed_keys)
+        
+        messages = sum(len(emails) for _, _, emails in digests)
+        logger.info(f"Flushed {len(digests)} email digests ({messages} messages): {sent} sent, {failed} failed")
+        
+        return {
+            'success': True,
+            'digests': len(digests),
+            'messages': messages,
+            'sent': sent,
+            'failed': failed
+        }
+        
+    except Exception as e:
+        logger.error(f"Error flushing email digests: {str(e)}")
+        return {'success': False, 'error': str(e)}
+
+@shared_task
+def send_recommendations_email(user_id: int, recommendations: List[List]):
+    """Send daily recommendations email for cached (opportunity_id, score) items"""
+    return run_async(_send_recommendations_email_async(user_id, recommendations))
+
+async def _send_recommendations_email_async(user_id: int, recommendations: List[List]):
+    try:
+        from app.models.user import User
+        from app.services.recommendation_cache import hydrate_recommendations
         
         async with get_async_session() as db:
             user = await db.get(User, user_id)
             if not user:
                 return {'success': False, 'error': 'User not found'}
             
+            recommendations = await hydrate_recommendations(db, recommendations)
+            
             # Generate email content
             subject = f"🎯 Daily Job Recommendations - {len(recommendations)} New Opportunities"
             
@@ -78,8 +152,7 @@ async def _send_recommendations_email_async(user_id: int, recommendations: List[
             Student CRM Team
             """
             
-            email_service = EmailService()
-            await email_service.send_email(user.email, subject, body)
+            await get_smtp_pool().send_email(user.email, subject, body)
             
             logger.info(f"Sent recommendations email to user {user_id}")
             
@@ -99,66 +172,56 @@ async def _send_recommendations_email_async(user_id: int, recommendations: List[
 
 @shared_task
 def send_deadline_reminders():
-    """Send reminders for approaching deadlines"""
-    return asyncio.run(_send_deadline_reminders_async())
+    """Send one reminder per user for approaching deadlines not reminded yet"""
+    return run_async(_send_deadline_reminders_async())
 
 async def _send_deadline_reminders_async():
     try:
-        from app.models.application import Application
-        from app.models.user import User
-        from datetime import datetime, timedelta
-        from sqlalchemy import select
+        from app.services.deadline_reminders import DeadlineReminderPlanner, render_reminder
+        from datetime import datetime, timezone
         
-        # Find applications with deadlines in next 24-48 hours
-        tomorrow = datetime.utcnow() + timedelta(days=1)
-        day_after = datetime.utcnow() + timedelta(days=2)
+        now = datetime.now(timezone.utc)
         
         async with get_async_session() as db:
-            apps_result = await db.execute(
-                select(Application, User).join(User).where(
-                    Application.status.in_(['to_apply', 'applied']),
-                    Application.opportunity.has(deadline_at__between=[tomorrow, day_after])
-                )
-            )
-            
-            urgent_applications = apps_result.all()
-            sent_count = 0
-            
-            for app, user in urgent_applications:
+            planner = DeadlineReminderPlanner(db)
+            planned = await planner.plan(now)
+            if not planned:
+                return {'success': True, 'reminders_sent': 0, 'users': 0, 'total_urgent': 0}
+            
+            # Claimed before sending, so an overlapping run skips these
+            claimed = await planner.claim([app for _, apps in planned for app in apps])
+            claimed_ids = {app.id for app in claimed}
+            
+            reminders = []
+            for user, apps in planned:
+                apps = [app for app in apps if app.id in claimed_ids]
+                if not apps:
+                    continue
                 try:
-                    deadline = app.opportunity.deadline_at
-                    hours_remaining = (deadline - datetime.utcnow()).total_seconds() / 3600
-                    
-                    subject = f"⏰ Deadline Alert: {app.opportunity.title} - {hours_remaining:.0f} hours left"
-                    
-                    body = f"""
-                    Hi {user.full_name},
-                    
-                    This is a reminder that the deadline for "{app.opportunity.title}" at {app.opportunity.organization.name} is approaching:
-                    
-                    ⏰ Deadline: {deadline.strftime('%B %d, %Y at %I:%M %p')}
-                    ⏳ Time Remaining: {hours_remaining:.0f} hours
-                    📍 Status: {app.status.replace('_', ' ').title()}
-                    
-                    {'🚀 Time to submit your application!' if app.status == 'to_apply' else '📞 Consider following up on your application.'}
-                    
-                    Good luck!
-                    Student CRM Team
-                    """
-                    
-                    email_service = EmailService()
-                    await email_service.send_email(user.email, subject, body)
-                    sent_count += 1
-                    
+                    subject, body = render_reminder(user, apps, now)
+                    reminders.append((user, apps, build_message(user.email, subject, body)))
                 except Exception as e:
-                    logger.error(f"Error sending deadline reminder for application {app.id}: {str(e)}")
+                    logger.error(f"Error preparing deadline reminder for user {user.id}: {str(e)}")
+                    await planner.release(apps)
+            
+            errors = await get_smtp_pool().send_many([message for _, _, message in reminders])
+            sent_count = 0
+            unsent = []
+            for (user, apps, _), error in zip(reminders, errors):
+                if error is None:
+                    sent_count += 1
+                else:
+                    logger.error(f"Error sending deadline reminder to user {user.id}: {str(error)}")
+                    unsent.extend(apps)
+            await planner.release(unsent)
             
-            logger.info(f"Sent {sent_count} deadline reminder emails")
+            logger.info(f"Sent {sent_count} deadline reminder emails covering {len(claimed)} applications")
             
             return {
                 'success': True,
                 'reminders_sent': sent_count,
-                'total_urgent': len(urgent_applications)
+                'users': len(planned),
+                'total_urgent': sum(len(apps) for _, apps in planned)
             }
             
     except Exception as e:
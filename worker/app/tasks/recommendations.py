@@ -1,7 +1,17 @@
-from celery import shared_task
+from celery import shared_task, chord
 import asyncio
-from app.services.database import get_async_session
+import json
+import time
+import uuid
+from typing import Dict, List, Optional, Set, Tuple
+from datetime import datetime, timedelta
+import numpy as np
+from app.runtime import run_async, get_async_session
+from app.config import settings
+from app.services.cache import get_redis
 from app.services.scoring_service import ScoringService
+from app.services.recommendation_cache import RecommendationCache
+from app.services.experience_model import refit_experience_model as _refit_experience_model
 import logging
 
 logger = logging.getLogger(__name__)
@@ -9,64 +19,41 @@ logger = logging.getLogger(__name__)
 @shared_task
 def generate_daily_recommendations(user_id: int = None):
     """Generate daily recommendations for users"""
-    return asyncio.run(_generate_daily_recommendations_async(user_id))
+    if user_id:
+        return run_async(_generate_recommendations_shard_async(None, 0, [user_id]))
+    return run_async(_dispatch_recommendation_run())
 
-async def _generate_daily_recommendations_async(user_id: Optional[int] = None):
+async def _dispatch_recommendation_run():
+    """Split active users into shards and fan them out as a chord"""
     try:
         from app.models.user import User
         from sqlalchemy import select
         
         async with get_async_session() as db:
-            # Get users to generate recommendations for
-            if user_id:
-                users_result = await db.execute(
-                    select(User).where(User.id == user_id, User.is_active == True)
-                )
-            else:
-                users_result = await db.execute(
-                    select(User).where(User.is_active == True)
-                )
-            
-            users = users_result.scalars().all()
-            
-            scoring_service = ScoringService()
-            results = []
-            
-            for user in users:
-                try:
-                    recommendations = await scoring_service.generate_recommendations(
-                        user.id, limit=10, db=db
-                    )
-                    
-                    # Cache recommendations (could store in Redis)
-                    # For now, just log
-                    logger.info(f"Generated {len(recommendations)} recommendations for user {user.id}")
-                    
-                    results.append({
-                        'user_id': user.id,
-                        'recommendations_count': len(recommendations),
-                        'success': True
-                    })
-                    
-                    # Optionally send email with recommendations
-                    if recommendations:
-                        from app.tasks.notifications import send_recommendations_email
-                        send_recommendations_email.delay(user.id, recommendations[:5])
-                        
-                except Exception as e:
-                    logger.error(f"Error generating recommendations for user {user.id}: {str(e)}")
-                    results.append({
-                        'user_id': user.id,
-                        'success': False,
-                        'error': str(e)
-                    })
-            
-            return {
-                'success': True,
-                'processed_users': len(results),
-                'results': results
-            }
-            
+            users_result = await db.execute(
+                select(User.id).where(User.is_active == True).order_by(User.id)
+            )
+            user_ids = list(users_result.scalars().all())
+        
+        shard_size = settings.RECOMMENDATION_SHARD_SIZE
+        shards = [user_ids[i:i + shard_size] for i in range(0, len(user_ids), shard_size)]
+        run_id = uuid.uuid4().hex
+        
+        if not shards:
+            return {'success': True, 'run_id': run_id, 'shards': 0, 'users': 0}
+        
+        await RecommendationRun(run_id).start(shards)
+        _launch_shards(run_id, list(enumerate(shards)))
+        
+        logger.info(f"Dispatched recommendation run {run_id}: {len(user_ids)} users in {len(shards)} shards")
+        
+        return {
+            'success': True,
+            'run_id': run_id,
+            'shards': len(shards),
+            'users': len(user_ids)
+        }
+        
     except Exception as e:
         logger.error(f"Error in daily recommendations: {str(e)}")
         return {
@@ -74,74 +61,363 @@ async def _generate_daily_recommendations_async(user_id: Optional[int] = None):
             'error': str(e)
         }
 
+def _launch_shards(run_id: str, shards: List[Tuple[int, List[int]]]):
+    chord(
+        generate_recommendations_shard.s(run_id, shard_index, shard_user_ids)
+        for shard_index, shard_user_ids in shards
+    )(finalize_recommendation_run.s(run_id))
+
+@shared_task(bind=True, max_retries=3)
+def generate_recommendations_shard(self, run_id: str, shard_index: int, user_ids: List[int]):
+    """Generate recommendations for one shard of users.
+
+    Users finished by an earlier attempt are skipped, so a retry only
+    redoes the ones that failed or were never reached.
+    """
+    result = run_async(_generate_recommendations_shard_async(run_id, shard_index, user_ids))
+    if result['failed'] and self.request.retries < self.max_retries:
+        raise self.retry(countdown=60 * (self.request.retries + 1))
+    return result
+
+async def _generate_recommendations_shard_async(
+    run_id: Optional[str],
+    shard_index: int,
+    user_ids: List[int]
+):
+    run = RecommendationRun(run_id) if run_id else None
+    started = time.monotonic()
+    
+    done = await run.completed_users(shard_index) if run else set()
+    pending = [uid for uid in user_ids if uid not in done]
+    if run:
+        await run.report(shard_index, 'running', processed=len(done), failed=0, total=len(user_ids))
+    
+    scoring_service = ScoringService()
+    cache = RecommendationCache()
+    cache_size = settings.RECOMMENDATION_CACHE_SIZE
+    semaphore = asyncio.Semaphore(settings.RECOMMENDATION_SHARD_CONCURRENCY)
+    results = []
+    
+    async def _process_user(uid: int):
+        async with semaphore:
+            try:
+                # Each user gets its own session; sessions are not safe to share across tasks
+                async with get_async_session() as db:
+                    stamp = await cache.stamp(db, uid)
+                    recommendations = await scoring_service.refresh_recommendations(
+                        uid, limit=cache_size, db=db
+                    )
+                
+                # Cache recommendations for the API read path
+                await cache.set(uid, recommendations, stamp, cache_size)
+                logger.info(f"Generated {len(recommendations)} recommendations for user {uid}")
+                
+                # Optionally send email with recommendations
+                if recommendations:
+                    from app.tasks.notifications import send_recommendations_email
+                    send_recommendations_email.delay(uid, [
+                        [item['opportunity'].id, item['fit_score']]
+                        for item in recommendations[:5]
+                    ])
+                
+                if run:
+                    await run.mark_completed(shard_index, uid)
+                results.append({
+                    'user_id': uid,
+                    'recommendations_count': len(recommendations),
+                    'success': True
+                })
+                
+            except Exception as e:
+                logger.error(f"Error generating recommendations for user {uid}: {str(e)}")
+                results.append({
+                    'user_id': uid,
+                    'success': False,
+                    'error': str(e)
+                })
+    
+    await asyncio.gather(*(_process_user(uid) for uid in pending))
+    
+    failed = sum(1 for r in results if not r['success'])
+    duration = round(time.monotonic() - started, 3)
+    processed = len(done) + len(results) - failed
+    
+    if run:
+        await run.report(
+            shard_index,
+            'failed' if failed else 'completed',
+            processed=processed,
+            failed=failed,
+            total=len(user_ids),
+            duration=duration
+        )
+    
+    return {
+        'success': not failed,
+        'run_id': run_id,
+        'shard': shard_index,
+        'processed_users': processed,
+        'skipped_users': len(done),
+        'failed': failed,
+        'duration_seconds': duration,
+        'results': results
+    }
+
+@shared_task
+def finalize_recommendation_run(shard_results: List[Dict], run_id: str):
+    """Chord callback: summarize a recommendation run"""
+    return run_async(_finalize_recommendation_run_async(shard_results, run_id))
+
+async def _finalize_recommendation_run_async(shard_results: List[Dict], run_id: str):
+    summary = {
+        'success': all(r.get('success') for r in shard_results),
+        'run_id': run_id,
+        'shards': len(shard_results),
+        'processed_users': sum(r.get('processed_users', 0) for r in shard_results),
+        'failed': sum(r.get('failed', 0) for r in shard_results),
+        'slowest_shard_seconds': max((r.get('duration_seconds', 0) for r in shard_results), default=0)
+    }
+    await RecommendationRun(run_id).finish(summary)
+    
+    logger.info(
+        f"Recommendation run {run_id} finished: {summary['processed_users']} users, "
+        f"{summary['failed']} failures across {summary['shards']} shards"
+    )
+    return summary
+
+@shared_task
+def resume_recommendation_run(run_id: str):
+    """Re-dispatch the shards of a run that did not complete"""
+    return run_async(_resume_recommendation_run_async(run_id))
+
+async def _resume_recommendation_run_async(run_id: str):
+    run = RecommendationRun(run_id)
+    shards = await run.incomplete_shards()
+    if shards:
+        _launch_shards(run_id, shards)
+    
+    logger.info(f"Resumed {len(shards)} shards of recommendation run {run_id}")
+    return {'success': True, 'run_id': run_id, 'resumed_shards': [index for index, _ in shards]}
+
+class RecommendationRun:
+    """Per-run shard manifest, progress and resume state kept in Redis"""
+    
+    TTL = 2 * 86400
+    
+    def __init__(self, run_id: str):
+        self.run_id = run_id
+        self.redis = get_redis()
+        self.key = f"recommendations:run:{run_id}"
+    
+    async def start(self, shards: List[List[int]]):
+        pipe = self.redis.pipeline(transaction=False)
+        pipe.hset(f"{self.key}:shards", mapping={
+            str(index): json.dumps(user_ids) for index, user_ids in enumerate(shards)
+        })
+        pipe.hset(self.key, mapping={
+            'status': 'running',
+            'started_at': datetime.utcnow().isoformat(),
+            'shards': len(shards)
+        })
+        pipe.expire(f"{self.key}:shards", self.TTL)
+        pipe.expire(self.key, self.TTL)
+        await pipe.execute()
+    
+    async def report(self, shard_index: int, status: str, **stats):
+        progress = json.dumps({'status': status, **stats})
+        pipe = self.redis.pipeline(transaction=False)
+        pipe.hset(f"{self.key}:progress", str(shard_index), progress)
+        pipe.expire(f"{self.key}:progress", self.TTL)
+        await pipe.execute()
+    
+    async def completed_users(self, shard_index: int) -> Set[int]:
+        members = await self.redis.smembers(f"{self.key}:done:{shard_index}")
+        return {int(uid) for uid in members}
+    
+    async def mark_completed(self, shard_index: int, user_id: int):
+        pipe = self.redis.pipeline(transaction=False)
+        pipe.sadd(f"{self.key}:done:{shard_index}", user_id)
+        pipe.expire(f"{self.key}:done:{shard_index}", self.TTL)
+        await pipe.execute()
+    
+    async def incomplete_shards(self) -> List[Tuple[int, List[int]]]:
+        shards = await self.redis.hgetall(f"{self.key}:shards")
+        progress = await self.redis.hgetall(f"{self.key}:progress")
+        return sorted(
+            (int(index), json.loads(user_ids))
+            for index, user_ids in shards.items()
+            if json.loads(progress.get(index, '{}')).get('status') != 'completed'
+        )
+    
+    async def finish(self, summary: Dict):
+        await self.redis.hset(self.key, mapping={
+            'status': 'completed' if summary['success'] else 'failed',
+            'finished_at': datetime.utcnow().isoformat(),
+            'summary': json.dumps(summary)
+        })
+
 @shared_task
 def update_opportunity_scores():
     """Update fit scores for all user applications"""
-    return asyncio.run(_update_opportunity_scores_async())
+    return run_async(_update_opportunity_scores_async())
 
 async def _update_opportunity_scores_async():
+    """Rescore stale applications in bounded memory.
+
+    Applications are streamed through a server-side cursor ordered by user,
+    so skills, experience and conversion stats are loaded once per user.
+    Scores are computed in vectorized batches and written back with bulk
+    UPDATEs committed in chunks on a second session.
+    """
     try:
         from app.models.application import Application
-        from app.models.user import User, UserSkill
-        from sqlalchemy import select
+        from app.models.opportunity import Opportunity
+        from app.models.user import User
+        from sqlalchemy import select, update, or_
         
-        async with get_async_session() as db:
+        batch_size = settings.SCORE_UPDATE_BATCH_SIZE
+        commit_size = settings.SCORE_UPDATE_COMMIT_SIZE
+        scoring_service = ScoringService()
+        stats = {'updated': 0, 'processed': 0, 'failed': 0}
+        
+        async with get_async_session() as read_db, get_async_session() as write_db:
             # Get all applications without scores or with old scores
-            apps_result = await db.execute(
-                select(Application).where(
-                    (Application.score_fit == None) | 
+            result = await read_db.stream(
+                select(
+                    Application.id.label('application_id'),
+                    Application.user_id,
+                    Application.status,
+                    Application.created_at,
+                    Opportunity.id,
+                    Opportunity.kind,
+                    Opportunity.skills_required,
+                    Opportunity.jd_text,
+                    Opportunity.deadline_at
+                )
+                .join(Opportunity, Application.opportunity_id == Opportunity.id)
+                .where(
+                    (Application.score_fit == None) |
                     (Application.updated_at < datetime.utcnow() - timedelta(days=7))
                 )
+                .order_by(Application.user_id, Application.id)
+                .execution_options(yield_per=batch_size)
             )
-            applications = apps_result.scalars().all()
             
-            scoring_service = ScoringService()
-            updated_count = 0
+            pending_updates = []
+            current_user_id = None
+            features = None
+            batch = []
             
-            for app in applications:
+            async def _score_batch():
+                """Score one user's batch; rows double as opportunity records"""
+                if not batch:
+                    return
+                stats['processed'] += len(batch)
+                if features is None:
+                    stats['failed'] += len(batch)
+                    batch.clear()
+                    return
                 try:
-                    # Get user skills
-                    skills_result = await db.execute(
-                        select(UserSkill).where(UserSkill.user_id == app.user_id)
-                    )
-                    user_skills = [skill.skill.name for skill in skills_result.scalars().all()]
-                    
-                    # Get user applications history
-                    history_result = await db.execute(
-                        select(Application).where(
-                            Application.user_id == app.user_id,
-                            Application.id != app.id
-                        )
+                    # History excludes the application being scored
+                    conversion_scores = np.array([
+                        features.conversion.without(row.kind, row.status, row.created_at).likelihood(row.kind)
+                        for row in batch
+                    ])
+                    scores = scoring_service.score_opportunities(features, batch, conversion_scores)
+                    pending_updates.extend(
+                        {'id': row.application_id, 'score_fit': float(score)}
+                        for row, score in zip(batch, scores)
                     )
-                    user_history = history_result.scalars().all()
-                    
-                    # Calculate new score
-                    score = await scoring_service.calculate_fit_score(
-                        user_skills,
-                        app.user.profile_data.get('experience', ''),
-                        app.opportunity,
-                        user_history,
-                        db
-                    )
-                    
-                    app.score_fit = score
-                    updated_count += 1
-                    
                 except Exception as e:
-                    logger.error(f"Error updating score for application {app.id}: {str(e)}")
+                    logger.error(f"Error updating scores for user {current_user_id}: {str(e)}")
+                    stats['failed'] += len(batch)
+                batch.clear()
+            
+            async def _write_updates():
+                if not pending_updates:
+                    return
+                await write_db.execute(update(Application), pending_updates)
+                await write_db.commit()
+                stats['updated'] += len(pending_updates)
+                pending_updates.clear()
             
-            await db.commit()
+            async for row in result:
+                if row.user_id != current_user_id:
+                    await _score_batch()
+                    current_user_id = row.user_id
+                    user = await write_db.get(User, current_user_id)
+                    features = await scoring_service.load_user_features(write_db, user) if user else None
+                
+                batch.append(row)
+                if len(batch) >= batch_size:
+                    await _score_batch()
+                if len(pending_updates) >= commit_size:
+                    await _write_updates()
             
-            logger.info(f"Updated scores for {updated_count} applications")
+            await _score_batch()
+            await _write_updates()
+            
+            logger.info(f"Updated scores for {stats['updated']} applications")
             
             return {
                 'success': True,
-                'updated_count': updated_count,
-                'total_processed': len(applications)
+                'updated_count': stats['updated'],
+                'failed_count': stats['failed'],
+                'total_processed': stats['processed']
             }
             
     except Exception as e:
         logger.error(f"Error updating opportunity scores: {str(e)}")
+        return {
+            'success': False,
+            'error': str(e)
+        }
+
+@shared_task
+def refit_experience_model():
+    """Refit the corpus TF-IDF model used for experience matching"""
+    return run_async(_refit_experience_model_async())
+
+async def _refit_experience_model_async():
+    try:
+        async with get_async_session() as db:
+            model = await _refit_experience_model(db)
+            
+            logger.info(f"Published experience model {model.version}")
+            
+            return {
+                'success': True,
+                'version': model.version,
+                'documents': int(model.vectors.shape[0]),
+                'features': int(model.vectors.shape[1])
+            }
+            
+    except Exception as e:
+        logger.error(f"Error refitting experience model: {str(e)}")
+        return {
+            'success': False,
+            'error': str(e)
+        }
+
+@shared_task
+def rebuild_skill_index():
+    """Rebuild the opportunity skill index from skills_required"""
+    return run_async(_rebuild_skill_index_async())
+
+async def _rebuild_skill_index_async():
+    try:
+        from app.services.skill_index import SkillIndex
+        
+        async with get_async_session() as db:
+            indexed = await SkillIndex(db).rebuild()
+            
+            return {
+                'success': True,
+                'indexed_entries': indexed
+            }
+            
+    except Exception as e:
+        logger.error(f"Error rebuilding skill index: {str(e)}")
         return {
             'success': False,
             'error': str(e)
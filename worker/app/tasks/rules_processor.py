@@ -0,0 +1,81 @@
+from celery import shared_task
+from app.runtime import run_async, get_async_session
+from app.services.rules_engine import RulesEngine
+from app.services.rule_profiler import RuleProfiler, save_last_profile
+import logging
+
+logger = logging.getLogger(__name__)
+
+@shared_task
+def process_all_rules(dry_run: bool = False):
+    """Hourly reconcile for the event-driven rule dispatcher.
+    
+    Re-queues due times for time-based rules and evaluates rules without a
+    schedule (e.g. daily_recommendations); the dispatcher does the rest.
+    The result includes a profile of the run, which is also kept for the
+    /rules/profile endpoint unless ``dry_run`` is set.
+    """
+    return run_async(_process_all_rules_async(dry_run))
+
+async def _process_all_rules_async(dry_run: bool):
+    try:
+        profiler = RuleProfiler()
+        async with get_async_session() as db:
+            engine = RulesEngine(db, dry_run=dry_run, profiler=profiler)
+            reconciled = await engine.reconcile()
+            results = reconciled['results']
+            
+            triggered = sum(1 for result in results if result.get('triggered'))
+            failed = sum(1 for result in results if result.get('success') is False)
+            
+            profile = profiler.as_dict()
+            
+            logger.info(
+                f"Reconciled rules{' (dry run)' if dry_run else ''}: {reconciled['queued']} due checks queued, "
+                f"{triggered} periodic rules triggered, {failed} failed in {profile['total']['wall_ms']:.0f} ms"
+            )
+            if not dry_run:
+                await save_last_profile(profile)
+            
+            return {
+                'success': True,
+                'dry_run': dry_run,
+                'queued': reconciled['queued'],
+                'rules_processed': len(results),
+                'triggered': triggered,
+                'failed': failed,
+                'profile': profile
+            }
+            
+    except Exception as e:
+        logger.error(f"Error processing rules: {str(e)}")
+        return {'success': False, 'error': str(e)}
+
+@shared_task
+def process_user_rules(user_id: int, dry_run: bool = False):
+    """Evaluate one user's enabled rules"""
+    return run_async(_process_user_rules_async(user_id, dry_run))
+
+async def _process_user_rules_async(user_id: int, dry_run: bool):
+    try:
+        profiler = RuleProfiler()
+        async with get_async_session() as db:
+            engine = RulesEngine(db, dry_run=dry_run, profiler=profiler)
+            results = await engine.process_user_rules(user_id)
+            
+            return {
+                'success': True,
+                'user_id': user_id,
+                'dry_run': dry_run,
+                'rules_processed': len(results),
+                'triggered': sum(1 for result in results if result.get('triggered')),
+                'profile': profiler.as_dict()
+            }
+            
+    except Exception as e:
+        logger.error(f"Error processing rules for user {user_id}: {str(e)}")
+        return {
+            'success': False,
+            'error': str(e),
+            'user_id': user_id
+        }
@@ -1,12 +1,14 @@
 from celery import shared_task
-import httpx
-from bs4 import BeautifulSoup
-import re
-from typing import Dict, List, Optional
-import asyncio
-from app.services.database import get_async_session
+from typing import Dict, List, Optional, Tuple
+from app.config import settings
+from app.crawler import Crawler, CrawlResult
+from app.runtime import run_async, get_async_session
+from app.services.html_parser import parse_html, site_spec
+from app.services.opportunity_dedup import OpportunityDeduplicator
+from app.services.skill_extractor import SkillExtractor, get_skill_extractor
 from app.models.opportunity import Opportunity, Organization
 from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 import logging
 
 logger = logging.getLogger(__name__)
@@ -14,70 +16,33 @@ logger = logging.getLogger(__name__)
 @shared_task
 def scrape_opportunity(url: str, user_id: int) -> Dict:
     """Scrape job/internship opportunity from URL"""
-    return asyncio.run(_scrape_opportunity_async(url, user_id))
+    return run_async(_scrape_opportunity_async(url, user_id))
 
 async def _scrape_opportunity_async(url: str, user_id: int) -> Dict:
     try:
-        headers = {
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
-        }
-        
-        async with httpx.AsyncClient(timeout=30.0) as client:
-            response = await client.get(url, headers=headers)
-            response.raise_for_status()
-            
-        soup = BeautifulSoup(response.content, 'html.parser')
+        crawler = Crawler()
+        page = await crawler.get(url)
+        if page.error:
+            raise RuntimeError(page.error)
+        if page.unchanged:
+            logger.info(f"Opportunity page unchanged since last scrape: {url}")
+            return {'success': True, 'unchanged': True, 'url': url}
         
-        # Extract job details (LinkedIn-style)
-        if 'linkedin.com' in url:
-            data = await _scrape_linkedin_job(soup, url)
-        elif 'indeed.com' in url:
-            data = await _scrape_indeed_job(soup, url)
-        elif 'glassdoor.com' in url:
-            data = await _scrape_glassdoor_job(soup, url)
-        else:
-            data = await _scrape_generic_job(soup, url)
-            
-        # Save to database
         async with get_async_session() as db:
-            # Find or create organization
-            org_result = await db.execute(
-                select(Organization).where(Organization.name == data['company'])
-            )
-            organization = org_result.scalar_one_or_none()
-            
-            if not organization:
-                organization = Organization(
-                    name=data['company'],
-                    website=data.get('company_website', ''),
-                    location=data.get('location', ''),
-                )
-                db.add(organization)
-                await db.flush()
-            
-            # Create opportunity
-            opportunity = Opportunity(
-                organization_id=organization.id,
-                title=data['title'],
-                kind=data.get('type', 'job'),
-                location=data.get('location', ''),
-                mode=data.get('work_mode', 'onsite'),
-                url=url,
-                jd_text=data.get('description', ''),
-                skills_required=data.get('skills', []),
-                salary_min=data.get('salary_min'),
-                salary_max=data.get('salary_max'),
-                source='scraped'
-            )
-            
-            db.add(opportunity)
+            data = _parse_page(url, page.response.content, await get_skill_extractor(db))
+            opportunity, duplicate = await _save_opportunity(db, url, data, {})
             await db.commit()
+            await crawler.remember(page)
+            
+            from app.tasks.search_indexing import index_opportunity_embedding
+            index_opportunity_embedding.delay(opportunity.id)
             
             logger.info(f"Successfully scraped opportunity: {data['title']} at {data['company']}")
             
             return {
                 'success': True,
                 'opportunity_id': opportunity.id,
+                'duplicate': duplicate,
                 'title': data['title'],
                 'company': data['company']
             }
@@ -90,28 +55,20 @@ async def _scrape_opportunity_async(url: str, user_id: int) -> Dict:
             'url': url
         }
 
-async def _scrape_linkedin_job(soup: BeautifulSoup, url: str) -> Dict:
-    """LinkedIn-specific scraping logic"""
-    data = {}
-    
-    # Title
-    title_elem = soup.find('h1', class_='top-card-layout__title')
-    data['title'] = title_elem.get_text(strip=True) if title_elem else 'Unknown Title'
+def _parse_page(url: str, content: bytes, skills: SkillExtractor) -> Dict:
+    """Extract job details with the site's selectors, or generic ones"""
+    spec = site_spec(url)
+    page = parse_html(content, spec)
     
-    # Company
-    company_elem = soup.find('a', class_='topcard__org-name-link')
-    data['company'] = company_elem.get_text(strip=True) if company_elem else 'Unknown Company'
+    data = {
+        'title': page.text(spec.title) or 'Unknown Title',
+        'company': page.text(spec.company) or 'Unknown Company',
+        'location': page.text(spec.location) or '',
+        'description': page.text(spec.description) or ''
+    }
     
-    # Location
-    location_elem = soup.find('span', class_='topcard__flavor--bullet')
-    data['location'] = location_elem.get_text(strip=True) if location_elem else ''
-    
-    # Description
-    desc_elem = soup.find('div', class_='show-more-less-html__markup')
-    data['description'] = desc_elem.get_text(separator=' ', strip=True) if desc_elem else ''
-    
-    # Skills extraction from description
-    data['skills'] = _extract_skills_from_text(data['description'])
+    # Canonical names of the known skills the description mentions
+    data['skills'] = skills.extract_names(data['description'])
     
     # Work mode detection
     desc_lower = data['description'].lower()
@@ -124,70 +81,159 @@ async def _scrape_linkedin_job(soup: BeautifulSoup, url: str) -> Dict:
     
     return data
 
-async def _scrape_generic_job(soup: BeautifulSoup, url: str) -> Dict:
-    """Generic scraping for unknown job sites"""
-    data = {}
-    
-    # Try common selectors for title
-    title_selectors = ['h1', '.job-title', '.title', '[class*="title"]']
-    for selector in title_selectors:
-        elem = soup.select_one(selector)
-        if elem:
-            data['title'] = elem.get_text(strip=True)
-            break
-    else:
-        data['title'] = 'Unknown Title'
-    
-    # Try to find company
-    company_selectors = ['.company', '.employer', '[class*="company"]', '[class*="employer"]']
-    for selector in company_selectors:
-        elem = soup.select_one(selector)
-        if elem:
-            data['company'] = elem.get_text(strip=True)
-            break
-    else:
-        data['company'] = 'Unknown Company'
-    
-    # Get all text for description
-    data['description'] = soup.get_text(separator=' ', strip=True)
-    data['skills'] = _extract_skills_from_text(data['description'])
-    
-    return data
-
-def _extract_skills_from_text(text: str) -> List[str]:
-    """Extract technical skills from job description text"""
-    # Common technical skills
-    skill_patterns = [
-        r'\b(?:Python|Java|JavaScript|C\+\+|C#|Ruby|Go|Rust|Swift|Kotlin|PHP|TypeScript)\b',
-        r'\b(?:React|Angular|Vue|Django|Flask|Spring|Express|Laravel|Rails)\b',
-        r'\b(?:AWS|Azure|GCP|Docker|Kubernetes|Jenkins|Git|PostgreSQL|MongoDB|Redis)\b',
-        r'\b(?:Machine Learning|Data Science|AI|Deep Learning|TensorFlow|PyTorch)\b',
-        r'\b(?:SQL|NoSQL|REST|GraphQL|Microservices|DevOps|CI/CD)\b'
-    ]
-    
-    skills = set()
-    text_upper = text.upper()
-    
-    for pattern in skill_patterns:
-        matches = re.findall(pattern, text, re.IGNORECASE)
-        skills.update(match.upper() for match in matches)
-    
-    return list(skills)
+async def _save_opportunity(db: AsyncSession, url: str, data: Dict, organizations: Dict[str, Organization]) -> Tuple[Opportunity, Optional[str]]:
+    """Add the scraped opportunity, or merge it into the posting it duplicates.
+    
+    Returns the opportunity and how a duplicate was matched ('url' or
+    'content'), or None when it is new.
+    """
+    organization = organizations.get(data['company'])
+    if organization is None:
+        org_result = await db.execute(
+            select(Organization).where(Organization.name == data['company'])
+        )
+        organization = org_result.scalar_one_or_none()
+        
+        if not organization:
+            organization = Organization(
+                name=data['company'],
+                website=data.get('company_website', ''),
+                location=data.get('location', ''),
+            )
+            db.add(organization)
+            await db.flush()
+        organizations[data['company']] = organization
+    
+    return await OpportunityDeduplicator(db).upsert(
+        {
+            'organization_id': organization.id,
+            'title': data['title'],
+            'kind': data.get('type', 'job'),
+            'location': data.get('location', ''),
+            'mode': data.get('work_mode', 'onsite'),
+            'url': url,
+            'jd_text': data.get('description', ''),
+            'skills_required': data.get('skills', []),
+            'salary_min': data.get('salary_min'),
+            'salary_max': data.get('salary_max'),
+            'source': 'scraped'
+        },
+        company=data['company']
+    )
 
 @shared_task
 def scrape_multiple_opportunities(urls: List[str], user_id: int) -> Dict:
-    """Scrape multiple opportunities in parallel"""
+    """Scrape multiple opportunities concurrently within this task"""
+    return run_async(_scrape_multiple_async(urls, user_id))
+
+async def _scrape_multiple_async(urls: List[str], user_id: int) -> Dict:
     results = []
-    for url in urls:
-        result = scrape_opportunity.delay(url, user_id)
-        results.append(result.get())
+    try:
+        async with get_async_session() as db:
+            crawler = Crawler()
+            skills = await get_skill_extractor(db)
+            organizations: Dict[str, Organization] = {}
+            parsed: List[Tuple[CrawlResult, Dict]] = []
+            
+            # Pages are parsed as they arrive and saved in batches while the rest download
+            async for fetched in crawler.crawl(urls):
+                if fetched.error:
+                    logger.error(f"Error scraping {fetched.url}: {fetched.error}")
+                    results.append({'success': False, 'error': fetched.error, 'url': fetched.url})
+                    continue
+                if fetched.unchanged:
+                    results.append({'success': True, 'unchanged': True, 'url': fetched.url})
+                    continue
+                try:
+                    parsed.append((fetched, _parse_page(fetched.url, fetched.response.content, skills)))
+                except Exception as e:
+                    logger.error(f"Error parsing {fetched.url}: {str(e)}")
+                    results.append({'success': False, 'error': str(e), 'url': fetched.url})
+                    continue
+                
+                if len(parsed) >= settings.SCRAPE_SAVE_BATCH_SIZE:
+                    results.extend(await _save_batch(db, crawler, parsed, organizations))
+                    parsed = []
+            
+            results.extend(await _save_batch(db, crawler, parsed, organizations))
+            
+    except Exception as e:
+        logger.error(f"Error scraping opportunities: {str(e)}")
+        return {'success': False, 'error': str(e), 'total': len(urls), 'results': results}
     
     successful = [r for r in results if r.get('success')]
     failed = [r for r in results if not r.get('success')]
+    unchanged = [r for r in successful if r.get('unchanged')]
+    
+    logger.info(f"Scraped {len(successful)} of {len(urls)} opportunities ({len(unchanged)} unchanged)")
     
     return {
+        'success': True,
         'total': len(urls),
         'successful': len(successful),
+        'unchanged': len(unchanged),
         'failed': len(failed),
         'results': results
-    }
\ No newline at end of file
+    }
+
+async def _save_batch(
+    db: AsyncSession,
+    crawler: Crawler,
+    parsed: List[Tuple[CrawlResult, Dict]],
+    organizations: Dict[str, Organization]
+) -> List[Dict]:
+    """Commit a batch of scraped pages; one bad row only fails itself"""
+    if not parsed:
+        return []
+    
+    try:
+        saved = [(page, data, *await _save_opportunity(db, page.url, data, organizations)) for page, data in parsed]
+        await db.commit()
+    except Exception as e:
+        await db.rollback()
+        # Organizations added in the failed transaction no longer exist
+        organizations.clear()
+        logger.warning(f"Saving {len(parsed)} scraped opportunities failed ({str(e)}), saving one by one")
+        saved = []
+        results = []
+        for page, data in parsed:
+            try:
+                opportunity, duplicate = await _save_opportunity(db, page.url, data, organizations)
+                await db.commit()
+                saved.append((page, data, opportunity, duplicate))
+            except Exception as e:
+                await db.rollback()
+                organizations.clear()
+                logger.error(f"Error saving scraped opportunity {page.url}: {str(e)}")
+                results.append({'success': False, 'error': str(e), 'url': page.url})
+    else:
+        results = []
+    
+    from app.tasks.search_indexing import index_opportunity_embedding
+    for page, data, opportunity, duplicate in saved:
+        await crawler.remember(page)
+        index_opportunity_embedding.delay(opportunity.id)
+        results.append({
+            'success': True,
+            'opportunity_id': opportunity.id,
+            'duplicate': duplicate,
+            'title': data['title'],
+            'company': data['company'],
+            'url': page.url
+        })
+    return results
+
+@shared_task
+def backfill_opportunity_fingerprints() -> Dict:
+    """Give opportunities saved before de-duplication a canonical URL and SimHash"""
+    return run_async(_backfill_opportunity_fingerprints_async())
+
+async def _backfill_opportunity_fingerprints_async() -> Dict:
+    try:
+        async with get_async_session() as db:
+            counts = await OpportunityDeduplicator(db).backfill()
+            return {'success': True, **counts}
+            
+    except Exception as e:
+        logger.error(f"Error backfilling opportunity fingerprints: {str(e)}")
+        return {'success': False, 'error': str(e)}
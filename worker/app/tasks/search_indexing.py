@@ -1,23 +1,14 @@
 from celery import shared_task
-import asyncio
-from app.services.database import get_async_session
-from meilisearch import Client
-import os
+from app.runtime import run_async, get_async_session, get_search_client
 from sqlalchemy import select
 import logging
 
 logger = logging.getLogger(__name__)
 
-# Meilisearch client
-meili_client = Client(
-    os.getenv("MEILISEARCH_URL", "http://localhost:7700"),
-    os.getenv("MEILI_MASTER_KEY", "")
-)
-
 @shared_task
 def index_document(document_id: int):
     """Index document in Meilisearch"""
-    return asyncio.run(_index_document_async(document_id))
+    return run_async(_index_document_async(document_id))
 
 async def _index_document_async(document_id: int):
     try:
@@ -42,7 +33,7 @@ async def _index_document_async(document_id: int):
             }
             
             # Index in documents collection
-            index = meili_client.index('documents')
+            index = get_search_client().index('documents')
             task = index.add_documents([doc_data])
             
             logger.info(f"Indexed document {document_id} in Meilisearch")
@@ -64,7 +55,7 @@ async def _index_document_async(document_id: int):
 @shared_task
 def index_opportunity(opportunity_id: int):
     """Index opportunity in Meilisearch"""
-    return asyncio.run(_index_opportunity_async(opportunity_id))
+    return run_async(_index_opportunity_async(opportunity_id))
 
 async def _index_opportunity_async(opportunity_id: int):
     try:
@@ -101,7 +92,7 @@ async def _index_opportunity_async(opportunity_id: int):
             }
             
             # Index in opportunities collection
-            index = meili_client.index('opportunities')
+            index = get_search_client().index('opportunities')
             task = index.add_documents([opp_data])
             
             logger.info(f"Indexed opportunity {opportunity_id} in Meilisearch")
@@ -120,24 +111,59 @@ async def _index_opportunity_async(opportunity_id: int):
             'opportunity_id': opportunity_id
         }
 
+@shared_task
+def index_opportunity_embedding(opportunity_id: int):
+    """Embed opportunity description into the local ANN index"""
+    return run_async(_index_opportunity_embedding_async(opportunity_id))
+
+async def _index_opportunity_embedding_async(opportunity_id: int):
+    try:
+        from app.models.opportunity import Opportunity
+        from app.services.embedding_service import EmbeddingService
+        from app.services.vector_index import get_vector_index
+        
+        vector_index = get_vector_index("opportunities")
+        
+        async with get_async_session() as db:
+            opportunity = await db.get(Opportunity, opportunity_id)
+            
+            # Only active opportunities are worth matching against
+            if not opportunity or opportunity.status != 'active':
+                vector_index.delete([opportunity_id])
+                return {'success': True, 'opportunity_id': opportunity_id, 'indexed': False}
+            
+            text = f"{opportunity.title}\n{opportunity.jd_text or ''}\n{' '.join(opportunity.skills_required or [])}"
+            embeddings = await EmbeddingService().generate_embeddings(text)
+            vector_index.add([opportunity_id], [embeddings])
+            
+            return {'success': True, 'opportunity_id': opportunity_id, 'indexed': True}
+            
+    except Exception as e:
+        logger.error(f"Error embedding opportunity {opportunity_id}: {str(e)}")
+        return {
+            'success': False,
+            'error': str(e),
+            'opportunity_id': opportunity_id
+        }
+
 @shared_task
 def setup_search_indexes():
     """Setup Meilisearch indexes with proper configuration"""
     try:
         # Documents index
-        docs_index = meili_client.index('documents')
+        docs_index = get_search_client().index('documents')
         docs_index.update_searchable_attributes(['title', 'content', 'tags'])
         docs_index.update_filterable_attributes(['kind', 'owner_id', 'created_at'])
         docs_index.update_sortable_attributes(['created_at'])
         
         # Opportunities index
-        opps_index = meili_client.index('opportunities')
+        opps_index = get_search_client().index('opportunities')
         opps_index.update_searchable_attributes(['title', 'company', 'description', 'skills'])
         opps_index.update_filterable_attributes(['kind', 'mode', 'location', 'company', 'created_at'])
         opps_index.update_sortable_attributes(['created_at', 'deadline_at', 'salary_min'])
         
         # Contacts index
-        contacts_index = meili_client.index('contacts')
+        contacts_index = get_search_client().index('contacts')
         contacts_index.update_searchable_attributes(['name', 'email', 'notes', 'role'])
         contacts_index.update_filterable_attributes(['organization', 'strength', 'last_contacted_at'])
         contacts_index.update_sortable_attributes(['last_contacted_at', 'strength'])
@@ -153,7 +179,7 @@ def setup_search_indexes():
 @shared_task
 def reindex_all():
     """Re-index all entities"""
-    return asyncio.run(_reindex_all_async())
+    return run_async(_reindex_all_async())
 
 async def _reindex_all_async():
     try:
@@ -181,6 +207,7 @@ async def _reindex_all_async():
             # Index opportunities
             for opp in opportunities:
                 index_opportunity.delay(opp.id)
+                index_opportunity_embedding.delay(opp.id)
             
             # Index contacts
             for contact in contacts:
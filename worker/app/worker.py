@@ -1,5 +1,6 @@
 from celery import Celery
 import os
+import app.runtime  # noqa: F401 (starts the async runtime in each worker process)
 
 # Celery configuration
 redis_url = os.getenv("REDIS_URL", "redis://localhost:6379/0")
@@ -40,10 +41,25 @@ app.conf.update(
             "task": "app.tasks.recommendations.generate_daily_recommendations",
             "schedule": 3600.0,  # Every hour
         },
+        # Experience matching model
+        "refit-experience-model": {
+            "task": "app.tasks.recommendations.refit_experience_model",
+            "schedule": 86400.0,  # Daily
+        },
         # Rules processing
         "process-rules": {
             "task": "app.tasks.rules_processor.process_all_rules",
-            "schedule": 3600.0,  # Every hour  
+            "schedule": 3600.0,  # Every hour (reconcile; rule_dispatcher reacts to changes)
+        },
+        # Rule email digests
+        "flush-email-digests": {
+            "task": "app.tasks.notifications.flush_email_digests",
+            "schedule": 300.0,  # Every 5 minutes
+        },
+        # Deadline reminders (the sent-ledger makes repeat runs no-ops)
+        "send-deadline-reminders": {
+            "task": "app.tasks.notifications.send_deadline_reminders",
+            "schedule": 600.0,  # Every 10 minutes
         },
         # Backup
         "daily-backup": {